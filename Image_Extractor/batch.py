@@ -0,0 +1,429 @@
+"""
+File: batch.py
+
+Description:
+    Headless entry point for the Markdown Image Downloader.
+    Processes whole directory trees (or glob patterns) of Markdown files in one run:
+    assets are de-duplicated across every file, downloaded once through a shared
+    worker pool and every Markdown file is rewritten to use local image paths.
+    No file dialog is opened, so it can run from scripts and CI.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - argparse
+    - rich
+    - batch.py (support_files)
+    - config.py
+    - concurrency.py
+    - retry.py
+    - metrics.py
+    - progress.py
+    - plan.py
+    - dedup.py
+    - optimize.py
+    - upload.py
+    - index.py
+
+Usage:
+    python batch.py docs/ other_repo/ "notes/**/*.md" --workers 16 --engine async --per-host 8
+    python batch.py docs/ --adaptive-workers --workers 8 --min-workers 2 --max-workers 64   # start at 8
+    python batch.py docs/ --plan plan.json        # dry run: resolve and size assets, download nothing
+    python batch.py --execute plan.json           # download using the plan's resolved URLs
+    python batch.py docs/ --upload https://assets.example.com/upload   # re-host local Images/
+    python batch.py docs/ --index docs/.image_index.json   # incremental: only changed / incomplete docs
+    python batch.py --index docs/.image_index.json --uses https://github.com/user-attachments/assets/<uuid>
+
+Version:
+    001 - Initial headless batch mode
+    002 - Aggregated progress view and plain log output for CI (--progress)
+    003 - Dry-run planning (--plan) and plan execution (--execute)
+    004 - Content-hash de-duplication of downloaded images (--dedup)
+    005 - Right-sized / recompressed image variants (--optimize)
+    006 - Reverse pipeline: upload local images and link to the hosted copies (--upload)
+    007 - Corpus index for incremental runs (--index, --uses) and --skip-incomplete
+    008 - Adaptive download concurrency (--min-workers, --max-workers, --fixed-workers)
+"""
+import argparse
+
+from support_files.batch import find_markdown_files, plan_batch, run_batch
+from support_files.config import (
+    USER_SESSION,
+    BASE_URL,
+    ASSETS_ENDPOINT,
+    BATCH_MAX_WORKERS,
+    MARKDOWN_GLOB,
+    DOWNLOAD_ENGINE,
+    PER_HOST_LIMIT,
+    ADAPTIVE_CONCURRENCY,
+    CONCURRENCY_FLOOR,
+    CONCURRENCY_CEILING,
+    CONCURRENCY_BACKOFF,
+    CONCURRENCY_MAX_ERROR_RATE,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    USE_CACHE,
+    CACHE_DIR,
+    CACHE_MAX_BYTES,
+    REFRESH_EXISTING,
+    STREAMING_THRESHOLD_BYTES,
+    STREAM_CHUNK_BYTES,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET,
+    REQUESTS_PER_SECOND,
+    REQUEST_BURST,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    METRICS_PATH,
+    PROGRESS_MODE,
+    PROGRESS_TOP_N,
+    PROGRESS_INTERVAL,
+    PROGRESS_LOG_INTERVAL,
+    PLAN_METHOD,
+    DEDUP_IMAGES,
+    OPTIMIZE_IMAGES,
+    OPTIMIZE_QUALITY,
+    OPTIMIZE_SCALE,
+    OPTIMIZE_MIN_SAVING,
+    UPLOAD_ENDPOINT,
+    UPLOAD_TOKEN,
+    UPLOAD_FIELD,
+    UPLOAD_URL_FIELD,
+    UPLOAD_MAX_WORKERS,
+    UPLOAD_LOG_PATH,
+    CORPUS_INDEX_PATH,
+    SKIP_INCOMPLETE_DOCS,
+)
+from support_files.cache import AssetCache
+from support_files.concurrency import AdaptiveConcurrency
+from support_files.dedup import DEDUP_SCOPES
+from support_files.downloader import ENGINES
+from support_files.index import CorpusIndex
+from support_files.metrics import DownloadMetrics
+from support_files.optimize import OPTIMIZE_FORMATS, optimize_settings
+from support_files.plan import PLAN_METHODS, load_plan, write_plan
+from support_files.progress import PROGRESS_MODES, make_progress
+from support_files.retry import RetryScheduler
+from support_files.upload import run_upload
+
+#####################################
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download GitHub image assets for many Markdown files.")
+    parser.add_argument("targets", nargs="*", help="Directories, Markdown files or glob patterns")
+    parser.add_argument("--pattern", default=MARKDOWN_GLOB, help="Glob used inside directories")
+    parser.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS,
+                        help="Shared download workers (the starting point with --adaptive-workers)")
+    parser.add_argument("--min-workers", type=int, default=CONCURRENCY_FLOOR,
+                        help="Fewest downloads in flight the adaptive limit may cut to")
+    parser.add_argument("--max-workers", type=int, default=CONCURRENCY_CEILING,
+                        help="Most downloads in flight the adaptive limit may grow to")
+    parser.add_argument("--fixed-workers", action="store_true", default=not ADAPTIVE_CONCURRENCY,
+                        help="Keep --workers downloads in flight instead of adapting to latency and errors")
+    parser.add_argument("--adaptive-workers", action="store_false", dest="fixed_workers",
+                        help="Adapt the number of downloads in flight to latency and errors, starting at --workers")
+    parser.add_argument("--engine", choices=ENGINES, default=DOWNLOAD_ENGINE, help="Download engine")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, help="Concurrent downloads per host")
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR), help="Shared content-addressed asset cache")
+    parser.add_argument("--no-cache", action="store_true", default=not USE_CACHE, help="Do not use the asset cache")
+    parser.add_argument("--refresh", action="store_true", default=REFRESH_EXISTING,
+                        help="Re-validate existing images with conditional GETs")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process every file in chunks (default: only files over STREAMING_THRESHOLD_BYTES)")
+    parser.add_argument("--retries", type=int, default=RETRY_ATTEMPTS,
+                        help="Attempts per asset for 429 / 5xx answers and dropped connections")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="Requests per second per host (0 = only slow down when the server asks)")
+    parser.add_argument("--metrics", default=METRICS_PATH,
+                        help="Write per-asset timings and histograms to this file (.prom = Prometheus, else JSON lines)")
+    parser.add_argument("--progress", choices=PROGRESS_MODES, default=PROGRESS_MODE,
+                        help="Progress display (auto: aggregate view on a terminal, plain log lines otherwise)")
+    parser.add_argument("--dedup", choices=DEDUP_SCOPES, default=DEDUP_IMAGES,
+                        help="Collapse byte-identical images per Images folder, or also link them across folders")
+    parser.add_argument("--optimize", choices=OPTIMIZE_FORMATS, default=OPTIMIZE_IMAGES,
+                        help="Link to right-sized variants, recompressed in the same format or as WebP (needs Pillow)")
+    parser.add_argument("--quality", type=int, default=OPTIMIZE_QUALITY, help="Quality for --optimize")
+    parser.add_argument("--plan", metavar="PLAN_FILE",
+                        help="Dry run: resolve final URLs and sizes without downloading, write them here")
+    parser.add_argument("--plan-method", choices=PLAN_METHODS, default=PLAN_METHOD,
+                        help="Resolve with a one-byte Range GET or a HEAD request")
+    parser.add_argument("--execute", metavar="PLAN_FILE",
+                        help="Download the Markdown files of a plan, using its resolved URLs")
+    parser.add_argument("--upload", metavar="ENDPOINT", nargs="?", const=UPLOAD_ENDPOINT or "",
+                        help="Reverse mode: upload the local Images/ files the documents link to and link to the hosted copies")
+    parser.add_argument("--upload-token", default=UPLOAD_TOKEN, help="Bearer token for --upload")
+    parser.add_argument("--upload-workers", type=int, default=UPLOAD_MAX_WORKERS, help="Concurrent uploads")
+    parser.add_argument("--upload-log", default=str(UPLOAD_LOG_PATH),
+                        help="Log of finished uploads, so repeated runs skip them")
+    parser.add_argument("--index", default=CORPUS_INDEX_PATH, metavar="INDEX_FILE",
+                        help="Corpus index: skip documents that are unchanged and complete since the last run")
+    parser.add_argument("--uses", metavar="URL", help="With --index: list the documents that use this asset, then exit")
+    parser.add_argument("--skip-incomplete", action="store_true", default=SKIP_INCOMPLETE_DOCS,
+                        help="Do not rewrite a document while any of its images failed to download")
+    parser.add_argument("--session", default=USER_SESSION, help="GitHub user_session cookie")
+    args = parser.parse_args()
+    if args.uses:
+        if not args.index:
+            parser.error("--uses needs --index")
+        return args
+    if not 1 <= args.min_workers <= args.max_workers:
+        parser.error("need 1 <= --min-workers <= --max-workers")
+    if args.plan and args.execute:
+        parser.error("--plan and --execute cannot be used together")
+    if args.upload == "":
+        parser.error("--upload needs an ENDPOINT (or UPLOAD_ENDPOINT in config.py)")
+    if args.upload is not None and (args.plan or args.execute):
+        parser.error("--upload cannot be combined with --plan or --execute")
+    if not args.targets and not args.execute:
+        parser.error("give Markdown files / directories, or --execute PLAN_FILE")
+    return args
+
+#####################################
+def optimize_table(results, limit=None):
+    # Bytes saved per optimised image, biggest savings first
+    from rich.table import Table
+
+    rows = sorted((r for r in results if r["variant"]), key=lambda r: r["after"] - r["before"])
+    table = Table(title="Optimised images" + (f" (top {limit})" if limit and len(rows) > limit else ""))
+    table.add_column("Variant")
+    table.add_column("Before", justify="right")
+    table.add_column("After", justify="right")
+    table.add_column("Saved", justify="right")
+    for r in rows[:limit]:
+        table.add_row(
+            r["variant"],
+            f"{r['before'] / 1e3:.0f} kB",
+            f"{r['after'] / 1e3:.0f} kB",
+            f"{1 - r['after'] / r['before']:.0%}" if r["before"] else "-",
+        )
+    return table
+
+#####################################
+def concurrency_table(limits, limit=None):
+    # The adaptive controller's changes to the number of downloads in flight, latest last
+    from rich.table import Table
+
+    rows = limits["decisions"]
+    table = Table(title="Concurrency decisions" + (f" (last {limit})" if limit and len(rows) > limit else ""))
+    for column in ("Time", "Limit", "Reason", "Errors", "Latency p50", "Throughput"):
+        table.add_column(column, justify="left" if column == "Reason" else "right")
+    for d in rows[-limit if limit else 0:]:
+        table.add_row(
+            f"{d['t']:.1f}s",
+            f"{d['from']} -> {d['to']}",
+            d["reason"],
+            f"{d['error_rate']:.0%}",
+            f"{d['latency_p50'] * 1000:.0f} ms" if d["latency_p50"] is not None else "-",
+            f"{d['mb_per_s']:.1f} MB/s",
+        )
+    return table
+
+#####################################
+def print_plan(console, plan, path):
+    # Write the plan file and show what executing it would cost
+    from rich.table import Table
+    from rich.panel import Panel
+
+    write_plan(plan, path)
+    totals = plan["totals"]
+    table = Table(show_header=False, box=None)
+    table.add_row("Markdown files:", str(len(plan["markdown_files"])))
+    table.add_row("Unique URLs found:", str(totals["assets"]))
+    table.add_row("Already exist:", str(totals["exists"]))
+    table.add_row("Cache hits:", f"{totals['cached']} ({totals['cached_bytes'] / 1e6:.1f} MB)")
+    table.add_row("To download:", f"{totals['download']} ({totals['download_bytes'] / 1e6:.1f} MB)")
+    if totals["unknown_size"]:
+        table.add_row("Size unknown:", str(totals["unknown_size"]))
+    table.add_row("Unresolved:", str(totals["unresolved"]))
+    table.add_row("Plan written to:", str(path))
+    console.print(Panel(table, title="Markdown Image Downloader (plan)", expand=False))
+    unresolved = [
+        f"{e['url']} ({e.get('http_status') or 'no response'})"
+        for e in plan["assets"] if e["state"] == "unresolved"
+    ]
+    if unresolved:
+        console.print(Panel("\n".join(unresolved), title="Could Not Resolve", expand=False, style="red"))
+
+#####################################
+def print_upload(console, summary, endpoint):
+    # Summary of a reverse (--upload) run
+    from rich.table import Table
+    from rich.panel import Panel
+
+    table = Table(show_header=False, box=None)
+    table.add_row("Markdown files:", str(summary["markdown_files"]))
+    table.add_row("Local images found:", str(summary["images_found"]))
+    table.add_row("Images uploaded:", f"{summary['uploaded']} ({summary['bytes_uploaded'] / 1e6:.1f} MB)")
+    table.add_row("Identical copies:", str(summary["duplicates"]))
+    table.add_row("Uploaded before:", str(summary["already_uploaded"]))
+    table.add_row("Missing files:", str(len(summary["missing"])))
+    table.add_row("Failed uploads:", str(len(summary["failed"])))
+    table.add_row("Files rewritten:", str(len(summary["rewritten"])))
+    console.print(Panel(table, title=f"Markdown Image Uploader ({endpoint})", expand=False))
+    for title, paths in (("Images Not Found", summary["missing"]), ("Images Not Uploaded", summary["failed"])):
+        if paths:
+            console.print(Panel("\n".join(paths), title=title, expand=False, style="red"))
+
+#####################################
+def main():
+    # Console-only imports, so importing this module stays cheap
+    from rich.console import Console
+    from rich.table import Table
+    from rich.panel import Panel
+
+    args = parse_args()
+    console = Console()
+    index = CorpusIndex(args.index) if args.index else None
+    if args.uses:
+        for md_path in index.docs_using(args.uses):
+            console.print(md_path)
+        return
+    plan = load_plan(args.execute) if args.execute else None
+    if plan is not None:
+        args.targets = plan["markdown_files"]
+
+    total_files = len(find_markdown_files(args.targets, args.pattern))
+    console.print(f"Scanning [green]{total_files}[/green] Markdown files")
+
+    scheduler = RetryScheduler(
+        attempts=args.retries,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        budget=RETRY_BUDGET,
+        rate=args.rate,
+        burst=REQUEST_BURST,
+        breaker_threshold=BREAKER_THRESHOLD,
+        breaker_cooldown=BREAKER_COOLDOWN,
+    )
+    metrics = DownloadMetrics(args.workers, args.engine) if args.metrics else None
+    concurrency = None if args.fixed_workers else AdaptiveConcurrency(
+        initial=args.workers,
+        floor=args.min_workers,
+        ceiling=args.max_workers,
+        latency_tolerance=CONCURRENCY_LATENCY_TOLERANCE,
+        max_error_rate=CONCURRENCY_MAX_ERROR_RATE,
+        backoff=CONCURRENCY_BACKOFF,
+    )
+    cache = None if args.no_cache else AssetCache(args.cache_dir, CACHE_MAX_BYTES)
+    streaming_threshold = 0 if args.stream else STREAMING_THRESHOLD_BYTES
+
+    if args.plan:
+        print_plan(console, plan_batch(
+            args.targets,
+            args.session,
+            BASE_URL,
+            ASSETS_ENDPOINT,
+            max_workers=args.workers,
+            pattern=args.pattern,
+            cache=cache,
+            method=args.plan_method,
+            scheduler=scheduler,
+            streaming_threshold=streaming_threshold,
+            chunk_size=STREAM_CHUNK_BYTES,
+        ), args.plan)
+        return
+
+    if args.upload:
+        with make_progress(
+            args.progress, PROGRESS_TOP_N, PROGRESS_INTERVAL, PROGRESS_LOG_INTERVAL, console=console
+        ) as progress:
+            summary = run_upload(
+                args.targets,
+                args.upload,
+                pattern=args.pattern,
+                max_workers=args.upload_workers,
+                token=args.upload_token,
+                state_path=args.upload_log,
+                field=UPLOAD_FIELD,
+                url_field=UPLOAD_URL_FIELD,
+                scheduler=scheduler,
+                progress=progress,
+            )
+        print_upload(console, summary, args.upload)
+        return
+
+    # One task per asset; the aggregate view only draws the overall bar and the slowest few
+    with make_progress(
+        args.progress, PROGRESS_TOP_N, PROGRESS_INTERVAL, PROGRESS_LOG_INTERVAL, console=console
+    ) as progress:
+        summary = run_batch(
+            args.targets,
+            args.session,
+            BASE_URL,
+            ASSETS_ENDPOINT,
+            max_workers=args.workers,
+            pattern=args.pattern,
+            engine=args.engine,
+            per_host_limit=args.per_host,
+            cache=cache,
+            refresh=args.refresh,
+            scheduler=scheduler,
+            metrics=metrics,
+            streaming_threshold=streaming_threshold,
+            chunk_size=STREAM_CHUNK_BYTES,
+            progress=progress,
+            plan=plan,
+            dedup=args.dedup,
+            optimize=optimize_settings(
+                args.optimize, args.quality, scale=OPTIMIZE_SCALE, min_saving=OPTIMIZE_MIN_SAVING
+            ) if args.optimize else None,
+            index=index,
+            skip_incomplete=args.skip_incomplete,
+            concurrency=concurrency,
+        )
+
+    table = Table(show_header=False, box=None)
+    table.add_row("Markdown files:", str(summary["markdown_files"]))
+    if index is not None:
+        table.add_row("Unchanged (skipped):", str(summary["skipped_unchanged"]))
+    table.add_row("Unique URLs found:", str(summary["urls_found"]))
+    table.add_row("Images downloaded:", str(summary["downloaded"]))
+    table.add_row("From cache:", str(summary["from_cache"]))
+    table.add_row("Already existed:", str(summary["already_exists"]))
+    table.add_row("Failed downloads:", str(len(summary["failed"])))
+    table.add_row("Retries:", str(scheduler.stats()["retries"]))
+    if summary["concurrency"] is not None:
+        limits = summary["concurrency"]
+        table.add_row("Downloads in flight:", f"{limits['initial']} -> {limits['final']} "
+                      f"(range {limits['lowest']}-{limits['highest']}, "
+                      f"{limits['increases']} up / {limits['decreases']} down)")
+    if metrics is not None:
+        metrics.write(args.metrics)
+        stats = metrics.summary()
+        if stats["latency_p50"] is not None:
+            table.add_row("Latency p50 / p95 / p99:", " / ".join(
+                f"{stats[k]:.2f}s" for k in ("latency_p50", "latency_p95", "latency_p99")
+            ))
+        table.add_row("Throughput:", f"{stats['throughput_mb_s']:.2f} MB/s")
+        table.add_row("Worker utilisation:", f"{stats.get('utilisation', 0):.0%}")
+        table.add_row("Metrics written to:", str(args.metrics))
+    if summary["dedup"] is not None:
+        dedup = summary["dedup"]
+        table.add_row("Duplicates removed:", f"{dedup['removed']} ({dedup['bytes'] / 1e6:.1f} MB)")
+        if args.dedup == "corpus":
+            table.add_row("Linked across folders:", f"{dedup['linked']} ({dedup['linked_bytes'] / 1e6:.1f} MB)")
+    if summary["optimize_totals"] is not None:
+        totals = summary["optimize_totals"]
+        table.add_row("Images optimised:", f"{totals['optimized']} of {totals['images']} ({totals['resized']} resized)")
+        table.add_row("Bytes saved:", f"{totals['bytes_saved'] / 1e6:.1f} MB "
+                      f"({totals['bytes_before'] / 1e6:.1f} -> {totals['bytes_after'] / 1e6:.1f} MB)")
+    table.add_row("Files rewritten:", str(len(summary["rewritten"])))
+    if args.skip_incomplete and summary["failed_docs"]:
+        table.add_row("Left untouched:", str(len(summary["failed_docs"])))
+    console.print(Panel(table, title="Markdown Image Downloader (batch)", expand=False))
+    if summary["concurrency"] is not None and summary["concurrency"]["decisions"]:
+        console.print(concurrency_table(summary["concurrency"], limit=10))
+    if summary["optimized"]:
+        console.print(optimize_table(summary["optimized"], limit=20))
+    if summary["failed"]:
+        console.print(Panel(
+            "\n".join(summary["failed"]),
+            title="Images Not Downloaded",
+            expand=False,
+            style="red"
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+File: bench_download.py
+
+Description:
+    Throughput benchmark for the download engines against a local stand-in server.
+    Compares the original approach (bare requests.get per asset, 4 threads) with the
+    pooled "thread" engine and the "async" engine at 10 / 100 / 1000 assets.
+    Engine rows also show p95 latency and worker utilisation from DownloadMetrics,
+    to help choose --workers. The adaptive row starts the thread engine at 4 downloads
+    in flight and lets AdaptiveConcurrency find the level (up to --ceiling, capped at
+    --per-host like every real run, since all assets are on one host); its final
+    limit is printed after the row. --fault-rate adds 429s to see it back off.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - aiohttp (optional, the async row is skipped without it)
+    - local_server.py
+    - support_files/metrics.py
+    - support_files/concurrency.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_download.py --counts 10 100 1000 --workers 32 --latency 0.005
+    python benchmarks/bench_download.py --counts 1000 --fault-rate 0.02 --ceiling 64
+
+
+"""
+import argparse
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import start_server
+from support_files.concurrency import AdaptiveConcurrency
+from support_files.config import ASSETS_ENDPOINT
+from support_files.downloader import download_assets
+from support_files.metrics import DownloadMetrics
+from support_files.utils import download_image_task
+
+#####################################
+def make_jobs(base_url, count, images_dir):
+    names = [str(uuid.uuid4()) for _ in range(count)]
+    return [(f"{base_url}{ASSETS_ENDPOINT}/{name}", name, images_dir) for name in names]
+
+#####################################
+def run_baseline(jobs, workers):
+    # The pre-engine behaviour: one bare requests.get (new connection) per asset
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: download_image_task(job[0], job[1], job[2], "token"), jobs))
+
+def run_engine(engine, jobs, workers, per_host, metrics=None, concurrency=None):
+    return download_assets(
+        jobs, "token", engine=engine, max_workers=workers, per_host_limit=per_host, metrics=metrics,
+        concurrency=concurrency,
+    )
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the download engines.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--per-host", type=int, default=32)
+    parser.add_argument("--size", type=int, default=20_000, help="Asset size in bytes")
+    parser.add_argument("--latency", type=float, default=0.005, help="Server latency per request (s)")
+    parser.add_argument("--ceiling", type=int, default=64, help="Highest limit for the adaptive row")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fraction of requests answered 429")
+    args = parser.parse_args()
+
+    server, base_url = start_server(asset_size=args.size, latency=args.latency, fault_rate=args.fault_rate,
+                                    retry_after=0)
+    try:
+        import aiohttp  # noqa: F401
+        engines = ["thread", "async"]
+    except ImportError:
+        engines = ["thread"]
+
+    print(f"{'assets':>7} {'mode':<16} {'seconds':>8} {'assets/s':>9} {'MB/s':>7} {'p95 ms':>7} {'util':>5}")
+    for count in args.counts:
+        rows = [("baseline (4 thr)", lambda jobs, metrics: run_baseline(jobs, 4))]
+        rows += [
+            (f"{e} ({args.workers})", lambda jobs, metrics, e=e: run_engine(e, jobs, args.workers, args.per_host, metrics))
+            for e in engines
+        ]
+        concurrency = AdaptiveConcurrency(initial=4, floor=2, ceiling=args.ceiling)
+        rows.append((f"adaptive (4..{min(args.ceiling, args.per_host)})", lambda jobs, metrics: run_engine(
+            "thread", jobs, 4, args.per_host, metrics, concurrency
+        )))
+        for name, runner in rows:
+            with tempfile.TemporaryDirectory() as tmp:
+                jobs = make_jobs(base_url, count, Path(tmp))
+                metrics = DownloadMetrics(args.workers)
+                start = time.perf_counter()
+                results = runner(jobs, metrics)
+                elapsed = time.perf_counter() - start
+                ok = sum(1 for _, _, status in results if status == "downloaded")
+                if ok != count:
+                    print(f"  warning: {count - ok} downloads failed for {name}")
+                mb = ok * args.size / 1e6
+                stats = metrics.summary()
+                p95 = f"{stats['latency_p95'] * 1000:.1f}" if stats["latency_p95"] is not None else "-"
+                util = f"{stats['utilisation']:.0%}" if stats["assets"] else "-"
+                print(f"{count:>7} {name:<16} {elapsed:>8.3f} {ok / elapsed:>9.1f} {mb / elapsed:>7.2f} {p95:>7} {util:>5}")
+        limits = concurrency.summary()
+        print(f"{'':>7} adaptive limit {limits['initial']} -> {limits['final']} "
+              f"(range {limits['lowest']}-{limits['highest']}, {limits['decreases']} cuts)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
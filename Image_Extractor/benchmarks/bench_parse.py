@@ -0,0 +1,72 @@
+"""
+File: bench_parse.py
+
+Description:
+    Speed comparison of the Markdown / HTML aware tokenizer (parser.py) with the
+    original regex extractor (utils.extract_filtered_urls) on large synthetic files.
+    Also reports how many references each finds: the regex also picks up URLs in
+    code blocks, which the tokenizer skips.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - parser.py
+    - utils.py
+    - bench_rewrite.py (document generator)
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_parse.py --refs 1000 10000 100000
+
+
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_rewrite import make_document
+from support_files.config import BASE_URL, ASSETS_ENDPOINT
+from support_files.parser import extract_image_refs
+from support_files.utils import extract_filtered_urls
+
+CODE_BLOCK = "```bash\ncurl -L {url} -o image.png\n```\n"
+
+#####################################
+def make_large_document(refs):
+    content, mapping = make_document(refs, max(1, refs // 5))
+    # Sprinkle in code blocks that mention asset URLs but are not images
+    url = next(iter(mapping))
+    blocks = "\n".join(CODE_BLOCK.format(url=url + "-in-code") for _ in range(max(1, refs // 100)))
+    return content + "\n" + blocks
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the image reference tokenizer.")
+    parser.add_argument("--refs", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print(f"{'refs':>7} {'MB':>6} {'regex s':>8} {'urls':>6} {'parser s':>9} {'refs':>7} {'urls':>6} {'bytes s':>8} {'MB/s':>7}")
+    for refs in args.refs:
+        content = make_large_document(refs)
+        data = content.encode("utf-8")
+        mb = len(data) / 1e6
+        old, old_seconds = timed(extract_filtered_urls, content, BASE_URL, ASSETS_ENDPOINT)
+        new, new_seconds = timed(extract_image_refs, content, BASE_URL, ASSETS_ENDPOINT)
+        raw, raw_seconds = timed(extract_image_refs, data, BASE_URL, ASSETS_ENDPOINT)
+        assert [r.url for r in raw] == [r.url for r in new]
+        print(f"{refs:>7} {mb:>6.2f} {old_seconds:>8.3f} {len(old):>6} {new_seconds:>9.3f} {len(new):>7} "
+              f"{len({r.url for r in new}):>6} {raw_seconds:>8.3f} {mb / new_seconds:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+File: bench_plan.py
+
+Description:
+    Cost of planning a run compared with running it.
+    Against the local stand-in server, resolves the same assets with one-byte Range GETs
+    and with HEAD requests (no bodies), then downloads them with and without the plan's
+    resolved URLs. Executing a plan skips the GitHub redirect for every asset.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - local_server.py
+    - support_files/plan.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_plan.py --count 500 --size 2000000 --latency 0.01
+
+
+"""
+import argparse
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import start_server
+from support_files.config import ASSETS_ENDPOINT
+from support_files.downloader import download_assets
+from support_files.plan import PLAN_METHODS, plan_totals, resolve_assets
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Compare planning a download run with running it.")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--size", type=int, default=2_000_000, help="Asset size in bytes")
+    parser.add_argument("--latency", type=float, default=0.01, help="Server delay per request (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(asset_size=args.size, latency=args.latency)
+    urls = [f"{base_url}{ASSETS_ENDPOINT}/{uuid.uuid4()}" for _ in range(args.count)]
+    print(f"{args.count} assets of {args.size / 1e6:.1f} MB, {args.latency * 1000:.0f} ms per request")
+    print(f"{'step':<18} {'seconds':>8} {'MB':>9}")
+
+    resolved = None
+    for method in PLAN_METHODS:
+        entries = [{"url": url, "filename": url.rsplit("/", 1)[-1], "state": "download"} for url in urls]
+        start = time.perf_counter()
+        resolve_assets(entries, "token", args.workers, method)
+        totals = plan_totals(entries)
+        print(f"{'plan (' + method + ')':<18} {time.perf_counter() - start:>8.3f} {totals['download_bytes'] / 1e6:>9.1f}")
+        resolved = resolved or {e["url"]: e["final_url"] for e in entries if e.get("final_url")}
+
+    for label, mapping in (("download", None), ("execute plan", resolved)):
+        with tempfile.TemporaryDirectory() as tmp:
+            jobs = [(url, url.rsplit("/", 1)[-1], Path(tmp)) for url in urls]
+            start = time.perf_counter()
+            results = download_assets(
+                jobs, "token", max_workers=args.workers, per_host_limit=args.workers, resolved=mapping,
+            )
+            elapsed = time.perf_counter() - start
+            size = sum(p.stat().st_size for p in Path(tmp).glob("*.png"))
+            failed = sum(1 for r in results if r[2] == 'failed')
+        print(f"{label:<18} {elapsed:>8.3f} {size / 1e6:>9.1f}" + (f"  ({failed} failed)" if failed else ""))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
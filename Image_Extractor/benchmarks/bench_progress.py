@@ -0,0 +1,104 @@
+"""
+File: bench_progress.py
+
+Description:
+    Overhead of the progress displays on the download hot path.
+    Worker threads replay what the download engines do for each asset (one update with the
+    total size, one update per received chunk, then on_done) against:
+    - none:      no progress object (the baseline)
+    - plain:     AggregateProgress writing log lines
+    - aggregate: AggregateProgress with the rich overall bar + top-N view
+    - bars:      the original rich Progress with one bar per asset
+    and reports wall time, cost per update and redraws. Output goes to os.devnull so only
+    the bookkeeping and rendering are measured, not the terminal.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - rich (optional, the aggregate and bars rows are skipped without it)
+    - support_files/progress.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_progress.py --assets 5000 --chunks 20 --workers 32
+
+
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from support_files.progress import AggregateProgress, make_progress
+
+#####################################
+def replay(progress, assets, chunks, chunk_size, workers):
+    # Same call pattern as download_image_task: total first, then one advance per chunk
+    task_ids = [
+        progress.add_task(f"Downloading asset-{i}.png", total=1) if progress is not None else None
+        for i in range(assets)
+    ]
+    finish = getattr(progress, "finish", None)
+
+    def task(task_id):
+        if progress is not None:
+            progress.update(task_id, total=chunks * chunk_size)
+            for _ in range(chunks):
+                progress.update(task_id, advance=chunk_size)
+        if finish is not None:
+            finish(task_id, 'downloaded')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(task, task_ids))
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of each progress display.")
+    parser.add_argument("--assets", type=int, default=5000)
+    parser.add_argument("--chunks", type=int, default=20, help="Chunk updates per asset")
+    parser.add_argument("--chunk-size", type=int, default=8192)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--top-n", type=int, default=8)
+    parser.add_argument("--interval", type=float, default=0.25)
+    args = parser.parse_args()
+
+    try:
+        from rich.console import Console
+    except ImportError:
+        Console = None
+
+    updates = args.assets * (args.chunks + 1)
+    print(f"{args.assets} assets x {args.chunks} chunks, {args.workers} threads ({updates} updates)")
+    print(f"{'mode':<10} {'seconds':>8} {'+us/update':>10} {'overhead':>9} {'redraws':>8}")
+    with open(os.devnull, "w") as devnull:
+        baseline = None
+        for mode in ("none", "plain", "aggregate", "bars"):
+            if mode in ("aggregate", "bars") and Console is None:
+                print(f"{mode:<10} skipped (pip install rich)")
+                continue
+            console = Console(file=devnull, force_terminal=True, width=120) if Console else None
+            if mode == "plain":
+                display = AggregateProgress("plain", args.top_n, args.interval, log_interval=args.interval, stream=devnull)
+            elif mode == "aggregate":
+                display = AggregateProgress("rich", args.top_n, args.interval, console=console)
+            else:
+                display = make_progress(mode, args.top_n, args.interval, console=console)
+            start = time.perf_counter()
+            with display as progress:
+                replay(progress, args.assets, args.chunks, args.chunk_size, args.workers)
+            elapsed = time.perf_counter() - start
+            baseline = elapsed if baseline is None else baseline
+            redraws = getattr(progress, "renders", "-")
+            print(
+                f"{mode:<10} {elapsed:>8.3f} {(elapsed - baseline) / updates * 1e6:>10.2f} "
+                f"{elapsed / baseline:>8.1f}x {redraws:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
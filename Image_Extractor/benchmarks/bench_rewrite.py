@@ -0,0 +1,90 @@
+"""
+File: bench_rewrite.py
+
+Description:
+    Benchmark of the rewrite engine (parser.py refs spliced by rewrite.splice_refs)
+    against the original loop of one replace_url_with_image_path (str.replace) call
+    per downloaded URL, on synthetic Markdown documents with many image references.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - parser.py
+    - rewrite.py
+    - utils.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_rewrite.py --refs 10000 --unique 2000 10000
+
+
+"""
+import argparse
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from support_files.config import BASE_URL, ASSETS_ENDPOINT
+from support_files.parser import extract_image_refs
+from support_files.rewrite import splice_refs
+from support_files.utils import replace_url_with_image_path
+
+#####################################
+def make_document(refs, unique, seed=0):
+    """
+    Build a Markdown document with `refs` image references spread over `unique` asset URLs.
+    Returns (content, {url: image_rel_path}).
+    """
+    rng = random.Random(seed)
+    names = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(unique)]
+    mapping = {f"{BASE_URL}{ASSETS_ENDPOINT}/{name}": f"Images/{name}.png" for name in names}
+    urls = list(mapping)
+    lines = []
+    for i in range(refs):
+        url = urls[i % unique]
+        if i % 2:
+            lines.append(f'Some text about step {i}.\n<img width="46" height="46" alt="image" src="{url}" />\n')
+        else:
+            lines.append(f"Paragraph {i} with a screenshot:\n\n![image]({url})\n")
+    return "\n".join(lines), mapping
+
+#####################################
+def loop_rewrite(content, mapping):
+    for url, image_rel_path in mapping.items():
+        content = replace_url_with_image_path(content, url, image_rel_path)
+    return content
+
+def engine_rewrite(content, mapping):
+    # What extract / batch do: tokenize once, then splice the local paths in by offset
+    return splice_refs(content, extract_image_refs(content, BASE_URL, ASSETS_ENDPOINT), mapping)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rewrite engine.")
+    parser.add_argument("--refs", type=int, default=10_000, help="Image references per document")
+    parser.add_argument("--unique", type=int, nargs="+", default=[100, 2_000, 10_000], help="Distinct URLs")
+    args = parser.parse_args()
+
+    print(f"{'refs':>7} {'unique':>7} {'doc MB':>7} {'loop s':>8} {'engine s':>9} {'speedup':>8}")
+    for unique in args.unique:
+        content, mapping = make_document(args.refs, min(unique, args.refs))
+        expected, loop_seconds = timed(loop_rewrite, content, mapping)
+        (actual, replaced), engine_seconds = timed(engine_rewrite, content, mapping)
+        assert actual == expected, "rewrite engine output differs from the str.replace loop"
+        assert len(replaced) == args.refs
+        print(f"{args.refs:>7} {len(mapping):>7} {len(content) / 1e6:>7.2f} "
+              f"{loop_seconds:>8.3f} {engine_seconds:>9.3f} {loop_seconds / engine_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
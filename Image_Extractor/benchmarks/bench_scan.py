@@ -0,0 +1,108 @@
+"""
+File: bench_scan.py
+
+Description:
+    Corpus scan benchmark: how fast a batch run finds the asset references in a tree of
+    Markdown files, most of which (like a real docs repo) have none.
+    Compares, over the same synthetic corpus:
+    - regex:  read as str, then the original utils.extract_filtered_urls
+    - parser: read as str, then the tokenizer (the previous collect_assets path)
+    - mmap:   scan.scan_file: memory-mapped bytes, substring pre-check, tokenizer only on
+              files that can contain an asset, only matched slices decoded
+    and reports files/second, MB/s and the references found (the regex counts unique URLs
+    per file and also picks up URLs in code blocks).
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - parser.py
+    - scan.py
+    - utils.py
+    - bench_rewrite.py (document generator)
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_scan.py --files 2000 --size 50000 --hit-rate 0.1
+
+
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_rewrite import make_document
+from support_files.config import BASE_URL, ASSETS_ENDPOINT
+from support_files.parser import extract_image_refs
+from support_files.scan import scan_file
+from support_files.utils import extract_filtered_urls
+
+PROSE = (
+    "Set the option in `config.py` and run the script again. See https://example.com/docs "
+    "for details, or the [install guide](install.md).\n\n"
+)
+
+#####################################
+def make_corpus(root, files, size, hit_rate, seed=0):
+    """
+    Write `files` Markdown files of about `size` bytes; a hit_rate share reference assets.
+    Returns the total bytes written.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for i in range(files):
+        content = PROSE * max(1, size // len(PROSE))
+        if rng.random() < hit_rate:
+            refs, _ = make_document(20, 10, seed=i)
+            content = content[: len(content) // 2] + refs + content[len(content) // 2:]
+        path = root / f"dir{i % 50}" / f"doc{i}.md"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+        total += path.stat().st_size
+    return total
+
+def scan_regex(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return extract_filtered_urls(f.read(), BASE_URL, ASSETS_ENDPOINT)
+
+def scan_parser(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return extract_image_refs(f.read(), BASE_URL, ASSETS_ENDPOINT)
+
+def scan_mmap(path):
+    return scan_file(path, BASE_URL, ASSETS_ENDPOINT)
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanning a Markdown corpus for asset URLs.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=50_000, help="Approximate bytes per file")
+    parser.add_argument("--hit-rate", type=float, default=0.1, help="Share of files that reference assets")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many passes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        total = make_corpus(root, args.files, args.size, args.hit_rate)
+        paths = sorted(root.glob("**/*.md"))
+        mb = total / 1e6
+        print(f"{len(paths)} files, {mb:.1f} MB, {args.hit_rate:.0%} with assets (best of {args.repeat}, warm cache)")
+        print(f"{'scanner':<8} {'seconds':>8} {'files/s':>9} {'MB/s':>8} {'refs':>7}")
+        for name, scan in (("regex", scan_regex), ("parser", scan_parser), ("mmap", scan_mmap)):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                found = sum(len(scan(path)) for path in paths)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{name:<8} {best:>8.3f} {len(paths) / best:>9.0f} {mb / best:>8.1f} {found:>7}")
+
+
+if __name__ == "__main__":
+    main()
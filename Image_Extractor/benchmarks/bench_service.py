@@ -0,0 +1,107 @@
+"""
+File: bench_service.py
+
+Description:
+    What a long-lived worker saves over one process per CI push.
+    Against the local stand-in server, processes the same stream of small jobs (a few
+    Markdown files with a few new assets each) three ways:
+    - cold:    a fresh interpreter per job (python batch.py), as CI runs it today
+    - per run: run_batch per job in this process, new connection pool and threads each time
+    - service: the queue and ExtractorService, one warm DownloadPool for every job
+    and reports seconds per job.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - local_server.py
+    - support_files/service.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_service.py --jobs 20 --files 3 --assets 5 --latency 0.01
+
+
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import start_server
+from support_files.batch import run_batch
+from support_files.config import ASSETS_ENDPOINT
+from support_files.jobqueue import JobQueue
+from support_files.service import ExtractorService
+
+ROOT = Path(__file__).resolve().parent.parent
+
+#####################################
+def make_job(root, base_url, job, files, assets):
+    # One CI push: `files` Markdown files, each linking `assets` new assets
+    paths = []
+    for f in range(files):
+        path = root / f"job{job}" / f"doc{f}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("".join(
+            f"![shot]({base_url}{ASSETS_ENDPOINT}/{uuid.uuid4()})\n" for _ in range(assets)
+        ), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+def run_cold(paths, base_url, workers):
+    subprocess.run(
+        [sys.executable, "-c",
+         "import sys; from support_files.batch import run_batch; "
+         f"run_batch(sys.argv[1:], 'token', {base_url!r}, {ASSETS_ENDPOINT!r}, max_workers={workers})",
+         *map(str, paths)],
+        cwd=ROOT, check=True,
+    )
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-run processes with the warm worker service.")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--files", type=int, default=3, help="Markdown files per job")
+    parser.add_argument("--assets", type=int, default=5, help="New assets per file")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01, help="Server delay per request (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency)
+    print(f"{args.jobs} jobs of {args.files} files x {args.assets} assets, {args.latency * 1000:.0f} ms per request")
+    print(f"{'mode':<10} {'seconds':>8} {'per job':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for mode in ("cold", "per run", "service"):
+            jobs = [make_job(root / mode, base_url, j, args.files, args.assets) for j in range(args.jobs)]
+            start = time.perf_counter()
+            if mode == "cold":
+                for paths in jobs:
+                    run_cold(paths, base_url, args.workers)
+            elif mode == "per run":
+                for paths in jobs:
+                    run_batch(paths, "token", base_url, ASSETS_ENDPOINT, max_workers=args.workers)
+            else:
+                queue = JobQueue(root / "queue.sqlite3")
+                service = ExtractorService(
+                    queue, "token", base_url, ASSETS_ENDPOINT, max_workers=args.workers, batch_size=args.files,
+                )
+                for paths in jobs:
+                    queue.enqueue(paths)
+                service.serve(once=True)
+                queue.close()
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<10} {elapsed:>8.3f} {elapsed / args.jobs * 1000:>7.0f}ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
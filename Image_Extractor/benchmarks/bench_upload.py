@@ -0,0 +1,114 @@
+"""
+File: bench_upload.py
+
+Description:
+    Reverse pipeline benchmark against the local stand-in upload endpoint.
+    Builds a corpus of Markdown files linking to local Images/ files (a share of them
+    identical copies), uploads them with run_upload at several worker counts, checks that
+    every reference now points at a hosted URL whose bytes match the local file, then runs
+    again over the same documents restored to local paths to show the upload log skipping
+    everything that is already hosted.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - local_server.py
+    - support_files/upload.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/bench_upload.py --docs 50 --images 20 --size 200000 --latency 0.01
+
+
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from local_server import start_server
+from support_files.retry import RetryScheduler
+from support_files.scan import scan_local_images
+from support_files.upload import run_upload
+
+#####################################
+def make_corpus(root, docs, images, size, duplicate_rate=0.1):
+    """
+    Write docs Markdown files, each in its own folder with `images` local images of about
+    `size` bytes; roughly duplicate_rate of the images repeat an earlier one byte for byte.
+    """
+    shared = os.urandom(size)
+    for d in range(docs):
+        folder = root / f"doc{d}"
+        (folder / "Images").mkdir(parents=True)
+        lines = [f"# Document {d}\n"]
+        for i in range(images):
+            name = f"img{i}.png"
+            duplicate = (d * images + i) % int(1 / duplicate_rate) == 0 if duplicate_rate else False
+            (folder / "Images" / name).write_bytes(shared if duplicate else os.urandom(size))
+            lines.append(f"![shot {i}](Images/{name})\n" if i % 2 else f'<img src="Images/{name}" width="46">\n')
+        (folder / "notes.md").write_text("\n".join(lines), encoding="utf-8")
+
+def check_rewritten(root, server):
+    # Every reference rewritten to a hosted URL, with the bytes of the local file behind it
+    mismatched = 0
+    for md_path in root.glob("**/*.md"):
+        if scan_local_images(md_path):
+            mismatched += 1
+    hosted = {bytes(data) for data in server.uploads.values()}
+    for image in root.glob("**/Images/*.png"):
+        if image.read_bytes() not in hosted:
+            mismatched += 1
+    return mismatched
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark uploading local images back to an asset host.")
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--images", type=int, default=20, help="Images per document")
+    parser.add_argument("--size", type=int, default=200_000, help="Image size in bytes")
+    parser.add_argument("--latency", type=float, default=0.01, help="Server delay per request (s)")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Share of uploads answered with 429")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source"
+        make_corpus(source, args.docs, args.images, args.size)
+        total = args.docs * args.images
+        print(f"{args.docs} documents, {total} images of {args.size / 1e3:.0f} kB, "
+              f"{args.latency * 1000:.0f} ms per request")
+        print(f"{'run':<16} {'seconds':>8} {'uploaded':>9} {'skipped':>8} {'MB/s':>7} {'bad':>4}")
+        for workers in args.workers:
+            server, base_url = start_server(latency=args.latency, fault_rate=args.fault_rate, retry_after=0)
+            work = Path(tmp) / f"w{workers}"
+            shutil.copytree(source, work)
+            log_path = Path(tmp) / f"uploads{workers}.json"
+            scheduler = RetryScheduler(attempts=5, base_delay=0.01, max_delay=0.1, budget=10 ** 6)
+            for label in (f"{workers} workers", "  rerun (log)"):
+                if label.startswith("  "):
+                    # Put the local paths back: everything is in the upload log already
+                    shutil.rmtree(work)
+                    shutil.copytree(source, work)
+                start = time.perf_counter()
+                summary = run_upload(
+                    [work], f"{base_url}/upload", max_workers=workers, state_path=log_path, scheduler=scheduler,
+                )
+                elapsed = time.perf_counter() - start
+                bad = check_rewritten(work, server) + len(summary["failed"])
+                print(f"{label:<16} {elapsed:>8.3f} {summary['uploaded']:>9} "
+                      f"{summary['already_uploaded'] + summary['duplicates']:>8} "
+                      f"{summary['bytes_uploaded'] / 1e6 / elapsed:>7.1f} {bad:>4}")
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+File: local_server.py
+
+Description:
+    Local stand-in for github.com used by the benchmarks.
+    Serves /user-attachments/assets/<uuid> as a 302 redirect to /s3/<uuid>.png
+    (like GitHub redirecting to its S3 bucket) and answers /s3/ with a fixed-size body
+    and an ETag (304 Not Modified when If-None-Match matches, 206 Partial Content for
+    a Range request whose If-Range matches).
+    Speaks HTTP/1.1 so clients can keep connections alive.
+    latency delays every request; bandwidth caps each response body at that many bytes/second.
+    Faults can be injected for the retry benchmark: a share of /s3/ requests is answered
+    with 429 + Retry-After (fault_rate), and a share is cut off half way through the
+    body by closing the connection (reset_rate).
+    It also stands in for an upload endpoint: POST /upload takes a multipart/form-data
+    body, keeps the "file" part in memory and answers 201 {"url": ".../uploaded/<sha256>.<ext>"}
+    (or 429 for a fault_rate share); GET /uploaded/ serves the stored files.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - hashlib
+    - http.server
+    - json
+    - threading
+
+Usage:
+    from local_server import start_server
+    server, base_url = start_server(asset_size=20_000, latency=0.005)
+    server, base_url = start_server(asset_size=500_000, bandwidth=2_000_000)   # 2 MB/s per download
+    server, base_url = start_server(fault_rate=0.2, reset_rate=0.1, retry_after=1)
+    # upload endpoint: f"{base_url}/upload"; server.uploads is {sha256: bytes}
+    ...
+    server.shutdown()
+
+
+"""
+import hashlib
+import http.server
+import json
+import random
+import threading
+import time
+
+#####################################
+class AssetHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    asset_size = 20_000
+    latency = 0.0
+    bandwidth = 0
+    fault_rate = 0.0
+    reset_rate = 0.0
+    retry_after = "1"
+    faults = None  # {"429": n, "reset": n}, shared by every handler of one server
+    uploads = None  # {sha256: bytes} posted to /upload
+    upload_names = None  # {"<sha256>.<ext>": sha256}
+    ranges = None  # start offsets of the Range requests answered with 206
+    rng = random.Random(0)
+
+    def _send(self, status, headers=(), body=b""):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self._write(body)
+
+    def _write(self, body):
+        # At most `bandwidth` bytes/second per response (0 = as fast as the socket goes)
+        if not self.bandwidth:
+            self.wfile.write(body)
+            return
+        chunk = max(1024, self.bandwidth // 50)
+        start = time.perf_counter()
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset:offset + chunk])
+            ahead = (offset + chunk) / self.bandwidth - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.path.startswith("/user-attachments/assets/"):
+            uuid = self.path.rstrip("/").split("/")[-1]
+            self._send(302, [("Location", f"/s3/{uuid}.png")])
+        elif self.path.startswith("/s3/"):
+            etag = f'"{self.asset_size}"'
+            body = b"\x89PNG" + b"\0" * (self.asset_size - 4)
+            roll = self.rng.random()
+            if roll < self.fault_rate:
+                self.faults["429"] += 1
+                self._send(429, [("Retry-After", self.retry_after)])
+                return
+            if roll < self.fault_rate + self.reset_rate:
+                # Promise the whole body, send half of it, then drop the connection
+                self.faults["reset"] += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            ranged = self.headers.get("Range", "")
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, [("ETag", etag)])
+            elif ranged.startswith("bytes=") and self.headers.get("If-Range") in (None, etag):
+                first, _, last = ranged[6:].partition("-")
+                start = int(first)
+                end = min(int(last), len(body) - 1) if last else len(body) - 1
+                if start >= len(body):
+                    self._send(416, [("Content-Range", f"bytes */{len(body)}")])
+                else:
+                    self.ranges.append(start)
+                    self._send(206, [
+                        ("Content-Type", "image/png"), ("ETag", etag),
+                        ("Content-Range", f"bytes {start}-{end}/{len(body)}"),
+                    ], body[start:end + 1])
+            else:
+                self._send(200, [("Content-Type", "image/png"), ("ETag", etag)], body)
+        elif self.path.startswith("/uploaded/"):
+            sha256 = self.upload_names.get(self.path.rsplit("/", 1)[-1])
+            if sha256 is None:
+                self._send(404)
+            else:
+                self._send(200, [("Content-Type", "application/octet-stream")], self.uploads[sha256])
+        else:
+            self._send(404)
+
+    do_HEAD = do_GET
+
+    def _form_file(self, body, field="file"):
+        # (file name, bytes) of one multipart/form-data part, or (None, None)
+        boundary = self.headers.get("Content-Type", "").partition("boundary=")[2].strip('"')
+        if not boundary:
+            return None, None
+        for part in body.split(b"--" + boundary.encode()):
+            head, _, data = part.partition(b"\r\n\r\n")
+            if f'name="{field}"'.encode() in head:
+                filename = head.partition(b'filename="')[2].partition(b'"')[0].decode()
+                return filename, data[:-2]  # without the CRLF before the next boundary
+        return None, None
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.path.startswith("/upload"):
+            self._send(404)
+            return
+        if self.rng.random() < self.fault_rate:
+            self.faults["429"] += 1
+            self._send(429, [("Retry-After", self.retry_after)])
+            return
+        filename, data = self._form_file(body)
+        if data is None:
+            self._send(400)
+            return
+        sha256 = hashlib.sha256(data).hexdigest()
+        name = sha256 + (("." + filename.rsplit(".", 1)[-1]) if "." in filename else "")
+        self.uploads[sha256] = data
+        self.upload_names[name] = sha256
+        host = self.headers.get("Host", "127.0.0.1")
+        self._send(201, [("Content-Type", "application/json")],
+                   json.dumps({"url": f"http://{host}/uploaded/{name}"}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+#####################################
+def start_server(
+    asset_size=20_000, latency=0.0, fault_rate=0.0, reset_rate=0.0, retry_after=1, seed=0, bandwidth=0,
+):
+    """
+    Start the stand-in server on a free localhost port in a background thread.
+    Returns (server, base_url); server.faults counts the faults injected so far,
+    server.ranges lists the start of every Range request answered with 206
+    and server.uploads holds what was posted to /upload.
+    """
+    handler = type("Handler", (AssetHandler,), {
+        "asset_size": asset_size,
+        "latency": latency,
+        "bandwidth": bandwidth,
+        "fault_rate": fault_rate,
+        "reset_rate": reset_rate,
+        "retry_after": str(retry_after),
+        "faults": {"429": 0, "reset": 0},
+        "uploads": {},
+        "upload_names": {},
+        "ranges": [],
+        "rng": random.Random(seed),
+    })
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.faults = handler.faults
+    server.uploads = handler.uploads
+    server.ranges = handler.ranges
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
@@ -0,0 +1,256 @@
+"""
+File: suite.py
+
+Description:
+    Regression benchmark suite for the Markdown Image Downloader.
+    Runs a fixed set of throughput measurements on synthetic fixtures and compares them
+    with a saved baseline, so a change that slows down utils.py, the tokenizer, the
+    rewrite or the download engine shows up before it ships:
+    - extract:  references found per second in generated documents of 1 to 100k references
+                (the original utils regex, the tokenizer, and the mmap scanner on disk), and MB/s
+                for a very large file with few assets (mmap and streamed), where only the
+                paragraphs around the assets are tokenized
+    - rewrite:  the production rewrite paths on the same documents (MB/s): rewrite.splice_refs
+                on parsed refs, scan.rewrite_file on disk, streaming.stream_rewrite (large files)
+    - scan:     a corpus of Markdown files of mixed sizes, 10% with assets (files/s)
+    - download: assets/s and MB/s through the thread engine from the local stand-in server,
+                with GitHub-style redirects to /s3/, per-request latency and a bandwidth cap
+    Every result is the best of --repeat timed runs (each looped to at least 0.2 s). A baseline is a JSON file of results
+    (plus the machine it was made on); --compare exits with status 1 if any result is more
+    than --tolerance worse than its baseline, so CI can fail on a regression.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - json
+    - platform
+    - timeit
+    - local_server.py
+    - bench_parse.py / bench_rewrite.py / bench_scan.py (fixture generators)
+    - support_files (parser, rewrite, scan, streaming, utils, downloader)
+
+Usage:
+    Run from the Image_Extractor folder:
+    python benchmarks/suite.py --save benchmarks/baseline.json      # record a baseline
+    python benchmarks/suite.py --compare benchmarks/baseline.json   # fail if > 25% worse
+    python benchmarks/suite.py --quick --only extract rewrite
+
+
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import timeit
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_parse import make_large_document
+from bench_rewrite import make_document
+from bench_scan import PROSE, make_corpus
+from local_server import start_server
+from support_files.config import BASE_URL, ASSETS_ENDPOINT, STREAM_CHUNK_BYTES
+from support_files.downloader import download_assets
+from support_files.parser import extract_image_refs
+from support_files.rewrite import splice_refs
+from support_files.scan import rewrite_file, scan_file
+from support_files.streaming import stream_image_refs, stream_rewrite
+from support_files.utils import extract_filtered_urls
+
+BASELINE_VERSION = 1
+SECTIONS = ("extract", "rewrite", "scan", "download")
+
+#####################################
+def best_of(repeat, func, *args):
+    """
+    (fastest seconds per call, result of one call). Calls are looped (timeit.autorange) until
+    a run takes at least 0.2 s, so tiny fixtures are not lost in timer noise; that also warms up.
+    """
+    result = func(*args)
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number, result
+
+def record(results, name, value, unit, better="higher"):
+    results[name] = {"value": round(value, 3), "unit": unit, "better": better}
+    print(f"{name:<32} {value:>12.1f} {unit}")
+
+#####################################
+def bench_extract(results, ref_counts, repeat, tmp):
+    for refs in ref_counts:
+        content = make_large_document(refs)
+        path = Path(tmp) / f"extract_{refs}.md"
+        path.write_text(content, encoding="utf-8")
+        seconds, _ = best_of(repeat, extract_filtered_urls, content, BASE_URL, ASSETS_ENDPOINT)
+        record(results, f"extract.regex.{refs}", refs / seconds, "refs/s")
+        seconds, found = best_of(repeat, extract_image_refs, content, BASE_URL, ASSETS_ENDPOINT)
+        assert len(found) == refs, f"tokenizer found {len(found)} of {refs} references"
+        record(results, f"extract.parser.{refs}", refs / seconds, "refs/s")
+        seconds, found = best_of(repeat, scan_file, path, BASE_URL, ASSETS_ENDPOINT)
+        assert len(found) == refs, f"mmap scan found {len(found)} of {refs} references"
+        record(results, f"extract.mmap.{refs}", refs / seconds, "refs/s")
+
+def bench_sparse(results, size, repeat, tmp):
+    # 20 paragraphs of 20 references spread over size bytes of prose
+    refs, _ = make_document(20, 10)
+    prose = PROSE * max(1, size // 20 // len(PROSE))
+    data = ((prose + refs) * 20).encode("utf-8")
+    path = Path(tmp) / "sparse.md"
+    path.write_bytes(data)
+    seconds, found = best_of(repeat, scan_file, path, BASE_URL, ASSETS_ENDPOINT)
+    assert len(found) == 400, f"mmap scan found {len(found)} of 400 references"
+    record(results, "extract.sparse.mmap", len(data) / 1e6 / seconds, "MB/s")
+    seconds, found = best_of(repeat, lambda: list(stream_image_refs(path, BASE_URL, ASSETS_ENDPOINT)))
+    assert len(found) == 400, f"streamed scan found {len(found)} of 400 references"
+    record(results, "extract.sparse.stream", len(data) / 1e6 / seconds, "MB/s")
+
+def bench_rewrite(results, ref_counts, repeat, tmp):
+    for refs in ref_counts:
+        content, mapping = make_document(refs, max(1, refs // 5))
+        data = content.encode("utf-8")
+        found = extract_image_refs(data, BASE_URL, ASSETS_ENDPOINT)
+        seconds, (_, replaced) = best_of(repeat, splice_refs, data, found, mapping)
+        assert len(replaced) == refs
+        record(results, f"rewrite.splice.{refs}", len(data) / 1e6 / seconds, "MB/s")
+
+        # Both rewrite the file in place, so every run starts from a fresh copy of the original
+        path = Path(tmp) / f"rewrite_{refs}.md"
+
+        def on_disk():
+            path.write_bytes(data)
+            return rewrite_file(path, found, mapping, BASE_URL, ASSETS_ENDPOINT)
+
+        def streamed():
+            path.write_bytes(data)
+            return stream_rewrite(path, mapping, BASE_URL, ASSETS_ENDPOINT, STREAM_CHUNK_BYTES)
+
+        seconds, replaced = best_of(repeat, on_disk)
+        assert replaced == refs
+        record(results, f"rewrite.file.{refs}", len(data) / 1e6 / seconds, "MB/s")
+        seconds, replaced = best_of(repeat, streamed)
+        assert replaced == refs
+        record(results, f"rewrite.stream.{refs}", len(data) / 1e6 / seconds, "MB/s")
+
+def bench_scan(results, files, repeat, tmp):
+    root = Path(tmp) / "corpus"
+    (root / "small").mkdir(parents=True)
+    (root / "large").mkdir()
+    # Mixed sizes: mostly small pages, some long ones
+    make_corpus(root / "small", files * 3 // 4, 4_000, 0.1, seed=1)
+    make_corpus(root / "large", files - files * 3 // 4, 200_000, 0.1, seed=2)
+    paths = sorted(root.glob("**/*.md"))
+    size = sum(p.stat().st_size for p in paths)
+    seconds, _ = best_of(repeat, lambda: [scan_file(p, BASE_URL, ASSETS_ENDPOINT) for p in paths])
+    record(results, "scan.files", len(paths) / seconds, "files/s")
+    record(results, "scan.bytes", size / 1e6 / seconds, "MB/s")
+
+def bench_download(results, count, size, latency, bandwidth, workers, repeat, tmp):
+    server, base_url = start_server(asset_size=size, latency=latency, bandwidth=bandwidth)
+    try:
+        best = None
+        for attempt in range(repeat):
+            images_dir = Path(tmp) / f"download_{attempt}"
+            images_dir.mkdir()
+            names = [str(uuid.uuid4()) for _ in range(count)]
+            jobs = [(f"{base_url}{ASSETS_ENDPOINT}/{name}", name, images_dir) for name in names]
+            start = time.perf_counter()
+            downloaded = download_assets(jobs, "token", max_workers=workers, per_host_limit=workers)
+            elapsed = time.perf_counter() - start
+            failed = sum(1 for r in downloaded if r[2] != 'downloaded')
+            assert not failed, f"{failed} of {count} downloads failed"
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        server.shutdown()
+    record(results, "download.assets", count / best, "assets/s")
+    record(results, "download.bytes", count * size / 1e6 / best, "MB/s")
+
+#####################################
+def save_baseline(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": BASELINE_VERSION,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "results": results,
+        }, f, indent=2)
+
+def compare_baseline(results, path, tolerance):
+    """
+    Print each result against the baseline. Returns the names that got worse by more
+    than tolerance (lower for throughputs, higher for results recorded with better="lower").
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path} is not a version {BASELINE_VERSION} baseline")
+    if baseline.get("machine") != platform.platform():
+        print(f"Note: baseline made on {baseline.get('machine')}, results may not be comparable")
+    regressed = []
+    print(f"\n{'benchmark':<32} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        change = result["value"] / before["value"] - 1 if before["value"] else 0.0
+        worse = -change if result.get("better", "higher") == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {before['value']:>12.1f} {result['value']:>12.1f} {change:>+7.0%}{flag}")
+    return regressed
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Regression benchmarks for the Markdown Image Downloader.")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--quick", action="store_true",
+                        help="Smaller fixtures (up to 10k references, a 16 MB sparse file, 200 files)")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs")
+    parser.add_argument("--assets", type=int, default=200, help="Assets per download run")
+    parser.add_argument("--size", type=int, default=100_000, help="Asset size in bytes")
+    parser.add_argument("--latency", type=float, default=0.005, help="Server delay per request (s)")
+    parser.add_argument("--bandwidth", type=int, default=10_000_000, help="Bytes/s per download (0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--save", metavar="BASELINE", help="Write the results as a baseline")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a baseline, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed change for the worse before failing")
+    args = parser.parse_args()
+
+    ref_counts = [1, 100, 10_000] if args.quick else [1, 100, 10_000, 100_000]
+    results = {}
+    print(f"{'benchmark':<32} {'result':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if "extract" in args.only:
+            bench_extract(results, ref_counts, args.repeat, tmp)
+            bench_sparse(results, 16_000_000 if args.quick else 64_000_000, args.repeat, tmp)
+        if "rewrite" in args.only:
+            bench_rewrite(results, ref_counts, args.repeat, tmp)
+        if "scan" in args.only:
+            bench_scan(results, 200 if args.quick else 2000, args.repeat, tmp)
+        if "download" in args.only:
+            bench_download(
+                results, args.assets // 4 if args.quick else args.assets, args.size, args.latency,
+                args.bandwidth, args.workers, args.repeat, tmp,
+            )
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        regressed = compare_baseline(results, args.compare, args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} benchmarks more than {args.tolerance:.0%} worse than the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,165 +14,196 @@ Dependencies:
     - tkinter
     - rich
     - requests
+    - extract.py (extract_images, the importable pipeline)
+    - cache.py
+    - concurrency.py
+    - retry.py
+    - metrics.py
+    - optimize.py
+    - progress.py
     - utils.py
     - config.py
 
 Usage:
     Run this script to select a Markdown file and automatically download and relink images.
     I found it best to run from a bash terminal and not from PowerShell.
+    Importing this module has no side effects; tkinter and rich are only loaded when main() runs.
+    To call the pipeline from other code use support_files.extract.extract_images.
 
 Version:
     003 - main_parallel_multi_progress
+    004 - Pipeline moved to extract_images; GUI / console set up in main() only
+    005 - Aggregated progress view (PROGRESS_MODE), per-asset bars kept as "bars"
+    006 - Adaptive download concurrency (ADAPTIVE_CONCURRENCY), MAX_WORKERS is only the start
 """
 
-from support_files.utils import (
-    clear_terminal,
-    extract_filtered_urls,
-    get_final_url_and_filename,
-    replace_url_with_image_path,
-)
+from support_files.utils import clear_terminal
+from support_files.extract import extract_images
+from support_files.cache import AssetCache
 from support_files.config import (
     USER_SESSION,
     BASE_URL,
     ASSETS_ENDPOINT,
     DEFAULT_FILE_PATH,
+    MAX_WORKERS,
+    DOWNLOAD_ENGINE,
+    PER_HOST_LIMIT,
+    ADAPTIVE_CONCURRENCY,
+    CONCURRENCY_FLOOR,
+    CONCURRENCY_CEILING,
+    CONCURRENCY_BACKOFF,
+    CONCURRENCY_MAX_ERROR_RATE,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    USE_CACHE,
+    CACHE_DIR,
+    CACHE_MAX_BYTES,
+    REFRESH_EXISTING,
+    STREAMING_THRESHOLD_BYTES,
+    STREAM_CHUNK_BYTES,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET,
+    REQUESTS_PER_SECOND,
+    REQUEST_BURST,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    METRICS_PATH,
+    PROGRESS_MODE,
+    PROGRESS_TOP_N,
+    PROGRESS_INTERVAL,
+    PROGRESS_LOG_INTERVAL,
+    DEDUP_IMAGES,
+    OPTIMIZE_IMAGES,
+    OPTIMIZE_QUALITY,
+    OPTIMIZE_SCALE,
+    OPTIMIZE_MIN_SAVING,
 )
-import tkinter as tk
-from tkinter import filedialog
+from support_files.concurrency import AdaptiveConcurrency
+from support_files.metrics import DownloadMetrics
+from support_files.optimize import optimize_settings
+from support_files.progress import make_progress
+from support_files.retry import RetryScheduler
 from pathlib import Path
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.progress import (
-    Progress,
-    BarColumn,
-    TextColumn,
-    TimeElapsedColumn,
-    DownloadColumn,
-    TaskProgressColumn,
-)
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import os
-
-# Clear terminal at the start
-clear_terminal()
-console = Console()
-
-# Create a hidden root window for file dialog
-root = tk.Tk()
-root.withdraw()
-
-# Open file picker for .md files
-file_path = filedialog.askopenfilename(
-    initialdir=DEFAULT_FILE_PATH,
-    title="Select a Markdown file",
-    filetypes=[("Markdown files", "*.md")]
-)
-if not file_path:
-    console.print("[red]No file selected. Exiting.[/red]")
-    exit()
-
-# Read the file content
-with open(file_path, "r", encoding="utf-8") as f:
-    content = f.read()
-
-# Extract and filter URLs (returns list of (url, filename) tuples)
-filtered_urls = extract_filtered_urls(content, BASE_URL, ASSETS_ENDPOINT)
-total_urls = len(filtered_urls)
-
-# Prepare images directory
-md_dir = Path(file_path).parent
-images_dir = md_dir / "Images"
-images_dir.mkdir(exist_ok=True)
-
-# Tracking variables
-downloaded = 0
-already_exists = 0
-failed_images = []
-
-def download_image_task(url, filename, images_dir, session, progress, task_id):
-    # Check if any file with this base name exists in the images directory (any extension)
-    existing_files = list(images_dir.glob(f"{filename}.*"))
-    if existing_files:
-        progress.update(task_id, completed=1)
-        return url, None, 'exists'
-    # Get the redirected URL and download
-    final_url, redirected_filename, response = get_final_url_and_filename(url, session)
-    ext = Path(redirected_filename).suffix if redirected_filename else ""
-    image_path = images_dir / f"{filename}{ext}"
-    image_rel_path = f"Images/{filename}{ext}"
-    if final_url and response:
-        total = int(response.headers.get('content-length', 0))
-        progress.update(task_id, total=total)
-        try:
-            with open(image_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        progress.update(task_id, advance=len(chunk))
-            if image_path.exists():
-                progress.update(task_id, completed=total)
-                return url, image_rel_path, 'downloaded'
-        except Exception as e:
-            pass
-    progress.update(task_id, completed=1)
-    return url, None, 'failed'
-
-# Progress bars for each image, elapsed time only
-with Progress(
-    TextColumn("[progress.description]{task.description}"),
-    BarColumn(),
-    TaskProgressColumn(),
-    DownloadColumn(),
-    TimeElapsedColumn(),  # Only elapsed time
-    console=console,
-    transient=False,
-) as progress:
-    # Prepare download tasks and progress bars
-    task_ids = [
-        progress.add_task(f"Downloading {filename}", total=1)
-        for url, filename in filtered_urls
-    ]
-    results = []
-    # Submit download tasks in parallel
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = [
-            executor.submit(
-                download_image_task, url, filename, images_dir, USER_SESSION, progress, task_id
-            )
-            for (url, filename), task_id in zip(filtered_urls, task_ids)
-        ]
-        for future in as_completed(futures):
-            url, image_rel_path, status = future.result()
-            results.append((url, image_rel_path, status))
-
-# After all downloads, update the Markdown content
-for url, image_rel_path, status in results:
-    if status == 'downloaded' and image_rel_path:
-        content = replace_url_with_image_path(content, url, image_rel_path)
-        downloaded += 1
-    elif status == 'exists':
-        already_exists += 1
-    else:
-        failed_images.append(url)
-
-# Write the updated content back to the Markdown file
-with open(file_path, "w", encoding="utf-8") as f:
-    f.write(content)
-
-# Logging output
-summary = Table(show_header=False, box=None)
-summary.add_row("Markdown file:", Path(file_path).name)
-summary.add_row("URLs found:", str(total_urls))
-summary.add_row("Images downloaded:", str(downloaded))
-summary.add_row("Already existed:", str(already_exists))
-summary.add_row("Failed downloads:", str(len(failed_images)))
-console.print(Panel(summary, title="Markdown Image Downloader", expand=False))
-if failed_images:
-    failed_panel = Panel(
-        "\n".join(str(img) for img in failed_images),
-        title="Images Not Downloaded",
-        expand=False,
-        style="red"
+
+#####################################
+def main():
+    # Interactive-only imports: importing main.py (or support_files) never loads tkinter or rich
+    import tkinter as tk
+    from tkinter import filedialog
+    from rich.console import Console
+    from rich.table import Table
+    from rich.panel import Panel
+
+    # Clear terminal at the start
+    clear_terminal()
+    console = Console()
+
+    # Create a hidden root window for file dialog
+    root = tk.Tk()
+    root.withdraw()
+
+    # Open file picker for .md files
+    file_path = filedialog.askopenfilename(
+        initialdir=DEFAULT_FILE_PATH,
+        title="Select a Markdown file",
+        filetypes=[("Markdown files", "*.md")]
     )
-    console.print(failed_panel)
+    root.destroy()
+    if not file_path:
+        console.print("[red]No file selected. Exiting.[/red]")
+        return
+
+    metrics = DownloadMetrics(MAX_WORKERS, DOWNLOAD_ENGINE) if METRICS_PATH else None
+    # MAX_WORKERS is a starting guess: measured latency, errors and throughput move it from there
+    concurrency = AdaptiveConcurrency(
+        initial=MAX_WORKERS,
+        floor=CONCURRENCY_FLOOR,
+        ceiling=CONCURRENCY_CEILING,
+        latency_tolerance=CONCURRENCY_LATENCY_TOLERANCE,
+        max_error_rate=CONCURRENCY_MAX_ERROR_RATE,
+        backoff=CONCURRENCY_BACKOFF,
+    ) if ADAPTIVE_CONCURRENCY else None
+
+    # Overall bar plus the slowest downloads ("bars" = one bar per image, elapsed time only)
+    with make_progress(
+        PROGRESS_MODE, PROGRESS_TOP_N, PROGRESS_INTERVAL, PROGRESS_LOG_INTERVAL, console=console
+    ) as progress:
+        summary = extract_images(
+            file_path,
+            USER_SESSION,
+            BASE_URL,
+            ASSETS_ENDPOINT,
+            max_workers=MAX_WORKERS,
+            engine=DOWNLOAD_ENGINE,
+            per_host_limit=PER_HOST_LIMIT,
+            cache=AssetCache(CACHE_DIR, CACHE_MAX_BYTES) if USE_CACHE else None,
+            refresh=REFRESH_EXISTING,
+            scheduler=RetryScheduler(
+                attempts=RETRY_ATTEMPTS,
+                base_delay=RETRY_BASE_DELAY,
+                max_delay=RETRY_MAX_DELAY,
+                budget=RETRY_BUDGET,
+                rate=REQUESTS_PER_SECOND,
+                burst=REQUEST_BURST,
+                breaker_threshold=BREAKER_THRESHOLD,
+                breaker_cooldown=BREAKER_COOLDOWN,
+            ),
+            metrics=metrics,
+            streaming_threshold=STREAMING_THRESHOLD_BYTES,
+            chunk_size=STREAM_CHUNK_BYTES,
+            progress=progress,
+            dedup=DEDUP_IMAGES is not None,
+            optimize=optimize_settings(
+                OPTIMIZE_IMAGES, OPTIMIZE_QUALITY, scale=OPTIMIZE_SCALE, min_saving=OPTIMIZE_MIN_SAVING
+            ) if OPTIMIZE_IMAGES else None,
+            concurrency=concurrency,
+        )
+
+    # Logging output
+    table = Table(show_header=False, box=None)
+    table.add_row("Markdown file:", Path(file_path).name)
+    table.add_row("URLs found:", str(summary["urls_found"]))
+    table.add_row("Images downloaded:", str(summary["downloaded"]))
+    table.add_row("From cache:", str(summary["from_cache"]))
+    table.add_row("Already existed:", str(summary["already_exists"]))
+    table.add_row("Failed downloads:", str(len(summary["failed"])))
+    if summary["concurrency"] is not None:
+        limits = summary["concurrency"]
+        table.add_row("Downloads in flight:", f"{limits['initial']} -> {limits['final']} "
+                      f"(range {limits['lowest']}-{limits['highest']})")
+    if summary["dedup"] is not None:
+        table.add_row("Duplicates removed:", str(summary["dedup"]["removed"]))
+    if summary["optimize_totals"] is not None:
+        totals = summary["optimize_totals"]
+        table.add_row("Images optimised:", str(totals["optimized"]))
+        table.add_row("Bytes saved:", f"{totals['bytes_saved'] / 1e6:.2f} MB")
+    if metrics is not None:
+        metrics.write(METRICS_PATH)
+        stats = metrics.summary()
+        if stats["latency_p95"] is not None:
+            table.add_row("Latency p95:", f"{stats['latency_p95']:.2f}s")
+        table.add_row("Throughput:", f"{stats['throughput_mb_s']:.2f} MB/s")
+        table.add_row("Metrics written to:", str(METRICS_PATH))
+    console.print(Panel(table, title="Markdown Image Downloader", expand=False))
+    if summary["optimized"]:
+        saved = Table(title="Optimised images")
+        saved.add_column("Variant")
+        saved.add_column("Before", justify="right")
+        saved.add_column("After", justify="right")
+        for r in summary["optimized"]:
+            if r["variant"]:
+                saved.add_row(r["variant"], f"{r['before'] / 1e3:.0f} kB", f"{r['after'] / 1e3:.0f} kB")
+        console.print(saved)
+    if summary["failed"]:
+        failed_panel = Panel(
+            "\n".join(str(img) for img in summary["failed"]),
+            title="Images Not Downloaded",
+            expand=False,
+            style="red"
+        )
+        console.print(failed_panel)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+File: batch.py
+
+Description:
+    Headless batch pipeline for the Markdown Image Downloader.
+    Finds every Markdown file under a set of directories / files / glob patterns,
+    extracts the GitHub asset URLs from all of them, removes duplicate assets across
+    the whole corpus, downloads each asset once through a single shared download
+    engine (see downloader.py) and rewrites every Markdown file to use its local image paths.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - glob
+    - time
+    - pathlib
+    - cache.py
+    - dedup.py
+    - downloader.py
+    - index.py (optional CorpusIndex)
+    - manifest.py
+    - optimize.py
+    - parser.py
+    - plan.py
+    - scan.py
+    - streaming.py
+
+Usage:
+    from support_files.batch import run_batch
+    summary = run_batch(["docs/"], USER_SESSION, BASE_URL, ASSETS_ENDPOINT)
+    plan = plan_batch(["docs/"], USER_SESSION, BASE_URL, ASSETS_ENDPOINT)   # dry run, see plan.py
+
+
+"""
+import glob
+import time
+from pathlib import Path
+
+from support_files.cache import link_or_copy
+from support_files.dedup import dedupe
+from support_files.downloader import download_assets
+from support_files.manifest import ManifestSet
+from support_files.optimize import display_sizes, optimize_docs, optimize_totals
+from support_files.parser import unique_assets
+from support_files.plan import PLAN_VERSION, plan_totals, resolve_assets, resolved_urls
+from support_files.scan import file_stamp, rewrite_file, scan_file
+from support_files.streaming import CHUNK_SIZE, stream_image_refs, stream_rewrite
+
+#####################################
+def find_markdown_files(targets, pattern="**/*.md"):
+    """
+    Resolve directories, single files and glob patterns into a sorted list of
+    unique Markdown file paths.
+    """
+    found = set()
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            found.update(p for p in path.glob(pattern) if p.is_file())
+        elif path.is_file():
+            found.add(path)
+        else:
+            found.update(Path(p) for p in glob.glob(str(target), recursive=True) if Path(p).is_file())
+    return sorted(p.resolve() for p in found if p.suffix.lower() == ".md")
+
+#####################################
+def collect_assets(md_files, base_url, assets_endpoint, streaming_threshold=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse every Markdown file once and build a corpus-wide asset table.
+    Files larger than streaming_threshold bytes are scanned in chunks (see streaming.py).
+    Returns (assets, doc_refs):
+    - assets:   {url: {"filename": str, "docs": [md_path, ...]}} with each URL listed once,
+                however many documents reference it
+    - doc_refs: {md_path: (file stamp, [ImageRef, ...] or None for streamed files)}
+                so the rewrite can splice by (byte) offset
+    Other files are memory-mapped and only tokenized if they can contain an asset URL (see scan.py).
+    """
+    assets = {}
+    doc_refs = {}
+    for md_path in md_files:
+        stamp = file_stamp(md_path)
+        if streaming_threshold is not None and stamp[0] > streaming_threshold:
+            refs = list(stream_image_refs(md_path, base_url, assets_endpoint, chunk_size))
+            doc_refs[md_path] = (stamp, None)
+        else:
+            refs = scan_file(md_path, base_url, assets_endpoint)
+            doc_refs[md_path] = (stamp, refs)
+        for url, filename in unique_assets(refs):
+            entry = assets.setdefault(url, {"filename": filename, "docs": []})
+            entry["docs"].append(md_path)
+    return assets, doc_refs
+
+#####################################
+def _copy_into(source_manifest, url, image_rel_path, target_manifest):
+    # Place an already-downloaded asset into another document's Images folder
+    name = Path(image_rel_path).name
+    target = target_manifest.images_dir / name
+    if not target.exists():
+        link_or_copy(source_manifest.images_dir / name, target)
+    target_manifest.record(url, name, **{
+        k: v for k, v in (source_manifest.entry(url) or {}).items() if k != "file"
+    })
+    return f"Images/{name}"
+
+#####################################
+def _images_dirs(entry):
+    # Images folders of every document that uses an asset, in first-seen order
+    images_dirs = []
+    for md_path in entry["docs"]:
+        images_dir = md_path.parent / "Images"
+        if images_dir not in images_dirs:
+            images_dirs.append(images_dir)
+    return images_dirs
+
+#####################################
+def _plan_download(url, entry, manifests):
+    """
+    Pick the single Images folder an asset is downloaded into. A folder that
+    already holds the asset (per its manifest) is preferred so nothing is fetched again.
+    """
+    images_dirs = _images_dirs(entry)
+    for images_dir in images_dirs:
+        images_dir.mkdir(exist_ok=True)
+    return next(
+        (d for d in images_dirs if manifests.get(d).find(url, entry["filename"])), images_dirs[0]
+    )
+
+#####################################
+def _distribute(url, entry, source_dir, image_rel_path, manifests):
+    """
+    Copy a downloaded asset into the Images folder of every other document that uses it.
+    Returns {images_dir: image_rel_path or None}.
+    """
+    paths = {}
+    for images_dir in _images_dirs(entry):
+        if not image_rel_path:
+            paths[images_dir] = None
+            continue
+        try:
+            paths[images_dir] = (
+                image_rel_path if images_dir == source_dir
+                else _copy_into(manifests.get(source_dir), url, image_rel_path, manifests.get(images_dir))
+            )
+        except OSError:
+            paths[images_dir] = None
+    return paths
+
+#####################################
+def plan_batch(
+    targets,
+    user_session,
+    base_url,
+    assets_endpoint,
+    max_workers=16,
+    pattern="**/*.md",
+    cache=None,
+    method="range",
+    scheduler=None,
+    streaming_threshold=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """
+    Dry run of run_batch: work out what a run would download without downloading anything.
+    Assets already in an Images folder are "exists", assets in the cache are "cached"; the
+    rest are resolved with HEAD / one-byte Range requests (method, see plan.py) to get their
+    final URL, extension and size. No Images folder, manifest or Markdown file is written.
+    Returns the plan dict: markdown_files, assets (one entry per asset) and totals.
+    """
+    md_files = find_markdown_files(targets, pattern)
+    assets, _ = collect_assets(md_files, base_url, assets_endpoint, streaming_threshold, chunk_size)
+
+    manifests = ManifestSet()
+    entries = []
+    for url, entry in assets.items():
+        images_dirs = _images_dirs(entry)
+        existing = next(
+            (found for found in (manifests.get(d).find(url, entry["filename"]) for d in images_dirs) if found),
+            None,
+        )
+        cached = cache.entry(url) if cache is not None and not existing else {}
+        entries.append({
+            "url": url,
+            "filename": entry["filename"],
+            "docs": [str(md_path) for md_path in entry["docs"]],
+            "state": "exists" if existing else "cached" if cached else "download",
+            "size": cached.get("size"),
+            "ext": cached.get("ext"),
+        })
+    resolve_assets(entries, user_session, max_workers, method, scheduler)
+
+    return {
+        "version": PLAN_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "base_url": base_url,
+        "assets_endpoint": assets_endpoint,
+        "method": method,
+        "markdown_files": [str(md_path) for md_path in md_files],
+        "assets": entries,
+        "totals": plan_totals(entries),
+    }
+
+#####################################
+def run_batch(
+    targets,
+    user_session,
+    base_url,
+    assets_endpoint,
+    max_workers=16,
+    pattern="**/*.md",
+    on_asset_done=None,
+    engine="thread",
+    per_host_limit=8,
+    cache=None,
+    refresh=False,
+    scheduler=None,
+    metrics=None,
+    streaming_threshold=None,
+    chunk_size=CHUNK_SIZE,
+    progress=None,
+    plan=None,
+    dedup=None,
+    optimize=None,
+    pool=None,
+    index=None,
+    skip_incomplete=False,
+    concurrency=None,
+):
+    """
+    Run the whole extract → download → rewrite pipeline over a corpus of Markdown files.
+    on_asset_done(url, status) is called as each asset finishes (e.g. to drive a progress bar).
+    engine / per_host_limit select the download engine (see downloader.py).
+    cache is an optional AssetCache shared with other runs (see cache.py).
+    refresh=True re-validates existing images with conditional GETs (see manifest.py).
+    scheduler is a RetryScheduler shared by every download (see retry.py).
+    metrics is an optional DownloadMetrics that records every download (see metrics.py).
+    progress is an optional AggregateProgress (or rich Progress) given one task per asset (see progress.py).
+    plan is a plan from plan_batch / load_plan: its resolved final URLs are downloaded directly.
+    dedup ("folder" or "corpus", see dedup.py) collapses byte-identical images before the rewrite.
+    optimize is optional optimize_settings(...): documents link to right-sized, recompressed
+    variants of their images, sized from the <img> width / height attributes (see optimize.py).
+    pool is an optional DownloadPool kept warm between runs (see service.py).
+    index is an optional CorpusIndex (see index.py): only new or changed documents, and those
+    with a failed or missing asset, are processed, and the index is updated and saved.
+    skip_incomplete=True leaves a document untouched while any of its assets failed, instead
+    of rewriting the assets that did download.
+    concurrency is an optional AdaptiveConcurrency (see concurrency.py): downloads in flight
+    follow measured latency, errors and bytes/second instead of staying at max_workers.
+    Files larger than streaming_threshold bytes are processed in chunk_size pieces
+    (see streaming.py); every rewrite goes through a temp file and an atomic rename.
+    Returns a summary dict with counts, the failed URLs (and the documents using them) and the rewritten files.
+    """
+    md_files = find_markdown_files(targets, pattern)
+    skipped = []
+    if index is not None:
+        index.forget_missing(md_files)
+        md_files, _, skipped = index.select(md_files)
+    assets, doc_refs = collect_assets(md_files, base_url, assets_endpoint, streaming_threshold, chunk_size)
+
+    downloaded = 0
+    from_cache = 0
+    already_exists = 0
+    failed_images = []
+    statuses = {}  # url -> status
+    doc_paths = {}  # md_path -> {url: image_rel_path}
+    folder_statuses = {}  # images_dir -> {url: status}, for the dedup stage
+
+    manifests = ManifestSet()
+    source_dirs = {url: _plan_download(url, entry, manifests) for url, entry in assets.items()}
+    if progress is not None:
+        jobs = [
+            (url, entry["filename"], source_dirs[url], progress.add_task(entry["filename"], total=1))
+            for url, entry in assets.items()
+        ]
+    else:
+        jobs = [(url, entry["filename"], source_dirs[url]) for url, entry in assets.items()]
+    finish = getattr(progress, "finish", None)
+    task_ids = {job[0]: job[3] for job in jobs} if finish is not None else {}
+
+    def on_done(url, image_rel_path, status):
+        if finish is not None:
+            finish(task_ids[url], status)
+        if on_asset_done:
+            on_asset_done(url, status)
+
+    results = download_assets(
+        jobs,
+        user_session,
+        engine=engine,
+        max_workers=max_workers,
+        per_host_limit=per_host_limit,
+        progress=progress,
+        on_done=on_done,
+        cache=cache,
+        manifests=manifests,
+        refresh=refresh,
+        scheduler=scheduler,
+        metrics=metrics,
+        resolved=resolved_urls(plan) if plan is not None else None,
+        pool=pool,
+        concurrency=concurrency,
+    )
+    for url, image_rel_path, status in results:
+        statuses[url] = status
+        if status == 'downloaded':
+            downloaded += 1
+        elif status == 'cached':
+            from_cache += 1
+        elif status == 'exists':
+            already_exists += 1
+        else:
+            failed_images.append(url)
+        paths = _distribute(url, assets[url], source_dirs[url], image_rel_path, manifests)
+        for images_dir, image_rel_path in paths.items():
+            if image_rel_path:
+                folder_statuses.setdefault(images_dir, {})[url] = status
+        for md_path in assets[url]["docs"]:
+            image_rel_path = paths.get(md_path.parent / "Images")
+            if image_rel_path:
+                doc_paths.setdefault(md_path, {})[url] = image_rel_path
+
+    dedup_stats = None
+    if dedup:
+        # Point every reference to a duplicate at the one copy that is kept
+        remaps, dedup_stats = dedupe(manifests, folder_statuses, dedup)
+        for md_path, mapping in doc_paths.items():
+            mapping.update({
+                url: path for url, path in remaps.get(md_path.parent / "Images", {}).items() if url in mapping
+            })
+
+    manifests.save_all()
+
+    optimized = None
+    if optimize is not None:
+        sizes = {}
+        for md_path, (stamp, refs) in doc_refs.items():
+            if refs is not None:
+                display_sizes(refs, sizes)
+        for url, entry in assets.items():
+            # Streamed documents keep no refs, so their images are never resized
+            if any(doc_refs[md_path][1] is None for md_path in entry["docs"]):
+                sizes[url] = None
+        optimized = optimize_docs(doc_paths, sizes, optimize)
+
+    failed_docs = {md_path for url in failed_images for md_path in assets[url]["docs"]}
+
+    # Rewrite each Markdown file once by splicing at the scanned byte offsets, only if something changed
+    rewritten = []
+    for md_path, mapping in doc_paths.items():
+        if skip_incomplete and md_path in failed_docs:
+            # All or nothing: keep every remote link until the failed assets download
+            continue
+        stamp, refs = doc_refs[md_path]
+        if refs is None:
+            if stream_rewrite(md_path, mapping, base_url, assets_endpoint, chunk_size):
+                rewritten.append(md_path)
+            continue
+        if rewrite_file(md_path, refs, mapping, base_url, assets_endpoint, stamp):
+            rewritten.append(md_path)
+
+    if index is not None:
+        doc_assets = {md_path: {} for md_path in md_files}
+        written_docs = set(rewritten)
+        for url, entry in assets.items():
+            for md_path in entry["docs"]:
+                written = md_path in written_docs
+                doc_assets[md_path][url] = {
+                    "path": doc_paths.get(md_path, {}).get(url) if written else None,
+                    "status": statuses.get(url, 'failed') if written or url in failed_images else 'pending',
+                }
+        for md_path, entries in doc_assets.items():
+            index.update(md_path, entries)
+        index.save()
+
+    return {
+        "markdown_files": len(md_files) + len(skipped),
+        "skipped_unchanged": len(skipped),
+        "urls_found": len(assets),
+        "downloaded": downloaded,
+        "from_cache": from_cache,
+        "already_exists": already_exists,
+        "failed": failed_images,
+        "failed_docs": sorted(str(md_path) for md_path in failed_docs),
+        "rewritten": rewritten,
+        "dedup": dedup_stats,
+        "optimized": optimized,
+        "optimize_totals": optimize_totals(optimized) if optimized is not None else None,
+        "concurrency": concurrency.summary() if concurrency is not None else None,
+    }
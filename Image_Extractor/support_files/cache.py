@@ -0,0 +1,189 @@
+"""
+File: cache.py
+
+Description:
+    Content-addressed local asset cache shared by every Markdown file and every run.
+    - blobs/<aa>/<sha256>  holds each distinct image once, named by its SHA-256
+    - index.json           maps asset URL -> {sha256, ext, size, last_used}
+    When the cache grows past max_bytes the least recently used blobs are evicted.
+    Cached images are placed into an Images/ folder by reflink, hardlink or copy
+    (whichever the filesystem supports first) instead of going back to the network.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - hashlib
+    - json
+    - os
+    - shutil
+    - threading
+    - pathlib
+
+Usage:
+    cache = AssetCache(CACHE_DIR, CACHE_MAX_BYTES)
+    if cache.materialize(url, images_dir, filename): ...
+    cache.store(url, images_dir / "uuid.png")
+    cache.save()
+
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+FICLONE = 0x40049409  # Linux ioctl to reflink (copy-on-write clone) a file
+
+#####################################
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#####################################
+def _reflink(source, target):
+    import fcntl
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+def link_or_copy(source, target):
+    """
+    Place source at target as cheaply as possible: reflink (copy-on-write),
+    then hardlink, then a plain copy. Returns the method used.
+    """
+    if os.name != "nt":
+        try:
+            _reflink(source, target)
+            return "reflink"
+        except (ImportError, OSError):
+            pass
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        shutil.copyfile(source, target)
+        return "copy"
+
+#####################################
+class AssetCache:
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _blob_path(self, sha256):
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def lookup(self, url):
+        """
+        Return (blob_path, ext) for a cached URL, or None. Marks the entry as recently used.
+        """
+        with self.lock:
+            entry = self.index.get(url)
+            if not entry:
+                return None
+            blob = self._blob_path(entry["sha256"])
+            if not blob.exists():
+                del self.index[url]
+                return None
+            entry["last_used"] = time.time()
+            return blob, entry["ext"]
+
+    def entry(self, url):
+        with self.lock:
+            return dict(self.index.get(url) or {})
+
+    def materialize(self, url, images_dir, filename):
+        """
+        Place a cached asset at images_dir/<filename><ext>.
+        Returns the relative image path ("Images/...") or None on a cache miss.
+        """
+        hit = self.lookup(url)
+        if not hit:
+            return None
+        blob, ext = hit
+        target = Path(images_dir) / f"{filename}{ext}"
+        try:
+            if not target.exists():
+                link_or_copy(blob, target)
+        except OSError:
+            return None
+        return f"Images/{target.name}"
+
+    def store(self, url, image_path, sha256=None):
+        """
+        Add a downloaded file to the blob store under its SHA-256 and index it by URL.
+        Pass sha256 when it was already computed while downloading. Returns the SHA-256.
+        """
+        image_path = Path(image_path)
+        sha256 = sha256 or file_sha256(image_path)
+        blob = self._blob_path(sha256)
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            tmp = blob.with_name(f"{sha256}.{threading.get_ident()}.tmp")
+            link_or_copy(image_path, tmp)
+            os.replace(tmp, blob)
+        with self.lock:
+            self.index[url] = {
+                "sha256": sha256,
+                "ext": image_path.suffix,
+                "size": blob.stat().st_size,
+                "last_used": time.time(),
+            }
+        return sha256
+
+    def evict(self):
+        """
+        Drop least recently used blobs (and every URL pointing at them) until the
+        store fits in max_bytes. Returns the number of bytes freed.
+        """
+        with self.lock:
+            blobs = {}
+            for url, entry in self.index.items():
+                blob = blobs.setdefault(entry["sha256"], {"size": entry["size"], "last_used": 0, "urls": []})
+                blob["last_used"] = max(blob["last_used"], entry["last_used"])
+                blob["urls"].append(url)
+            total = sum(b["size"] for b in blobs.values())
+            freed = 0
+            for sha256, blob in sorted(blobs.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    self._blob_path(sha256).unlink()
+                except FileNotFoundError:
+                    pass
+                for url in blob["urls"]:
+                    del self.index[url]
+                total -= blob["size"]
+                freed += blob["size"]
+            return freed
+
+    def save(self):
+        """
+        Evict down to max_bytes and write the index atomically.
+        """
+        self.evict()
+        with self.lock:
+            tmp = self.index_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp, self.index_path)
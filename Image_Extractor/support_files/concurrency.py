@@ -0,0 +1,261 @@
+"""
+File: concurrency.py
+
+Description:
+    Adaptive download concurrency for the Markdown Image Downloader.
+    Instead of a fixed number of downloads in flight (MAX_WORKERS / --workers), one
+    AdaptiveConcurrency object shared by every worker moves the limit the way TCP moves
+    its congestion window. Each finished download reports its request time (headers plus
+    body, per attempt), bytes and whether it was throttled. Once the workers in flight have each reported about
+    once (one "round"), the round is judged:
+    - errors:   more than max_error_rate of the round's requests were answered 429 / 5xx,
+                dropped or retried -> the limit is multiplied by backoff
+    - latency:  median request time rose past latency_tolerance x the best round so
+                far while bytes/second did not improve -> queueing somewhere, multiply by backoff
+    - increase: otherwise the limit doubles until the first cut (slow start), then grows by
+                one per round (additive increase)
+    The limit always stays between floor and ceiling, and below what can really be in flight:
+    download_assets caps it at the per-host limit times the hosts in the run, since slots no
+    download can fill would never show up as latency and the limit would grow without effect.
+    Every change is kept as a decision
+    (time, old and new limit, reason and the round's measurements) for the run summary.
+    Thread workers block in acquire(); the async engine awaits acquire_async().
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - asyncio
+    - collections
+    - threading
+    - time
+    - retry.py (RETRY_STATUSES)
+
+Usage:
+    concurrency = AdaptiveConcurrency(initial=4, floor=2, ceiling=64)
+    download_assets(jobs, USER_SESSION, concurrency=concurrency)
+    concurrency.summary()      # {"initial": 4, "final": 23, "decisions": [...], ...}
+
+
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from support_files.retry import RETRY_STATUSES
+
+MAX_DECISIONS = 200  # most recent decisions kept for the summary
+
+#####################################
+def congested(trace, status):
+    # Did this download see the server push back (throttled, 5xx, dropped, retried)?
+    if trace.get("attempts", 0) > 1:
+        return True
+    return status == 'failed' and trace.get("http_status") in RETRY_STATUSES | {None}
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2] if values else None
+
+#####################################
+class AdaptiveConcurrency:
+    """
+    AIMD limit on downloads in flight, driven by latency, error rate and bytes/second.
+    Thread-safe; the async engine uses it from one event loop at a time.
+    """
+
+    def __init__(
+        self,
+        initial=4,
+        floor=1,
+        ceiling=64,
+        latency_tolerance=2.0,
+        max_error_rate=0.05,
+        backoff=0.7,
+        min_samples=4,
+    ):
+        if not 1 <= floor <= ceiling:
+            raise ValueError(f"Concurrency floor {floor} and ceiling {ceiling} need 1 <= floor <= ceiling")
+        self.initial = min(max(initial, floor), ceiling)
+        self.floor = floor
+        self.ceiling = ceiling
+        self.max_limit = ceiling  # ceiling, lowered by cap() to what can really be in flight
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.backoff = backoff
+        self.min_samples = min_samples
+        self.limit = float(self.initial)
+        self.slow_start = True
+        self.in_flight = 0
+        self.stale = 0
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self._async_cond = None
+        self._async_loop = None
+        self.started = time.monotonic()
+        self.best_latency = None
+        self.last_rate = None
+        self.lowest = self.highest = self.initial
+        self.increases = 0
+        self.decreases = 0
+        self.decisions = deque(maxlen=MAX_DECISIONS)
+        self._new_round(self.started)
+
+    def _new_round(self, now):
+        self.round_start = now
+        self.round_latencies = []
+        self.round_bytes = 0
+        self.round_samples = 0
+        self.round_congested = 0
+
+    #####################################
+    def cap(self, slots):
+        """
+        Keep the limit at or below slots (per-host limit x hosts) for the coming downloads and
+        return the new maximum. Called by download_assets at the start of every run.
+        """
+        with self.lock:
+            self.max_limit = max(1, min(self.ceiling, slots))
+            if self.limit > self.max_limit:
+                previous = self.limit
+                self.limit = float(self.max_limit)
+                self._changed(time.monotonic(), previous, "cap", 0, 0.0, None, 0.0)
+                if self.last_rate is None and not self.round_samples:
+                    # Nothing ran under the higher limit: the run really starts from the cap
+                    self.highest = int(self.limit)
+            return self.max_limit
+
+    def acquire(self):
+        # Block until a download slot is free under the current limit
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, trace=None, status=None):
+        """
+        Free a slot and record how the download went. trace is the download's metrics trace
+        (attempts, wait, bytes, http_status); downloads that sent no request ('exists') only
+        free their slot.
+        """
+        with self.cond:
+            self.in_flight -= 1
+            if trace and trace.get("attempts"):
+                self._record(trace, status, time.monotonic())
+            self.cond.notify_all()
+
+    def _condition(self):
+        # An asyncio.Condition belongs to one event loop; each asyncio.run() gets its own
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_cond = asyncio.Condition()
+            self._async_loop = loop
+        return self._async_cond
+
+    async def acquire_async(self):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release_async(self, trace=None, status=None):
+        with self.lock:
+            self.in_flight -= 1
+            if trace and trace.get("attempts"):
+                self._record(trace, status, time.monotonic())
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    #####################################
+    def _record(self, trace, status, now):
+        # Called with the lock held
+        if self.stale:
+            # Started under the limit that was just cut: says nothing about the new one
+            self.stale -= 1
+            return
+        self.round_samples += 1
+        self.round_bytes += trace.get("bytes", 0)
+        if trace.get("wait") is not None:
+            # Queueing on a full link shows up in the body transfer, not just the first byte
+            self.round_latencies.append((trace["wait"] + trace.get("transfer", 0.0)) / trace["attempts"])
+        if congested(trace, status):
+            self.round_congested += 1
+        # One round: every slot has reported about once, like one RTT for TCP
+        if self.round_samples >= max(self.min_samples, int(self.limit)):
+            self._adjust(now)
+
+    def _adjust(self, now):
+        seconds = max(now - self.round_start, 1e-6)
+        error_rate = self.round_congested / self.round_samples
+        latency = _median(self.round_latencies)
+        rate = self.round_bytes / seconds
+        previous = self.limit
+
+        if error_rate > self.max_error_rate:
+            reason = "errors"
+        elif (
+            latency is not None and self.best_latency is not None
+            and latency > self.best_latency * self.latency_tolerance
+            and (self.last_rate is None or rate <= self.last_rate * 1.05)
+        ):
+            # Waiting longer for the same bytes/second: requests are queueing
+            reason = "latency"
+        else:
+            reason = "slow start" if self.slow_start else "increase"
+
+        if reason in ("errors", "latency"):
+            # One cut per round, like TCP: ignore the downloads still in flight from before it
+            self.slow_start = False
+            self.limit = max(float(min(self.floor, self.max_limit)), self.limit * self.backoff)
+            self.stale = self.in_flight
+        elif self.slow_start:
+            self.limit = min(float(self.max_limit), self.limit * 2)
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1)
+
+        if latency is not None and reason != "errors":
+            # Throttled rounds say nothing about the path's latency
+            self.best_latency = latency if self.best_latency is None else min(self.best_latency, latency)
+        self.last_rate = rate
+        self._changed(now, previous, reason, self.round_samples, error_rate, latency, rate)
+        self._new_round(now)
+
+    def _changed(self, now, previous, reason, samples, error_rate, latency, rate):
+        # Called with the lock held: count and keep a decision if the whole-number limit moved
+        if int(self.limit) == int(previous):
+            return
+        if self.limit > previous:
+            self.increases += 1
+        else:
+            self.decreases += 1
+        self.lowest = min(self.lowest, int(self.limit))
+        self.highest = max(self.highest, int(self.limit))
+        self.decisions.append({
+            "t": round(now - self.started, 3),
+            "from": int(previous),
+            "to": int(self.limit),
+            "reason": reason,
+            "samples": samples,
+            "error_rate": round(error_rate, 3),
+            "latency_p50": round(latency, 4) if latency is not None else None,
+            "mb_per_s": round(rate / 1e6, 3),
+        })
+
+    #####################################
+    def summary(self):
+        with self.lock:
+            return {
+                "initial": self.initial,
+                "floor": self.floor,
+                "ceiling": self.ceiling,
+                "max_limit": self.max_limit,
+                "final": int(self.limit),
+                "lowest": self.lowest,
+                "highest": self.highest,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "best_latency": self.best_latency,
+                "decisions": list(self.decisions),
+            }
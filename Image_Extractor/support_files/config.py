@@ -35,3 +35,133 @@ ASSETS_ENDPOINT = "/user-attachments/assets"
 USER_SESSION = "your_copied_token_here"
 
 DEFAULT_FILE_PATH = find_repo_root(__file__)
+
+# Worker threads for a single interactive run (main.py); with ADAPTIVE_CONCURRENCY on this is
+# only the starting number of downloads in flight
+MAX_WORKERS = 4
+
+# Worker threads shared by every file in a headless batch run (batch.py)
+BATCH_MAX_WORKERS = 16
+
+# Glob used to find Markdown files when batch.py is given a directory
+MARKDOWN_GLOB = "**/*.md"
+
+# Download engine: "thread" (pooled requests.Session) or "async" (aiohttp, pip install aiohttp)
+DOWNLOAD_ENGINE = "thread"
+
+# Maximum simultaneous downloads from any single host (github.com, the S3 bucket, ...)
+PER_HOST_LIMIT = 8
+
+# Adaptive download concurrency (see concurrency.py): start at MAX_WORKERS / --workers and move
+# the number of downloads in flight between CONCURRENCY_FLOOR and CONCURRENCY_CEILING from the
+# measured latency, error rate and bytes/s (never past PER_HOST_LIMIT x hosts). Off by default
+# until it keeps up with a fixed pool from a small start; --adaptive-workers turns it on per run
+ADAPTIVE_CONCURRENCY = False
+CONCURRENCY_FLOOR = 2
+CONCURRENCY_CEILING = 64
+
+# The limit is cut by CONCURRENCY_BACKOFF when more than CONCURRENCY_MAX_ERROR_RATE of a round's
+# requests were throttled or retried, or when time to first byte grew past
+# CONCURRENCY_LATENCY_TOLERANCE x the best round with no gain in bytes/s
+CONCURRENCY_BACKOFF = 0.7
+CONCURRENCY_MAX_ERROR_RATE = 0.05
+CONCURRENCY_LATENCY_TOLERANCE = 2.0
+
+# Content-addressed asset cache shared by every Markdown file and run (see cache.py)
+USE_CACHE = True
+
+CACHE_DIR = Path.home() / ".cache" / "image_extractor"
+
+# Least recently used images are evicted once the cache grows past this size
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Re-validate images that already exist with conditional GETs (ETag / Last-Modified);
+# unchanged images cost a 304 with no body, changed ones are downloaded again
+REFRESH_EXISTING = False
+
+# Markdown files bigger than this are scanned and rewritten in chunks (see streaming.py)
+# so memory stays flat however large the file is
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+STREAM_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Retries for 429 / 5xx answers and dropped connections (see retry.py):
+# attempts per asset, jittered exponential backoff from RETRY_BASE_DELAY up to RETRY_MAX_DELAY
+# seconds, and at most RETRY_BUDGET retries in a whole run
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 60.0
+RETRY_BUDGET = 200
+
+# Requests per second per host (token bucket, REQUEST_BURST deep); 0 = no limit of our own.
+# Retry-After and X-RateLimit-* headers from the server always pause the host
+REQUESTS_PER_SECOND = 0
+REQUEST_BURST = 20
+
+# After BREAKER_THRESHOLD consecutive failures a host is skipped for BREAKER_COOLDOWN seconds
+BREAKER_THRESHOLD = 10
+BREAKER_COOLDOWN = 30.0
+
+# Write per-asset timing events and run histograms here (see metrics.py);
+# a path ending in .prom is written in Prometheus textfile format, anything else as JSON lines.
+# None turns metrics off
+METRICS_PATH = None
+
+# Progress display (see progress.py): "auto" (aggregate view on a terminal, plain log lines otherwise),
+# "rich" (one overall bar plus the PROGRESS_TOP_N longest-running downloads), "plain",
+# "bars" (one rich bar per asset) or "none"
+PROGRESS_MODE = "auto"
+PROGRESS_TOP_N = 8
+
+# Seconds between redraws of the aggregate view, and between lines in plain mode
+PROGRESS_INTERVAL = 0.25
+PROGRESS_LOG_INTERVAL = 5.0
+
+# How batch.py --plan resolves assets without downloading them (see plan.py):
+# "range" (GET for the first byte only; works with signed S3 URLs) or "head"
+PLAN_METHOD = "range"
+
+# Collapse byte-identical images after downloading (see dedup.py): None (off), "folder"
+# (one file per Images folder, references rewritten to it) or "corpus" (also hardlink
+# identical files across Images folders; batch.py only)
+DEDUP_IMAGES = None
+
+# Link documents to right-sized, recompressed variants of their images (see optimize.py, needs Pillow):
+# None (off), "keep" (recompress in the same format) or "webp". Images are shrunk to the
+# <img> width / height times OPTIMIZE_SCALE (for high-DPI screens) and a variant is only
+# used if it saves at least OPTIMIZE_MIN_SAVING of the original
+OPTIMIZE_IMAGES = None
+OPTIMIZE_QUALITY = 85
+OPTIMIZE_SCALE = 2
+OPTIMIZE_MIN_SAVING = 0.1
+
+# Reverse pipeline (batch.py --upload, see upload.py): upload local Images/ files as
+# multipart/form-data POSTs to UPLOAD_ENDPOINT (file in the UPLOAD_FIELD form field,
+# UPLOAD_TOKEN sent as a Bearer token if set) and link documents to the URL the endpoint
+# returns in the UPLOAD_URL_FIELD JSON field (or its Location header)
+UPLOAD_ENDPOINT = None
+UPLOAD_TOKEN = None
+UPLOAD_FIELD = "file"
+UPLOAD_URL_FIELD = "url"
+UPLOAD_MAX_WORKERS = 8
+
+# Every upload is logged here by endpoint and SHA-256, so interrupted or repeated runs
+# never upload the same image twice
+UPLOAD_LOG_PATH = CACHE_DIR / "uploads.json"
+
+# Worker service (worker.py, see service.py): durable job queue, Markdown files claimed per
+# batch, and seconds between queue / watch polls when idle
+QUEUE_PATH = CACHE_DIR / "queue.sqlite3"
+QUEUE_BATCH_SIZE = 100
+QUEUE_POLL_INTERVAL = 1.0
+
+# Finished jobs are removed from the queue after this many seconds
+QUEUE_KEEP_SECONDS = 7 * 24 * 3600
+
+# Corpus index for incremental batch runs (see index.py): documents already processed and
+# unchanged since (same SHA-256, no failed or missing images) are skipped. None = off
+CORPUS_INDEX_PATH = None
+
+# Leave a document untouched while any of its images failed to download, instead of
+# linking the ones that did (a mix of local and remote links)
+SKIP_INCOMPLETE_DOCS = False
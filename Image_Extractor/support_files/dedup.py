@@ -0,0 +1,160 @@
+"""
+File: dedup.py
+
+Description:
+    Optional post-download de-duplication of byte-identical images.
+    Different GitHub asset UUIDs often hold the same screenshot. Every download is already
+    hashed while it streams (PartialDownload feeds each iter_content chunk to SHA-256 and
+    the digest is stored in the Images folder's manifest), so finding duplicates costs no
+    extra read; only files that predate the manifest's hashes are read once.
+    - Within an Images folder, images downloaded in this run that duplicate another image
+      are deleted and their URLs point at the one kept (the canonical file), so the
+      Markdown rewrite links every reference to that file.
+      Files that existed before the run are never deleted: other documents may link to them.
+    - Across Images folders (scope "corpus"), identical files are replaced by hardlinks /
+      reflinks of one copy, so each document's Images folder stays self-contained while
+      the disk holds the bytes once.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - os
+    - pathlib
+    - cache.py (file_sha256, link_or_copy)
+    - manifest.py (an ImagesManifest / ManifestSet is passed in)
+
+Usage:
+    remap, stats = dedupe_folder(manifests.get(images_dir), new_urls, existing_urls)
+    # remap: {url: "Images/<canonical file>"} for the rewrite
+
+
+"""
+import os
+from pathlib import Path
+
+from support_files.cache import file_sha256, link_or_copy
+
+DEDUP_SCOPES = ("folder", "corpus")
+
+#####################################
+def _content_hash(manifest, url):
+    # The SHA-256 recorded while downloading, else hash the file once and record it
+    entry = manifest.entry(url)
+    if not entry:
+        return None, None
+    path = manifest.images_dir / entry["file"]
+    if not path.exists():
+        return None, None
+    if not entry.get("sha256"):
+        fields = {k: v for k, v in entry.items() if k != "file"}
+        fields["sha256"] = file_sha256(path)
+        manifest.record(url, entry["file"], **fields)
+        entry = manifest.entry(url)
+    return entry["sha256"], entry["file"]
+
+def dedupe_folder(manifest, new_urls, existing_urls=()):
+    """
+    Collapse duplicates among the images of new_urls (downloaded or copied in this run)
+    onto one canonical file per content hash. An image of existing_urls (already on disk)
+    is preferred as the canonical file; otherwise the first file name in sort order.
+    Returns (remap, stats): remap is {url: "Images/<canonical>"} for every URL whose file
+    changed, stats {"removed": files deleted, "bytes": bytes freed}.
+    """
+    new_urls = set(new_urls)
+    groups = {}
+    for url in sorted(new_urls | set(existing_urls)):
+        sha256, name = _content_hash(manifest, url)
+        if sha256:
+            groups.setdefault(sha256, []).append((url, name))
+
+    remap = {}
+    stats = {"removed": 0, "bytes": 0}
+    for members in groups.values():
+        names = {name for _, name in members}
+        if len(names) < 2:
+            continue
+        kept = sorted(names, key=lambda name: (
+            not any(url not in new_urls for url, n in members if n == name), name
+        ))
+        canonical = kept[0]
+        # A file may only go if every URL pointing at it was written in this run
+        removable = {
+            name for name in names
+            if name != canonical and all(url in new_urls for url, n in members if n == name)
+        }
+        for url, name in members:
+            if name not in removable:
+                continue
+            entry = manifest.entry(url)
+            manifest.record(url, canonical, **{k: v for k, v in entry.items() if k != "file"})
+            remap[url] = f"Images/{canonical}"
+        for name in removable:
+            path = manifest.images_dir / name
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                continue
+            stats["removed"] += 1
+            stats["bytes"] += size
+    return remap, stats
+
+#####################################
+def link_identical(manifests, folder_urls):
+    """
+    Across Images folders: replace each file that duplicates one in an earlier folder with
+    a reflink / hardlink of it (same path, same bytes, stored once). folder_urls is
+    {images_dir: [url, ...]}. Plain copies are not made, since they would save nothing. Returns {"linked": files, "bytes": bytes shared}.
+    """
+    first = {}
+    stats = {"linked": 0, "bytes": 0}
+    for images_dir, urls in folder_urls.items():
+        manifest = manifests.get(images_dir)
+        for url in sorted(urls):
+            sha256, name = _content_hash(manifest, url)
+            if not sha256:
+                continue
+            path = Path(images_dir) / name
+            source = first.setdefault(sha256, path)
+            if source == path:
+                continue
+            try:
+                if os.path.samefile(source, path):
+                    continue
+                tmp = path.with_name(f".{path.name}.dedup")
+                if link_or_copy(source, tmp) == "copy":
+                    os.remove(tmp)
+                    continue
+                os.replace(tmp, path)
+            except OSError:
+                continue
+            stats["linked"] += 1
+            stats["bytes"] += path.stat().st_size
+    return stats
+
+#####################################
+def dedupe(manifests, folder_statuses, scope="folder"):
+    """
+    Run the de-duplication stage over one run's results.
+    folder_statuses is {images_dir: {url: status}}; 'downloaded' and 'cached' images are new
+    in this run, anything else was already there. scope "corpus" also links identical files
+    across folders. Returns ({images_dir: {url: "Images/<canonical>"}}, stats).
+    """
+    if scope not in DEDUP_SCOPES:
+        raise ValueError(f"Unknown dedup scope {scope!r}, expected one of {DEDUP_SCOPES}")
+    remaps = {}
+    stats = {"removed": 0, "bytes": 0, "linked": 0, "linked_bytes": 0}
+    for images_dir, statuses in folder_statuses.items():
+        new_urls = [url for url, status in statuses.items() if status in ('downloaded', 'cached')]
+        existing_urls = [url for url, status in statuses.items() if status == 'exists']
+        remap, folder_stats = dedupe_folder(manifests.get(images_dir), new_urls, existing_urls)
+        if remap:
+            remaps[images_dir] = remap
+        stats["removed"] += folder_stats["removed"]
+        stats["bytes"] += folder_stats["bytes"]
+    if scope == "corpus" and len(folder_statuses) > 1:
+        linked = link_identical(manifests, folder_statuses)
+        stats["linked"] = linked["linked"]
+        stats["linked_bytes"] = linked["bytes"]
+    return remaps, stats
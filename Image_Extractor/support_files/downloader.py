@@ -0,0 +1,476 @@
+"""
+File: downloader.py
+
+Description:
+    Download engines for the Markdown Image Downloader.
+    Both engines share one pooled, keep-alive HTTP client for every asset in a run
+    (instead of a new TCP/TLS handshake per image) and cap concurrency per host:
+    - "thread": a ThreadPoolExecutor over a shared requests.Session
+    - "async":  an asyncio event loop over a shared aiohttp.ClientSession, max_workers
+                downloads at a time (a semaphore, like the thread pool's workers)
+    429 / 5xx answers and dropped connections are retried through one shared
+    RetryScheduler (backoff, rate limits, circuit breaker; see retry.py).
+    With an AdaptiveConcurrency (see concurrency.py) the number of downloads in flight
+    follows measured latency, errors and throughput instead of staying at max_workers.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - aiohttp (only for the "async" engine)
+    - asyncio
+    - concurrent.futures
+    - utils.py
+    - cache.py (optional AssetCache)
+    - manifest.py
+    - resume.py
+    - retry.py
+    - metrics.py (optional DownloadMetrics)
+    - concurrency.py (optional AdaptiveConcurrency)
+
+Usage:
+    from support_files.downloader import download_assets
+    results = download_assets(jobs, USER_SESSION, engine="async", max_workers=32, per_host_limit=8)
+    with DownloadPool(16) as pool:                  # kept warm across calls (thread engine)
+        results = download_assets(jobs, USER_SESSION, pool=pool)
+    results = download_assets(jobs, USER_SESSION, concurrency=AdaptiveConcurrency(4, 2, 64))
+    # jobs: [(url, filename, images_dir[, task_id]), ...]
+    # results: [(url, image_rel_path, status), ...] in completion order
+
+
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from support_files.manifest import ManifestSet
+from support_files.resume import PartialDownload
+from support_files.retry import RetryScheduler
+from support_files.utils import (
+    build_headers,
+    conditional_headers,
+    download_image_task,
+    planned_url_expired,
+    session_for,
+)
+
+ENGINES = ("thread", "async")
+
+#####################################
+def make_http_session(pool_size):
+    """
+    Create a requests.Session whose connection pool can hold pool_size keep-alive
+    connections per host, so worker threads never wait on or discard connections.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class DownloadPool:
+    """
+    A pooled HTTP session and worker threads kept alive across download_assets calls
+    (thread engine), so a long-running process (see service.py) pays for connection
+    setup and thread start-up once instead of once per run.
+    """
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.http_session = make_http_session(max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.http_session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+#####################################
+def _host(url):
+    return urlparse(url).netloc
+
+def _slot_count(max_workers, concurrency=None, pool=None):
+    """
+    Downloads that can really be in flight at once: the worker threads (or async slots),
+    capped by an adaptive limit's maximum. Metrics measure utilisation against this.
+    """
+    slots = pool.max_workers if pool is not None else max_workers
+    if concurrency is None:
+        return slots
+    return concurrency.max_limit if pool is None else min(slots, concurrency.max_limit)
+
+def _split_job(job):
+    url, filename, images_dir = job[:3]
+    task_id = job[3] if len(job) > 3 else None
+    return url, filename, Path(images_dir), task_id
+
+#####################################
+def _download_threaded(
+    jobs, user_session, max_workers, per_host_limit, progress, on_done, manifests, refresh, scheduler, metrics,
+    resolved, pool=None, concurrency=None,
+):
+    host_limits = {}
+    limits_lock = threading.Lock()
+
+    def host_limit(url):
+        with limits_lock:
+            return host_limits.setdefault(_host(url), threading.BoundedSemaphore(per_host_limit))
+
+    def task(http_session, url, filename, images_dir, task_id):
+        if concurrency is not None:
+            concurrency.acquire()
+        trace, result = {}, (url, None, 'failed')
+        try:
+            with host_limit(url):
+                trace = metrics.begin(url) if metrics is not None else {}
+                result = download_image_task(
+                    url, filename, images_dir, user_session, progress, task_id,
+                    http_session=http_session, manifest=manifests.get(images_dir), refresh=refresh,
+                    scheduler=scheduler, trace=trace, resolved_url=resolved.get(url),
+                )
+                if metrics is not None:
+                    metrics.end(trace, result[2])
+                return result
+        finally:
+            if concurrency is not None:
+                concurrency.release(trace, result[2])
+
+    results = []
+    owned = pool is None
+    if owned:
+        # Adaptive runs need a thread for every slot the limit may open
+        pool = DownloadPool(_slot_count(max_workers, concurrency))
+    try:
+        futures = [
+            pool.executor.submit(task, pool.http_session, *_split_job(job))
+            for job in jobs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_done:
+                on_done(*result)
+    finally:
+        if owned:
+            pool.close()
+    return results
+
+#####################################
+async def _fetch_to_part_async(client, url, headers, partial, update, trace):
+    """
+    Async twin of utils._fetch_to_part: returns (status, headers, image_path),
+    status None for a dropped connection or a short body.
+    """
+    import aiohttp
+
+    trace["attempts"] = trace.get("attempts", 0) + 1
+    range_headers = partial.range_headers()
+    attempts = [{**headers, **range_headers}, headers] if range_headers else [headers]
+    sent = time.perf_counter()
+    try:
+        for attempt_headers in attempts:
+            async with client.get(
+                url, headers=attempt_headers, allow_redirects=True, trace_request_ctx=trace
+            ) as response:
+                headers_at = time.perf_counter()
+                trace["wait"] = trace.get("wait", 0.0) + headers_at - sent
+                trace["redirects"] = len(response.history)
+                trace["http_status"] = response.status
+                if attempt_headers is not headers and (
+                    response.status == 416 or not partial.accepts(response.status, response.headers)
+                ):
+                    # Range not satisfiable, or a 206 for some other offset (the part is unusable):
+                    # start again from zero
+                    partial.discard()
+                    continue
+                if response.status not in (200, 206):
+                    return response.status, response.headers, None
+                if not partial.accepts(response.status, response.headers):
+                    # A 206 for a range nobody asked for: worth a retry, not worth writing
+                    return None, None, None
+                ext = Path(urlparse(str(response.url)).path).suffix
+                offset = partial.begin(response.status, response.headers, str(response.url))
+                update(total=partial.total or 0, completed=offset)
+                with partial.open(offset) as f:
+                    async for chunk in response.content.iter_chunked(65536):
+                        f.write(chunk)
+                        partial.update(chunk)
+                        update(advance=len(chunk))
+                        trace["bytes"] = trace.get("bytes", 0) + len(chunk)
+                trace["transfer"] = trace.get("transfer", 0.0) + time.perf_counter() - headers_at
+            # Only a complete body is renamed into place; a short one stays .part to be resumed
+            image_path = partial.finish(ext)
+            return (response.status if image_path else None), response.headers, image_path
+    except (aiohttp.ClientError, OSError, asyncio.TimeoutError):
+        # Connection reset / timeout: the .part file is kept and resumed on the next attempt
+        pass
+    return None, None, None
+
+async def _download_one_async(
+    client, slots, user_session, url, filename, images_dir, task_id, progress, manifest, refresh, scheduler,
+    metrics, resolved_url, concurrency=None,
+):
+    if concurrency is not None:
+        await concurrency.acquire_async()
+    trace, result = {}, (url, None, 'failed')
+    try:
+        # Like a worker thread: the trace starts once the asset has a slot, not while it queues for one
+        async with slots:
+            trace = metrics.begin(url) if metrics is not None else {}
+            result = await _download_asset_async(
+                client, user_session, url, filename, images_dir, task_id, progress, manifest, refresh, scheduler,
+                trace, resolved_url,
+            )
+            if metrics is not None:
+                metrics.end(trace, result[2])
+            return result
+    finally:
+        if concurrency is not None:
+            await concurrency.release_async(trace, result[2])
+
+async def _download_asset_async(
+    client, user_session, url, filename, images_dir, task_id, progress, manifest, refresh, scheduler, trace,
+    resolved_url=None,
+):
+    def update(**kwargs):
+        if progress is not None and task_id is not None:
+            progress.update(task_id, **kwargs)
+
+    existing = manifest.find(url, filename)
+    extra_headers = {}
+    if existing:
+        extra_headers = conditional_headers(manifest.entry(url)) if refresh else None
+        if not extra_headers:
+            update(completed=1)
+            return url, existing, 'exists'
+    # Downloads go to a .part file; continue an interrupted one with a Range request
+    partial = PartialDownload(images_dir, filename)
+    fetch_url = resolved_url or url
+    # The cookie only goes to the GitHub host, not to a planned URL elsewhere (see utils.session_for)
+    headers = {**build_headers(session_for(url, fetch_url, user_session)), **extra_headers}
+    for attempt in range(scheduler.attempts):
+        wait = scheduler.reserve(url)
+        if wait is None:
+            # Circuit open: this host keeps failing, do not add to its load
+            break
+        if wait > 0:
+            await asyncio.sleep(wait)
+        status, response_headers, image_path = await _fetch_to_part_async(
+            client, fetch_url, headers, partial, update, trace
+        )
+        if fetch_url != url and planned_url_expired(status):
+            # Signed S3 URLs are short-lived: resolve through the GitHub URL again
+            fetch_url = url
+            headers = {**build_headers(user_session), **extra_headers}
+            status, response_headers, image_path = await _fetch_to_part_async(
+                client, url, headers, partial, update, trace
+            )
+        delay = scheduler.retry_delay(url, attempt, status, response_headers)
+        if existing and status == 304:
+            update(completed=1)
+            return url, existing, 'exists'
+        if image_path is not None:
+            manifest.record(
+                url,
+                image_path.name,
+                final_url=partial.final_url,
+                etag=partial.etag,
+                last_modified=partial.last_modified,
+                size=partial.size,
+                sha256=partial.sha256,
+            )
+            update(completed=partial.size)
+            return url, f"Images/{image_path.name}", 'downloaded'
+        if delay is None:
+            break
+        await asyncio.sleep(delay)
+    update(completed=1)
+    if existing:
+        return url, existing, 'exists'
+    return url, None, 'failed'
+
+def _trace_config():
+    """
+    aiohttp hooks that add DNS and connection set-up time to each request's metrics trace.
+    """
+    import aiohttp
+
+    def timed(phase):
+        async def on_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            trace = ctx.trace_request_ctx
+            if trace is not None and getattr(ctx, "started", None) is not None:
+                trace[phase] = trace.get(phase, 0.0) + time.perf_counter() - ctx.started
+            ctx.started = None
+        return on_start, on_end
+
+    config = aiohttp.TraceConfig()
+    dns_start, dns_end = timed("dns")
+    connect_start, connect_end = timed("connect")
+    config.on_dns_resolvehost_start.append(dns_start)
+    config.on_dns_resolvehost_end.append(dns_end)
+    config.on_connection_create_start.append(connect_start)
+    config.on_connection_create_end.append(connect_end)
+    return config
+
+async def _download_async_main(
+    jobs, user_session, max_workers, per_host_limit, progress, on_done, manifests, refresh, scheduler, metrics,
+    resolved, concurrency=None,
+):
+    import aiohttp
+
+    limit = _slot_count(max_workers, concurrency)
+    slots = asyncio.Semaphore(limit)
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=per_host_limit)
+    trace_configs = [_trace_config()] if metrics is not None else None
+    results = []
+    async with aiohttp.ClientSession(connector=connector, trace_configs=trace_configs) as client:
+        tasks = [
+            asyncio.ensure_future(_download_one_async(
+                client, slots, user_session, url, filename, images_dir, task_id, progress,
+                manifests.get(images_dir), refresh, scheduler, metrics, resolved.get(url), concurrency,
+            ))
+            for url, filename, images_dir, task_id in (_split_job(job) for job in jobs)
+        ]
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            results.append(result)
+            if on_done:
+                on_done(*result)
+    return results
+
+#####################################
+def _materialize_cached(jobs, cache, progress, on_done, manifests, metrics):
+    """
+    Serve jobs from the asset cache where possible.
+    Returns (jobs still needing the network, results for the cached ones).
+    """
+    remaining = []
+    results = []
+    for job in jobs:
+        url, filename, images_dir, task_id = _split_job(job)
+        manifest = manifests.get(images_dir)
+        image_rel_path = None
+        if not manifest.find(url, filename):
+            image_rel_path = cache.materialize(url, images_dir, filename)
+        if not image_rel_path:
+            remaining.append(job)
+            continue
+        cached = cache.entry(url)
+        manifest.record(url, Path(image_rel_path).name, size=cached.get("size"), sha256=cached.get("sha256"))
+        if progress is not None and task_id is not None:
+            progress.update(task_id, completed=1, total=1)
+        results.append((url, image_rel_path, 'cached'))
+        if metrics is not None:
+            metrics.record(url, 'cached', cached.get("size") or 0)
+        if on_done:
+            on_done(url, image_rel_path, 'cached')
+    return remaining, results
+
+#####################################
+def download_assets(
+    jobs,
+    user_session,
+    engine="thread",
+    max_workers=4,
+    per_host_limit=8,
+    progress=None,
+    on_done=None,
+    cache=None,
+    manifests=None,
+    refresh=False,
+    scheduler=None,
+    metrics=None,
+    resolved=None,
+    pool=None,
+    concurrency=None,
+):
+    """
+    Download every job through one pooled HTTP client.
+    jobs is a list of (url, filename, images_dir) or (url, filename, images_dir, task_id);
+    task_id is only used when a rich Progress is passed in.
+    on_done(url, image_rel_path, status) is called as each download finishes.
+    With an AssetCache, cached assets are linked in with status 'cached' and never
+    requested, and every new download is added to the cache.
+    Existing files are found through each Images/ folder's manifest (see manifest.py);
+    refresh=True re-validates them with conditional GETs.
+    scheduler is a RetryScheduler (see retry.py) shared by every job; by default 429 / 5xx
+    answers and dropped connections get up to 5 attempts with jittered backoff.
+    metrics is an optional DownloadMetrics (see metrics.py) that gets one timing event per job;
+    its max_workers is set to the number of downloads that can really be in flight.
+    resolved is {url: final URL} from a download plan (see plan.py); those assets are requested
+    at their final URL directly, skipping the redirect (an expired one falls back to url).
+    pool is an optional DownloadPool reused by the thread engine instead of a new session and
+    executor (its max_workers then applies).
+    concurrency is an optional AdaptiveConcurrency (see concurrency.py) shared by every job: it
+    starts at its own initial limit and moves between its floor and ceiling as latency, errors
+    and bytes/second change. It is capped at per_host_limit times the hosts in jobs, the most
+    that can really be in flight, and then also sizes the pool in place of max_workers.
+    Returns [(url, image_rel_path, status), ...] in completion order.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown download engine {engine!r}, expected one of {ENGINES}")
+    if manifests is None:
+        manifests = ManifestSet()
+    if scheduler is None:
+        scheduler = RetryScheduler()
+    if resolved is None:
+        resolved = {}
+
+    results = []
+    if cache is not None and not refresh:
+        jobs, results = _materialize_cached(jobs, cache, progress, on_done, manifests, metrics)
+    if concurrency is not None and jobs:
+        # Each host takes at most per_host_limit downloads, so a higher limit could never be filled
+        concurrency.cap(per_host_limit * len({_host(_split_job(job)[0]) for job in jobs}))
+    if metrics is not None:
+        metrics.max_workers = _slot_count(max_workers, concurrency, pool if engine == "thread" else None)
+
+    if cache is not None:
+        user_on_done = on_done
+        job_dirs = {_split_job(job)[0]: _split_job(job)[2] for job in jobs}
+
+        def on_done(url, image_rel_path, status):
+            # Every fresh download goes into the shared cache for the next document / run
+            if status == 'downloaded':
+                entry = manifests.get(job_dirs[url]).entry(url) or {}
+                try:
+                    cache.store(url, job_dirs[url] / Path(image_rel_path).name, entry.get("sha256"))
+                except OSError:
+                    pass
+            if user_on_done:
+                user_on_done(url, image_rel_path, status)
+
+    try:
+        if engine == "async":
+            try:
+                import aiohttp  # noqa: F401
+            except ImportError as e:
+                raise ImportError("The async download engine needs aiohttp: pip install aiohttp") from e
+            results += asyncio.run(_download_async_main(
+                jobs, user_session, max_workers, per_host_limit, progress, on_done, manifests, refresh,
+                scheduler, metrics, resolved, concurrency,
+            ))
+        else:
+            results += _download_threaded(
+                jobs, user_session, max_workers, per_host_limit, progress, on_done, manifests, refresh,
+                scheduler, metrics, resolved, pool, concurrency,
+            )
+    finally:
+        manifests.save_all()
+        if cache is not None:
+            cache.save()
+    return results
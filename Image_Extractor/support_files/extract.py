@@ -0,0 +1,174 @@
+"""
+File: extract.py
+
+Description:
+    Library entry point for the Markdown Image Downloader.
+    extract_images runs the extract → download → rewrite pipeline for one Markdown
+    file and returns a summary dict, with no file dialog, terminal clearing or
+    console output, so it can be called in-process from other scripts, services
+    and worker processes. main.py is the interactive wrapper around it;
+    run_batch (batch.py) is the equivalent for whole directory trees.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - pathlib
+    - dedup.py
+    - downloader.py
+    - manifest.py
+    - optimize.py
+    - parser.py
+    - scan.py
+    - streaming.py
+
+Usage:
+    from support_files.extract import extract_images
+    summary = extract_images("docs/notes.md", USER_SESSION, BASE_URL, ASSETS_ENDPOINT, engine="async")
+
+
+"""
+from pathlib import Path
+
+from support_files.dedup import dedupe
+from support_files.downloader import download_assets
+from support_files.manifest import ManifestSet
+from support_files.optimize import display_sizes, optimize_docs, optimize_totals
+from support_files.parser import unique_assets
+from support_files.scan import file_stamp, rewrite_file, scan_file
+from support_files.streaming import CHUNK_SIZE, stream_image_refs, stream_rewrite
+
+#####################################
+def extract_images(
+    md_path,
+    user_session,
+    base_url,
+    assets_endpoint,
+    max_workers=4,
+    engine="thread",
+    per_host_limit=8,
+    cache=None,
+    refresh=False,
+    scheduler=None,
+    metrics=None,
+    streaming_threshold=None,
+    chunk_size=CHUNK_SIZE,
+    progress=None,
+    on_asset_done=None,
+    dedup=False,
+    optimize=None,
+    concurrency=None,
+):
+    """
+    Download the GitHub assets referenced by one Markdown file into its Images/ folder
+    and rewrite the file to use the local paths.
+    progress is an optional rich Progress or AggregateProgress (one task is added per asset,
+    see progress.py); on_asset_done(url, status) is called as each asset finishes.
+    dedup=True collapses byte-identical images in the Images folder to one file (see dedup.py).
+    optimize is optional optimize_settings(...): links then point at right-sized, recompressed
+    variants of the downloaded images (see optimize.py).
+    concurrency is an optional AdaptiveConcurrency (see concurrency.py) that sets the number of
+    downloads in flight instead of max_workers; its decisions are in the summary.
+    The other options are as for run_batch (see batch.py).
+    Returns a summary dict with counts, the list of failed URLs and whether the file was rewritten.
+    """
+    md_path = Path(md_path)
+    # Very large files are scanned and rewritten in chunks instead of being read whole
+    streaming = streaming_threshold is not None and md_path.stat().st_size > streaming_threshold
+    stamp = file_stamp(md_path)
+    if streaming:
+        refs = list(stream_image_refs(md_path, base_url, assets_endpoint, chunk_size))
+    else:
+        # Markdown, reference links, <img> tags; code blocks skipped (memory-mapped, see scan.py)
+        refs = scan_file(md_path, base_url, assets_endpoint)
+    assets = unique_assets(refs)
+
+    images_dir = md_path.parent / "Images"
+    if assets:
+        images_dir.mkdir(exist_ok=True)
+
+    if progress is not None:
+        jobs = [
+            (url, filename, images_dir, progress.add_task(f"Downloading {filename}", total=1))
+            for url, filename in assets
+        ]
+    else:
+        jobs = [(url, filename, images_dir) for url, filename in assets]
+
+    # AggregateProgress tracks which assets are still active; a rich Progress has no finish()
+    finish = getattr(progress, "finish", None)
+    task_ids = {job[0]: job[3] for job in jobs} if finish is not None else {}
+
+    def on_done(url, image_rel_path, status):
+        if finish is not None:
+            finish(task_ids[url], status)
+        if on_asset_done:
+            on_asset_done(url, status)
+
+    manifests = ManifestSet()
+    results = download_assets(
+        jobs,
+        user_session,
+        engine=engine,
+        max_workers=max_workers,
+        per_host_limit=per_host_limit,
+        progress=progress,
+        on_done=on_done,
+        cache=cache,
+        manifests=manifests,
+        refresh=refresh,
+        scheduler=scheduler,
+        metrics=metrics,
+        concurrency=concurrency,
+    )
+
+    downloaded = 0
+    from_cache = 0
+    already_exists = 0
+    failed_images = []
+    replacements = {}
+    for url, image_rel_path, status in results:
+        if status == 'downloaded' and image_rel_path:
+            replacements[url] = image_rel_path
+            downloaded += 1
+        elif status == 'cached' and image_rel_path:
+            replacements[url] = image_rel_path
+            from_cache += 1
+        elif status == 'exists':
+            already_exists += 1
+        else:
+            failed_images.append(url)
+
+    dedup_stats = None
+    if dedup:
+        remaps, dedup_stats = dedupe(manifests, {images_dir: {url: status for url, _, status in results}})
+        replacements.update({
+            url: path for url, path in remaps.get(images_dir, {}).items() if url in replacements
+        })
+        manifests.save_all()
+
+    optimized = None
+    if optimize is not None:
+        optimized = optimize_docs(
+            {md_path: replacements}, display_sizes(refs), optimize, max_workers=max_workers
+        )
+
+    # Splice the local paths in at the scanned byte offsets (temp file + rename)
+    if streaming:
+        replaced = stream_rewrite(md_path, replacements, base_url, assets_endpoint, chunk_size)
+    else:
+        replaced = rewrite_file(md_path, refs, replacements, base_url, assets_endpoint, stamp)
+
+    return {
+        "markdown_file": md_path,
+        "urls_found": len(assets),
+        "downloaded": downloaded,
+        "from_cache": from_cache,
+        "already_exists": already_exists,
+        "failed": failed_images,
+        "rewritten": bool(replaced),
+        "dedup": dedup_stats,
+        "optimized": optimized,
+        "optimize_totals": optimize_totals(optimized) if optimized is not None else None,
+        "concurrency": concurrency.summary() if concurrency is not None else None,
+    }
@@ -0,0 +1,163 @@
+"""
+File: index.py
+
+Description:
+    Corpus index for incremental batch runs of the Markdown Image Downloader.
+    One JSON file records, for every Markdown file a run has processed:
+    - its (size, mtime) stamp and SHA-256 as the run left it (after the rewrite)
+    - each asset URL it referenced, with the local image path and the download status
+    A later run with the same index only processes documents that are new, whose content
+    hash changed, that still have a failed (or not yet linked) asset, or whose local image
+    file has gone; the rest are not even scanned. A changed stamp with an unchanged hash
+    (a touch, a checkout) only refreshes the stamp.
+    The reverse map (asset URL -> documents) is rebuilt on load, so "which documents use
+    this asset" is a dict lookup.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - json
+    - time
+    - pathlib
+    - cache.py (file_sha256)
+    - scan.py
+    - utils.py (atomic_write)
+
+Usage:
+    index = CorpusIndex("docs/.image_index.json")
+    summary = run_batch(["docs/"], ..., index=index)        # saves the index
+    index.docs_using("https://github.com/user-attachments/assets/<uuid>")
+
+
+"""
+import json
+import time
+from pathlib import Path
+
+from support_files.cache import file_sha256
+from support_files.scan import file_stamp, scan_local_images
+from support_files.utils import atomic_write
+
+INDEX_VERSION = 1
+LINKED_STATUSES = ('downloaded', 'cached', 'exists')
+
+#####################################
+class CorpusIndex:
+    """
+    {md_path: {"stamp", "sha256", "processed_at", "assets": {url: {"path", "status"}}}} on disk,
+    plus the in-memory reverse map {url: {md_path, ...}}.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.docs = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                raise ValueError(f"{self.path} is not a version {INDEX_VERSION} corpus index")
+            self.docs = data["docs"]
+        self.users = {}
+        for md_path, doc in self.docs.items():
+            for url in doc["assets"]:
+                self.users.setdefault(url, set()).add(md_path)
+        self.dirty = False
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({"version": INDEX_VERSION, "docs": self.docs}, f, indent=1)
+        self.dirty = False
+
+    #####################################
+    def docs_using(self, url):
+        # Documents that reference url (as a remote URL, or through its downloaded image)
+        return sorted(self.users.get(url, ()))
+
+    def doc(self, md_path):
+        return self.docs.get(str(md_path))
+
+    def failed_assets(self):
+        # {url: [md_path, ...]} for every asset whose last download failed
+        return {
+            url: self.docs_using(url)
+            for url in self.users
+            if any(self.docs[md]["assets"][url]["status"] == 'failed' for md in self.users[url])
+        }
+
+    #####################################
+    def _needs_run(self, md_path, doc):
+        # Why md_path must be processed again, or None when it can be skipped
+        if doc is None:
+            return "new"
+        if any(entry["status"] not in LINKED_STATUSES for entry in doc["assets"].values()):
+            # A failed download, or a document left untouched because of one (skip_incomplete)
+            return "incomplete"
+        images = md_path.parent
+        if any(entry["path"] and not (images / entry["path"]).exists() for entry in doc["assets"].values()):
+            return "missing"
+        stamp = list(file_stamp(md_path))
+        if doc["stamp"] == stamp:
+            return None
+        if file_sha256(md_path) != doc["sha256"]:
+            return "changed"
+        # Same bytes, new mtime (touch, checkout): nothing to do but remember the stamp
+        doc["stamp"] = stamp
+        self.dirty = True
+        return None
+
+    def select(self, md_files):
+        """
+        Split md_files into (to_process, reasons, skipped): reasons is {md_path: "new" /
+        "changed" / "incomplete" / "missing"}, skipped the documents that are up to date.
+        """
+        to_process, reasons, skipped = [], {}, []
+        for md_path in md_files:
+            reason = self._needs_run(md_path, self.doc(md_path))
+            if reason is None:
+                skipped.append(md_path)
+            else:
+                to_process.append(md_path)
+                reasons[md_path] = reason
+        return to_process, reasons, skipped
+
+    #####################################
+    def update(self, md_path, assets):
+        """
+        Record a processed document as it is now. assets is {url: {"path", "status"}} for the
+        asset URLs found in this run; assets recorded before are kept while the document
+        still links to their local image (they were rewritten by an earlier run).
+        """
+        key = str(md_path)
+        previous = self.docs.get(key, {}).get("assets", {})
+        linked = None
+        if any(url not in assets for url in previous):
+            linked = {ref.url[2:] if ref.url.startswith("./") else ref.url for ref in scan_local_images(md_path)}
+        merged = {
+            url: entry for url, entry in previous.items()
+            if url not in assets and entry["path"] and entry["path"] in linked
+        }
+        merged.update(assets)
+        for url in previous:
+            if url not in merged:
+                self.users.get(url, set()).discard(key)
+        for url in merged:
+            self.users.setdefault(url, set()).add(key)
+        self.docs[key] = {
+            "stamp": list(file_stamp(md_path)),
+            "sha256": file_sha256(md_path),
+            "processed_at": time.time(),
+            "assets": merged,
+        }
+        self.dirty = True
+
+    def forget_missing(self, md_files):
+        # Drop documents under the run's targets that no longer exist
+        present = {str(p) for p in md_files}
+        for key in [k for k in self.docs if k not in present and not Path(k).exists()]:
+            for url in self.docs[key]["assets"]:
+                self.users.get(url, set()).discard(key)
+            del self.docs[key]
+            self.dirty = True
@@ -0,0 +1,196 @@
+"""
+File: jobqueue.py
+
+Description:
+    Durable local work queue for the Markdown Image Downloader's worker service.
+    One SQLite file holds one row per job (a Markdown file to process) with its state:
+    pending -> running -> done / failed. Any process can add jobs (CI, a git hook,
+    worker.py enqueue) while a worker service (see service.py) claims them in batches.
+    - adding a file that already has a pending job does nothing, so a burst of changes
+      to one file is processed once
+    - claiming is one IMMEDIATE transaction, so several workers can share a queue
+    - jobs left running by a worker that died are put back to pending on start-up
+    SQLite in WAL mode lets readers (worker.py status) look while a worker writes.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - json
+    - os
+    - sqlite3
+    - threading
+    - time
+    - pathlib
+
+Usage:
+    queue = JobQueue(QUEUE_PATH)
+    queue.enqueue(["docs/notes.md"])
+    for job in queue.claim(100):
+        ...
+        queue.finish(job["id"], "done", summary)
+
+
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+JOB_STATES = ("pending", "running", "done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    source TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_pid INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS jobs_path ON jobs (path, state);
+"""
+
+#####################################
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+#####################################
+class JobQueue:
+    """
+    SQLite-backed job queue. Thread-safe within a process; safe to share between processes.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        # Autocommit mode: every transaction below is explicit
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    #####################################
+    def enqueue(self, paths, source=None):
+        """
+        Add a pending job for each path that does not have one yet. Returns the number added.
+        """
+        added = 0
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for path in paths:
+                    path = str(Path(path).resolve())
+                    if self.db.execute(
+                        "SELECT 1 FROM jobs WHERE path = ? AND state = 'pending'", (path,)
+                    ).fetchone():
+                        continue
+                    self.db.execute(
+                        "INSERT INTO jobs (path, source, enqueued_at) VALUES (?, ?, ?)", (path, source, now)
+                    )
+                    added += 1
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return added
+
+    def claim(self, limit):
+        """
+        Mark up to limit pending jobs (oldest first) as running by this process and return them
+        as dicts. A file that is being processed already is left for later.
+        """
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute(
+                    "SELECT id, path FROM jobs WHERE state = 'pending' "
+                    "AND path NOT IN (SELECT path FROM jobs WHERE state = 'running') ORDER BY id LIMIT ?",
+                    (limit,),
+                ).fetchall()
+                now = time.time()
+                self.db.executemany(
+                    "UPDATE jobs SET state = 'running', started_at = ?, worker_pid = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    [(now, os.getpid(), row["id"]) for row in rows],
+                )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return [{"id": row["id"], "path": row["path"]} for row in rows]
+
+    def finish(self, job_id, state, summary=None):
+        if state not in ("done", "failed"):
+            raise ValueError(f"Unknown final job state {state!r}")
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, summary = ? WHERE id = ?",
+                (state, time.time(), json.dumps(summary) if summary is not None else None, job_id),
+            )
+
+    def release(self, job_ids):
+        # Put claimed jobs back (e.g. the worker is shutting down before running them)
+        with self.lock:
+            self.db.executemany(
+                "UPDATE jobs SET state = 'pending', worker_pid = NULL WHERE id = ? AND state = 'running'",
+                [(job_id,) for job_id in job_ids],
+            )
+
+    def recover(self):
+        """
+        Put running jobs whose worker process is gone back to pending. Returns how many.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT id, worker_pid FROM jobs WHERE state = 'running'").fetchall()
+            stale = [(row["id"],) for row in rows if row["worker_pid"] != os.getpid() and not _pid_alive(row["worker_pid"])]
+            self.db.executemany("UPDATE jobs SET state = 'pending', worker_pid = NULL WHERE id = ?", stale)
+        return len(stale)
+
+    #####################################
+    def counts(self):
+        with self.lock:
+            rows = self.db.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def recent(self, limit=20):
+        # The most recently finished jobs, newest first
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT * FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row, summary=json.loads(row["summary"]) if row["summary"] else None) for row in rows]
+
+    def prune(self, older_than):
+        """
+        Delete finished jobs that finished more than older_than seconds ago. Returns how many.
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed') AND finished_at < ?", (time.time() - older_than,)
+            )
+        return cursor.rowcount
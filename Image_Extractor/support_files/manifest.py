@@ -0,0 +1,131 @@
+"""
+File: manifest.py
+
+Description:
+    Per-Images/ folder manifest for the Markdown Image Downloader.
+    Each Images/ folder gets a .image_manifest.json recording, for every asset URL:
+    the local filename, final redirected URL, ETag, Last-Modified, size and SHA-256.
+    - "Does this asset exist locally?" becomes a dictionary lookup (plus one stat)
+      instead of a glob over the folder for every URL.
+    - Refresh mode uses the stored ETag / Last-Modified to send conditional GETs,
+      so unchanged images cost a 304 and no body.
+    Folders created before manifests existed are indexed once with a single scandir.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - json
+    - os
+    - threading
+    - pathlib
+    - resume.py
+
+Usage:
+    manifests = ManifestSet()
+    manifest = manifests.get(images_dir)
+    image_rel_path = manifest.find(url, filename)
+    manifest.record(url, "uuid.png", final_url=..., etag=..., last_modified=..., size=..., sha256=...)
+    manifests.save_all()
+
+
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+from support_files.resume import is_partial_file
+
+MANIFEST_NAME = ".image_manifest.json"
+
+#####################################
+class ImagesManifest:
+    def __init__(self, images_dir):
+        self.images_dir = Path(images_dir)
+        self.path = self.images_dir / MANIFEST_NAME
+        self.lock = threading.Lock()
+        self.dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.assets = json.load(f)
+        except (OSError, ValueError):
+            self.assets = {}
+        self._names = None
+
+    def _legacy_names(self):
+        # {base name: file name} for files that predate the manifest, built with one scandir
+        if self._names is None:
+            names = {}
+            try:
+                with os.scandir(self.images_dir) as entries:
+                    for entry in entries:
+                        if entry.is_file() and entry.name != MANIFEST_NAME and not is_partial_file(entry.name):
+                            names.setdefault(entry.name.split(".", 1)[0], entry.name)
+            except FileNotFoundError:
+                pass
+            self._names = names
+        return self._names
+
+    def entry(self, url):
+        with self.lock:
+            return self.assets.get(url)
+
+    def find(self, url, filename):
+        """
+        Return the relative image path ("Images/...") of an asset already on disk, or None.
+        """
+        with self.lock:
+            entry = self.assets.get(url)
+            if entry and (self.images_dir / entry["file"]).exists():
+                return f"Images/{entry['file']}"
+            name = self._legacy_names().get(filename)
+            if name and (self.images_dir / name).exists():
+                # Adopt the legacy file so the next lookup hits the manifest
+                self.assets[url] = {"file": name, "size": (self.images_dir / name).stat().st_size}
+                self.dirty = True
+                return f"Images/{name}"
+        return None
+
+    def record(self, url, file, **fields):
+        """
+        Store (or replace) the entry for url. fields: final_url, etag, last_modified, size, sha256.
+        """
+        with self.lock:
+            self.assets[url] = {"file": file, **{k: v for k, v in fields.items() if v is not None}}
+            if self._names is not None:
+                self._names[file.split(".", 1)[0]] = file
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            self.images_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.assets, f, indent=1)
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+#####################################
+class ManifestSet:
+    """
+    One ImagesManifest per Images/ folder, shared by every worker in a run.
+    """
+    def __init__(self):
+        self.manifests = {}
+        self.lock = threading.Lock()
+
+    def get(self, images_dir):
+        key = Path(images_dir)
+        with self.lock:
+            if key not in self.manifests:
+                self.manifests[key] = ImagesManifest(key)
+            return self.manifests[key]
+
+    def save_all(self):
+        with self.lock:
+            manifests = list(self.manifests.values())
+        for manifest in manifests:
+            manifest.save()
@@ -0,0 +1,196 @@
+"""
+File: metrics.py
+
+Description:
+    Structured metrics and tracing for the Markdown Image Downloader's download pipeline.
+    A DownloadMetrics object is shared by every worker in a run and records one event
+    per asset: status, bytes, attempts, redirect hops and where the time went:
+    - dns / connect:  name resolution and TCP/TLS set-up (async engine, via aiohttp tracing)
+    - wait:           request sent until response headers arrived (includes dns / connect
+                      for the thread engine, which requests does not break down further)
+    - transfer:       reading the body
+    - total:          from the worker picking the asset up to it being finished
+    The run summary has p50 / p95 / p99 latencies, throughput in MB/s and concurrency
+    utilisation (average assets in flight / max_workers, which download_assets sets to the
+    download slots the engine really has). Events and summary can be written as JSON lines,
+    or as a Prometheus textfile for node_exporter.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - json
+    - math
+    - threading
+    - time
+    - urllib.parse
+
+Usage:
+    metrics = DownloadMetrics(max_workers=16, engine="thread")
+    download_assets(jobs, USER_SESSION, metrics=metrics)
+    metrics.summary()                         # {"assets": ..., "latency_p95": ..., ...}
+    metrics.write("run.jsonl")                # or "run.prom" for Prometheus
+
+
+"""
+import json
+import math
+import threading
+import time
+from urllib.parse import urlparse
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+#####################################
+def percentile(values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not values:
+        return None
+    rank = math.ceil(fraction * len(values))
+    return values[min(len(values), max(1, rank)) - 1]
+
+#####################################
+class DownloadMetrics:
+    """
+    Thread-safe recorder of per-asset timing events for one download run.
+    """
+
+    def __init__(self, max_workers=None, engine=None):
+        self.max_workers = max_workers
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.events = []
+        self.started = None
+        self.finished = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.busy_seconds = 0.0  # integral of in-flight assets over time
+        self._last_change = None
+
+    def _track(self, now, delta):
+        # Called with the lock held whenever the number of assets in flight changes
+        if self.started is None:
+            self.started = now
+        if self._last_change is not None:
+            self.busy_seconds += self.in_flight * (now - self._last_change)
+        self._last_change = now
+        self.in_flight += delta
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.finished = now
+
+    #####################################
+    def begin(self, url):
+        """
+        Start timing one asset. Returns its trace dict; the download code adds
+        wait / transfer / dns / connect seconds, bytes, redirects and attempts to it.
+        """
+        now = time.perf_counter()
+        with self.lock:
+            self._track(now, +1)
+        return {"url": url, "host": urlparse(url).netloc, "start": now, "attempts": 0, "bytes": 0}
+
+    def end(self, trace, status):
+        now = time.perf_counter()
+        event = {k: v for k, v in trace.items() if k != "start"}
+        event["status"] = status
+        event["total"] = now - trace["start"]
+        with self.lock:
+            self._track(now, -1)
+            event["t"] = trace["start"] - self.started
+            self.events.append(event)
+
+    def record(self, url, status, size=0):
+        # An asset that took no network time (served from the asset cache)
+        trace = self.begin(url)
+        trace["bytes"] = size
+        self.end(trace, status)
+
+    #####################################
+    def summary(self):
+        with self.lock:
+            events = list(self.events)
+            wall = (self.finished - self.started) if self.started is not None else 0.0
+            busy = self.busy_seconds
+            peak = self.peak_in_flight
+        fetched = [e for e in events if e["attempts"]]
+        latencies = sorted(e["total"] for e in fetched)
+        total_bytes = sum(e["bytes"] for e in events)
+        statuses = {}
+        for e in events:
+            statuses[e["status"]] = statuses.get(e["status"], 0) + 1
+        summary = {
+            "engine": self.engine,
+            "max_workers": self.max_workers,
+            "assets": len(events),
+            "statuses": statuses,
+            "bytes": total_bytes,
+            "wall_seconds": wall,
+            "throughput_mb_s": total_bytes / 1e6 / wall if wall else 0.0,
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_p99": percentile(latencies, 0.99),
+            "attempts": sum(e["attempts"] for e in events),
+            "redirects": sum(e.get("redirects", 0) for e in events),
+            "peak_in_flight": peak,
+            "avg_in_flight": busy / wall if wall else 0.0,
+        }
+        for phase in ("dns", "connect", "wait", "transfer"):
+            summary[f"{phase}_seconds"] = sum(e.get(phase, 0.0) for e in fetched)
+        if self.max_workers:
+            summary["utilisation"] = summary["avg_in_flight"] / self.max_workers
+        return summary
+
+    #####################################
+    def write_jsonl(self, path):
+        """
+        One JSON object per asset event, then one {"summary": {...}} line.
+        """
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.write(json.dumps({"summary": self.summary()}) + "\n")
+
+    def write_prometheus(self, path, prefix="image_extractor"):
+        """
+        Prometheus text exposition format (for node_exporter's textfile collector).
+        """
+        summary = self.summary()
+        with self.lock:
+            latencies = [e["total"] for e in self.events if e["attempts"]]
+        lines = [
+            f"# HELP {prefix}_download_seconds Time to download one asset, including retries.",
+            f"# TYPE {prefix}_download_seconds histogram",
+        ]
+        for bound in LATENCY_BUCKETS:
+            lines.append(f'{prefix}_download_seconds_bucket{{le="{bound}"}} {sum(1 for v in latencies if v <= bound)}')
+        lines.append(f'{prefix}_download_seconds_bucket{{le="+Inf"}} {len(latencies)}')
+        lines.append(f"{prefix}_download_seconds_sum {sum(latencies)}")
+        lines.append(f"{prefix}_download_seconds_count {len(latencies)}")
+        lines.append(f"# TYPE {prefix}_assets_total counter")
+        for status, count in sorted(summary["statuses"].items()):
+            lines.append(f'{prefix}_assets_total{{status="{status}"}} {count}')
+        for name, key, kind in (
+            ("bytes_total", "bytes", "counter"),
+            ("attempts_total", "attempts", "counter"),
+            ("redirects_total", "redirects", "counter"),
+            ("wall_seconds", "wall_seconds", "gauge"),
+            ("throughput_mb_per_second", "throughput_mb_s", "gauge"),
+            ("in_flight_average", "avg_in_flight", "gauge"),
+            ("in_flight_peak", "peak_in_flight", "gauge"),
+        ):
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.append(f"{prefix}_{name} {summary[key]}")
+        lines.append(f"# TYPE {prefix}_phase_seconds_total counter")
+        for phase in ("dns", "connect", "wait", "transfer"):
+            lines.append(f'{prefix}_phase_seconds_total{{phase="{phase}"}} {summary[f"{phase}_seconds"]}')
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def write(self, path):
+        # .prom files get the Prometheus format, anything else JSON lines
+        if str(path).endswith(".prom"):
+            self.write_prometheus(path)
+        else:
+            self.write_jsonl(path)
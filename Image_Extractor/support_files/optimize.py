@@ -0,0 +1,199 @@
+"""
+File: optimize.py
+
+Description:
+    Optional post-download optimisation of images for the Markdown Image Downloader.
+    Attachments are often 4K screenshots shown at <img width="46">. For each downloaded
+    image this stage writes a variant next to it that is:
+    - resized to the largest size any <img> tag declares for it (width / height attributes),
+      times `scale` for high-DPI screens; never enlarged, and not resized at all if any
+      reference to the image (a Markdown image, a bare link, ...) shows it at natural size
+    - recompressed in its own format ("keep") or converted to WebP ("webp")
+    and the Markdown is rewritten to the variant. The original download stays in place
+    (the manifest, cache and later runs still know it), and a variant that does not save
+    at least `min_saving` of the original is dropped. Images are encoded in a process pool;
+    animated images and formats Pillow cannot read are left alone.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - Pillow (only when this stage is used)
+    - concurrent.futures
+    - os
+    - time
+    - pathlib
+
+Usage:
+    sizes = display_sizes(refs)                              # {url: (width, height) or None}
+    settings = optimize_settings(fmt="webp", quality=85)
+    results = optimize_docs({md_path: {url: "Images/..."}}, sizes, settings, max_workers=4)
+    totals = optimize_totals(results)
+
+
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+OPTIMIZE_FORMATS = ("keep", "webp")
+
+#####################################
+def optimize_settings(fmt="webp", quality=85, lossless=False, scale=2, min_saving=0.1):
+    """
+    Bundle the optimisation options into a plain dict (it is sent to worker processes).
+    """
+    if fmt not in OPTIMIZE_FORMATS:
+        raise ValueError(f"Unknown optimise format {fmt!r}, expected one of {OPTIMIZE_FORMATS}")
+    return {"format": fmt, "quality": quality, "lossless": lossless, "scale": scale, "min_saving": min_saving}
+
+#####################################
+def _pixels(value):
+    # width="46" / width=46 / width="46px"; percentages and the like mean "unknown"
+    value = (value or "").strip().lower()
+    if value.endswith("px"):
+        value = value[:-2]
+    return int(value) if value.isdigit() and int(value) > 0 else None
+
+def declared_size(ref):
+    """
+    (width, height) declared on an <img> tag, either possibly None; None if neither is set.
+    """
+    if ref.kind != "html" or not ref.attrs:
+        return None
+    width, height = _pixels(ref.attrs.get("width")), _pixels(ref.attrs.get("height"))
+    return (width, height) if width or height else None
+
+def _larger(a, b):
+    # Combine two display sizes: the largest of each side; None (natural size) wins
+    if a is None or b is None:
+        return None
+    return tuple(None if x is None or y is None else max(x, y) for x, y in zip(a, b))
+
+def display_sizes(refs, sizes=None):
+    """
+    Largest size each URL is shown at, as {url: (width, height)}; None when at least one
+    reference shows it at its natural size. Pass sizes to accumulate over several documents.
+    """
+    sizes = {} if sizes is None else sizes
+    for ref in refs:
+        size = declared_size(ref)
+        sizes[ref.url] = _larger(sizes[ref.url], size) if ref.url in sizes else size
+    return sizes
+
+#####################################
+def variant_name(path, size, settings):
+    # <stem>_<width>.<ext> for a resized variant (like slide thumbnails), <stem>_opt.<ext> otherwise
+    path = Path(path)
+    ext = ".webp" if settings["format"] == "webp" else path.suffix
+    return f"{path.stem}_{size[0]}{ext}" if size else f"{path.stem}_opt{ext}"
+
+def _target_box(image_size, declared, scale):
+    # Box to shrink into, or None when the image is already small enough
+    if not declared:
+        return None
+    width, height = declared
+    box = (
+        width * scale if width else image_size[0],
+        height * scale if height else image_size[1],
+    )
+    if box[0] >= image_size[0] and box[1] >= image_size[1]:
+        return None
+    return box
+
+def optimize_image(path, declared, settings):
+    """
+    Write the optimised variant of one image. Runs in a worker process.
+    Returns {"source", "variant" (file name or None), "before", "after", "size", "seconds", "error"}.
+    """
+    from PIL import Image
+
+    path = Path(path)
+    start = time.perf_counter()
+    before = path.stat().st_size
+    result = {"source": str(path), "variant": None, "before": before, "after": before, "size": None, "error": None}
+    try:
+        with Image.open(path) as img:
+            if getattr(img, "n_frames", 1) > 1:
+                result["error"] = "animated"
+                return result
+            box = _target_box(img.size, declared, settings["scale"])
+            img.load()
+            if box:
+                img.thumbnail(box, Image.LANCZOS)
+            size = img.size if box else None
+            target = path.with_name(variant_name(path, size, settings))
+            if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                # Made by an earlier run from the same download
+                after = target.stat().st_size
+            else:
+                tmp = target.with_name(f".{target.name}.tmp")
+                if settings["format"] == "webp":
+                    img.save(tmp, "WEBP", quality=settings["quality"], lossless=settings["lossless"], method=6)
+                elif img.format == "JPEG" or path.suffix.lower() in (".jpg", ".jpeg"):
+                    img.save(tmp, "JPEG", quality=settings["quality"], optimize=True, progressive=True)
+                else:
+                    img.save(tmp, img.format or path.suffix.lstrip(".").upper(), optimize=True)
+                after = tmp.stat().st_size
+                if after > before * (1 - settings["min_saving"]):
+                    os.remove(tmp)
+                    result["error"] = "no saving"
+                    return result
+                os.replace(tmp, target)
+    except (OSError, ValueError) as e:
+        # Not an image Pillow can read (SVG, ...) or a failed encode: keep the original
+        result["error"] = str(e)
+        return result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+    result.update(variant=target.name, after=after, size=list(size) if size else None)
+    return result
+
+#####################################
+def optimize_images(files, settings, max_workers=None):
+    """
+    Optimise every image in files ({path: declared (width, height) or None}) in a process pool.
+    Returns the list of optimize_image results in the same order.
+    """
+    if not files:
+        return []
+    paths = list(files)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            optimize_image, paths, [files[p] for p in paths], [settings] * len(paths)
+        ))
+
+def optimize_docs(doc_paths, sizes, settings, max_workers=None):
+    """
+    Optimise every image the rewrite is about to link to, once per file, and point the
+    links at the variants. doc_paths is {md_path: {url: "Images/<file>"}} and is updated
+    in place; sizes is from display_sizes. Returns the optimize_image results.
+    """
+    files = {}
+    for md_path, mapping in doc_paths.items():
+        for url, image_rel_path in mapping.items():
+            path = Path(md_path).parent / image_rel_path
+            size = sizes.get(url)
+            files[path] = _larger(files[path], size) if path in files else size
+    results = optimize_images(files, settings, max_workers)
+    variants = {Path(r["source"]): r["variant"] for r in results if r["variant"]}
+    for md_path, mapping in doc_paths.items():
+        for url, image_rel_path in mapping.items():
+            variant = variants.get(Path(md_path).parent / image_rel_path)
+            if variant:
+                mapping[url] = f"Images/{variant}"
+    return results
+
+def optimize_totals(results):
+    optimized = [r for r in results if r["variant"]]
+    before = sum(r["before"] for r in optimized)
+    after = sum(r["after"] for r in optimized)
+    return {
+        "images": len(results),
+        "optimized": len(optimized),
+        "resized": sum(1 for r in optimized if r["size"]),
+        "bytes_before": before,
+        "bytes_after": after,
+        "bytes_saved": before - after,
+    }
@@ -0,0 +1,281 @@
+"""
+File: parser.py
+
+Description:
+    Markdown / HTML aware image reference tokenizer for the Markdown Image Downloader.
+    Walks a document once and yields an ImageRef(url, start, end, kind, attrs) for:
+    - "image":     Markdown images       ![alt](url "title") / ![alt](<url>)
+    - "reference": reference definitions [id]: url "title"
+    - "html":      <img> tags            src="url" / src='url' / src=url (attrs holds every attribute)
+    - "autolink":  <https://...>
+    - "bare":      any other bare http(s) URL in the text
+    Fenced code blocks (``` / ~~~) and inline code spans are skipped.
+    start/end is the span of the URL itself, so a rewrite can splice new paths in by
+    offset (see rewrite.splice_refs) without searching the text again.
+    Works on str or on bytes-like buffers (bytes, mmap); for bytes the spans are byte
+    offsets and urls are decoded as UTF-8.
+    extract_image_refs only tokenizes around the assets: it searches for the assets
+    endpoint (a plain substring search, hundreds of MB/s) and runs the tokenizer on the
+    paragraph around each hit, skipping fenced code blocks found on the way. Tokens are
+    then not followed across a blank line (an unclosed ` run no longer hides the rest
+    of the document, as CommonMark intends); otherwise the refs are the same.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - re
+    - collections
+    - urllib.parse
+
+Usage:
+    for ref in iter_image_refs(content):
+        print(ref.url, ref.start, ref.end, ref.kind)
+    refs = extract_image_refs(content, BASE_URL, ASSETS_ENDPOINT)   # asset refs only, windowed
+
+
+"""
+import re
+from collections import namedtuple
+from urllib.parse import urlparse
+
+ImageRef = namedtuple("ImageRef", "url start end kind attrs")
+
+# The lookahead lists every token's first character, so the regex engine can skip the
+# plain prose between tokens without trying each alternative at every position
+TOKEN_PATTERN = r"""(?=[`~!\[<h]|^[ ])(?:
+  (?P<fence>^[ ]{0,3}(?P<fence_mark>`{3,}|~{3,})[^\n]*$)
+| (?P<code>`+)
+| (?P<image>!\[(?:[^\]\\\n]|\\.)*\]\(\s*(?:<(?P<image_angle>[^>\n]*)>|(?P<image_url>[^\s)]+))
+      (?:\s+(?:"[^"\n]*"|'[^'\n]*'|\([^)\n]*\)))?\s*\))
+| (?P<reference>^[ ]{0,3}\[[^\]\n]+\]:[ \t]*(?:<(?P<reference_angle>[^>\n]*)>|(?P<reference_url>\S+)))
+| (?P<html><[iI][mM][gG]\b[^>]*>)
+| (?P<autolink><(?P<autolink_url>https?://[^>\s]+)>)
+| (?P<bare>https?://[^\s<>"'()\[\]`]+)
+)"""
+
+FENCE_PATTERN = r"^[ ]{0,3}(?P<fence_mark>`{3,}|~{3,})[^\n]*$"
+
+BLANK_LINE_PATTERN = r"\n[ \t\r]*\n"
+
+# Asset paragraphs closer than this are tokenized as one window: cheaper than starting another
+WINDOW_GAP = 1024
+
+ATTR_PATTERN = r"""([^\s"'=<>/]+)(?:\s*=\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<uq>[^\s"'=<>`]+)))?"""
+
+_compiled = {}
+
+#####################################
+def _patterns(is_bytes):
+    # One compiled (token, attribute, fence, blank line) set per text type, built on first use
+    if is_bytes not in _compiled:
+        token, attr, fence, blank = TOKEN_PATTERN, ATTR_PATTERN, FENCE_PATTERN, BLANK_LINE_PATTERN
+        if is_bytes:
+            token, attr, fence, blank = token.encode(), attr.encode(), fence.encode(), blank.encode()
+        _compiled[is_bytes] = (
+            # No IGNORECASE: it slows the whole scan; the <img tag spells out its cases
+            re.compile(token, re.MULTILINE | re.VERBOSE),
+            re.compile(attr),
+            re.compile(fence, re.MULTILINE),
+            re.compile(blank),
+        )
+    return _compiled[is_bytes]
+
+def _text(value, is_bytes):
+    return value.decode("utf-8", "replace") if is_bytes else value
+
+#####################################
+def _fence_closer(mark, is_bytes):
+    closer = r"^[ ]{0,3}%s{%d,}[ \t]*$" % (re.escape(mark[0]), len(mark))
+    return re.compile(closer.encode() if is_bytes else closer, re.MULTILINE)
+
+def _skip_fence(content, match, is_bytes):
+    """
+    Return (position just after the closing fence, None), or (len(content), mark)
+    when the block is still open at the end of the text.
+    """
+    mark = _text(match.group("fence_mark"), is_bytes)
+    nl = b"\n" if is_bytes else "\n"
+    line_end = content.find(nl, match.end())
+    closing = _fence_closer(mark, is_bytes).search(content, line_end + 1) if line_end >= 0 else None
+    if not closing:
+        return len(content), mark
+    return closing.end(), None
+
+def _skip_code_span(content, match, endpos):
+    # Inline code runs to the next backtick run of the same length
+    ticks = match.group("code")
+    closing = content.find(ticks, match.end(), endpos)
+    return match.end() if closing < 0 else closing + len(ticks)
+
+def _resume(content, state, is_bytes):
+    # Where tokenizing may start: after a code block still open from an earlier segment (None = never)
+    if not (state and state.get("fence")):
+        return 0
+    closing = _fence_closer(state["fence"], is_bytes).search(content)
+    if not closing:
+        return None
+    state["fence"] = None
+    return closing.end()
+
+#####################################
+def iter_image_refs(content, state=None):
+    """
+    Yield an ImageRef for every image-like URL reference in content, in document order.
+    state is an optional dict carried between consecutive segments of one document
+    (see streaming.py) so a fenced code block may span segments.
+    """
+    is_bytes = not isinstance(content, str)
+    position = _resume(content, state, is_bytes)
+    if position is not None:
+        yield from _tokens(content, position, len(content), state, is_bytes)
+
+def _tokens(content, position, endpos, state, is_bytes):
+    """
+    Yield the ImageRefs of tokens starting in content[position:endpos]. Returns where the
+    caller may go on: endpos, or past it when a code block opened in range ran further.
+    """
+    token_re, attr_re = _patterns(is_bytes)[:2]
+    while True:
+        match = token_re.search(content, position, endpos)
+        if not match:
+            return max(position, endpos)
+        # Every token group encloses its sub-groups, so the last group closed is the token
+        kind = match.lastgroup
+        position = match.end()
+
+        if kind == "fence":
+            position, open_fence = _skip_fence(content, match, is_bytes)
+            if state is not None:
+                state["fence"] = open_fence
+        elif kind == "code":
+            position = _skip_code_span(content, match, endpos)
+        elif kind in ("image", "reference"):
+            group = f"{kind}_angle" if match.group(f"{kind}_angle") is not None else f"{kind}_url"
+            start, end = match.span(group)
+            yield ImageRef(_text(match.group(group), is_bytes), start, end, kind, None)
+        elif kind == "html":
+            attrs = {}
+            src_span = None
+            # Attributes are matched in place (after "<img") so their spans are absolute
+            for attr in attr_re.finditer(content, match.start() + 4, match.end()):
+                name = _text(attr.group(1), is_bytes).lower()
+                value_group = "dq" if attr.group("dq") is not None else "sq" if attr.group("sq") is not None else "uq"
+                value = attr.group(value_group)
+                attrs[name] = "" if value is None else _text(value, is_bytes)
+                if name == "src" and value is not None:
+                    src_span = attr.span(value_group)
+            if src_span:
+                yield ImageRef(attrs["src"], src_span[0], src_span[1], kind, attrs)
+        elif kind == "autolink":
+            start, end = match.span("autolink_url")
+            yield ImageRef(_text(match.group("autolink_url"), is_bytes), start, end, kind, None)
+        else:
+            yield ImageRef(_text(match.group("bare"), is_bytes), match.start(), match.end(), kind, None)
+
+#####################################
+def is_asset_url(url, base_url, assets_endpoint):
+    return base_url in url and assets_endpoint in url
+
+def asset_filename(url):
+    # Last segment of the URL path (the asset UUID)
+    return urlparse(url).path.rstrip('/').split('/')[-1]
+
+#####################################
+def _next_fence(content, position, endpos, is_bytes):
+    # First fence line starting in content[position:endpos], found with plain substring searches
+    fence_re = _patterns(is_bytes)[2]
+    nl = b"\n" if is_bytes else "\n"
+    marks = (b"```", b"~~~") if is_bytes else ("```", "~~~")
+    while position < endpos:
+        hits = [i for i in (content.find(mark, position, endpos) for mark in marks) if i >= 0]
+        if not hits:
+            return None
+        hit = min(hits)
+        line_start = content.rfind(nl, 0, hit) + 1
+        fence = fence_re.match(content, line_start) if hit - line_start <= 3 else None
+        if fence:
+            return fence
+        position = hit + 3
+    return None
+
+def _window(content, position, hit, needle, is_bytes):
+    """
+    (start, end) of the paragraph around hit, not starting before position, extended over
+    the paragraphs of any further hits less than WINDOW_GAP after it (dense documents).
+    """
+    blank_re = _patterns(is_bytes)[3]
+    start = _paragraph_start(content, position, hit, is_bytes)
+    while True:
+        blank = blank_re.search(content, hit)
+        if not blank:
+            return start, len(content)
+        end = blank.start() + 1
+        hit = content.find(needle, end, end + WINDOW_GAP)
+        if hit < 0:
+            return start, end
+
+def _paragraph_start(content, position, hit, is_bytes):
+    # Start of the paragraph around hit, not before position
+    nl = b"\n" if is_bytes else "\n"
+    line_end = content.rfind(nl, position, hit)
+    while line_end >= position:
+        previous = content.rfind(nl, position, line_end)
+        if not content[max(previous + 1, position):line_end].strip():
+            break
+        line_end = previous
+    return max(line_end + 1, position)
+
+def _assets(tokens, base_url, assets_endpoint):
+    # Pass on the asset refs of a _tokens generator, and its return value
+    while True:
+        try:
+            ref = next(tokens)
+        except StopIteration as stop:
+            return stop.value
+        if is_asset_url(ref.url, base_url, assets_endpoint):
+            yield ref
+
+def iter_asset_refs(content, base_url, assets_endpoint, state=None):
+    """
+    Yield the ImageRefs that point at a GitHub asset, in document order, tokenizing only
+    the paragraphs that contain the assets endpoint. Code blocks between them are found
+    by their fence lines and skipped. state works as for iter_image_refs.
+    """
+    is_bytes = not isinstance(content, str)
+    needle = assets_endpoint.encode() if is_bytes else assets_endpoint
+    position = _resume(content, state, is_bytes)
+    if position is None:
+        return
+    while True:
+        hit = content.find(needle, position)
+        # Fences before the next asset are skipped; after the last one they only matter to the
+        # next segment (state), which needs to know about a code block left open
+        until = hit if hit >= 0 else len(content) if state is not None else position
+        fence = _next_fence(content, position, until, is_bytes)
+        if fence:
+            position, open_fence = _skip_fence(content, fence, is_bytes)
+            if state is not None:
+                state["fence"] = open_fence
+            continue
+        if hit < 0:
+            return
+        start, end = _window(content, position, hit, needle, is_bytes)
+        position = yield from _assets(_tokens(content, start, end, state, is_bytes), base_url, assets_endpoint)
+
+def extract_image_refs(content, base_url, assets_endpoint):
+    """
+    Return every ImageRef in content that points at a GitHub asset, in document order.
+    """
+    return list(iter_asset_refs(content, base_url, assets_endpoint))
+
+def unique_assets(refs):
+    """
+    Collapse refs to [(url, filename), ...] with each URL once, in first-seen order
+    (the same shape extract_filtered_urls returns).
+    """
+    seen = {}
+    for ref in refs:
+        if ref.url not in seen:
+            seen[ref.url] = asset_filename(ref.url)
+    return list(seen.items())
@@ -0,0 +1,159 @@
+"""
+File: plan.py
+
+Description:
+    Dry-run planning for the Markdown Image Downloader.
+    Resolving an asset normally costs a full streamed GET (get_final_url_and_filename).
+    Here each asset is resolved with a HEAD or a one-byte "Range: bytes=0-0" GET instead,
+    concurrently over one pooled session, which is enough to learn:
+    - the final (S3) URL after GitHub's redirect, and so the file extension
+    - the size of the body, from Content-Range or Content-Length
+    Assets already in their Images folder or in the asset cache are not requested at all.
+    A plan is a JSON file: the Markdown files, one entry per asset (state, final URL,
+    extension, size) and totals. run_batch(plan=...) downloads straight from the
+    resolved URLs, falling back to the GitHub URL if a signed S3 URL has expired.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - json
+    - time
+    - concurrent.futures
+    - pathlib
+    - urllib.parse
+    - requests
+    - downloader.py
+    - resume.py
+    - retry.py
+    - utils.py
+
+Usage:
+    from support_files.batch import plan_batch
+    plan = plan_batch(["docs/"], USER_SESSION, BASE_URL, ASSETS_ENDPOINT)
+    write_plan(plan, "plan.json")
+    run_batch(plan["markdown_files"], ..., plan=load_plan("plan.json"))
+
+
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+from support_files.downloader import make_http_session
+from support_files.resume import expected_size
+from support_files.retry import RetryScheduler
+from support_files.utils import build_headers
+
+PLAN_VERSION = 1
+PLAN_METHODS = ("range", "head")
+
+#####################################
+def resolve_asset(url, user_session, http_session, method="range"):
+    """
+    Follow url's redirects without downloading the body.
+    "head" sends HEAD requests; "range" sends a GET for the first byte only, which also
+    works where a signed URL is only valid for GET (S3 pre-signed URLs are).
+    Returns (status, headers, {"final_url", "ext", "size", "redirects"}), status None
+    when the connection failed.
+    """
+    headers = build_headers(user_session)
+    try:
+        if method == "head":
+            response = http_session.head(url, allow_redirects=True, headers=headers)
+        else:
+            headers["Range"] = "bytes=0-0"
+            response = http_session.get(url, allow_redirects=True, stream=True, headers=headers)
+    except requests.RequestException:
+        return None, None, None
+    # Never read the body: a server that ignores Range would send all of it
+    response.close()
+    if response.status_code not in (200, 206):
+        return response.status_code, response.headers, None
+    final_url = response.url
+    return response.status_code, response.headers, {
+        "final_url": final_url,
+        "ext": Path(urlparse(final_url).path).suffix,
+        "size": expected_size(response.status_code, response.headers),
+        "redirects": len(response.history),
+    }
+
+def _resolve_with_retries(url, user_session, http_session, method, scheduler):
+    status = None
+    for attempt in range(scheduler.attempts):
+        wait = scheduler.reserve(url)
+        if wait is None:
+            break
+        if wait > 0:
+            time.sleep(wait)
+        status, headers, resolved = resolve_asset(url, user_session, http_session, method)
+        if resolved is not None:
+            scheduler.retry_delay(url, attempt, status, headers)
+            return status, resolved
+        delay = scheduler.retry_delay(url, attempt, status, headers)
+        if delay is None:
+            break
+        time.sleep(delay)
+    return status, None
+
+#####################################
+def resolve_assets(entries, user_session, max_workers=16, method="range", scheduler=None):
+    """
+    Resolve every plan entry whose state is "download", in place and concurrently.
+    Entries that cannot be resolved get state "unresolved" and their last HTTP status.
+    """
+    if method not in PLAN_METHODS:
+        raise ValueError(f"Unknown plan method {method!r}, expected one of {PLAN_METHODS}")
+    if scheduler is None:
+        scheduler = RetryScheduler()
+    pending = [entry for entry in entries if entry["state"] == "download"]
+    with make_http_session(max_workers) as http_session:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_resolve_with_retries, entry["url"], user_session, http_session, method, scheduler): entry
+                for entry in pending
+            }
+            for future in as_completed(futures):
+                entry = futures[future]
+                status, resolved = future.result()
+                entry["http_status"] = status
+                if resolved is None:
+                    entry["state"] = "unresolved"
+                else:
+                    entry.update(resolved)
+    return entries
+
+#####################################
+def plan_totals(entries):
+    totals = {"assets": len(entries), "exists": 0, "cached": 0, "download": 0, "unresolved": 0}
+    for entry in entries:
+        totals[entry["state"]] += 1
+    sized = [e["size"] for e in entries if e["state"] == "download" and e.get("size") is not None]
+    totals["download_bytes"] = sum(sized)
+    totals["unknown_size"] = totals["download"] - len(sized)
+    totals["cached_bytes"] = sum(e.get("size") or 0 for e in entries if e["state"] == "cached")
+    return totals
+
+#####################################
+def write_plan(plan, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+
+def load_plan(path):
+    with open(path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"{path} is not a version {PLAN_VERSION} download plan")
+    return plan
+
+def resolved_urls(plan):
+    # {GitHub URL: final URL} for run_batch / download_assets
+    return {
+        entry["url"]: entry["final_url"]
+        for entry in plan["assets"]
+        if entry["state"] == "download" and entry.get("final_url")
+    }
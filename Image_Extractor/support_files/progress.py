@@ -0,0 +1,233 @@
+"""
+File: progress.py
+
+Description:
+    Aggregated progress reporting for the Markdown Image Downloader that stays cheap with
+    thousands of concurrent downloads.
+    AggregateProgress has the same add_task / update calls the download code already makes
+    on a rich Progress, but an update only touches that task's own counters (no lock, no
+    redraw). A single reporter thread samples the counters every `interval` seconds and draws:
+    - "rich":  one overall bar (assets and bytes) plus a table of the `top_n` longest-running
+               active downloads, through rich.live (rich is imported only in this mode)
+    - "plain": one log line every `log_interval` seconds, for CI logs and other non-TTY output
+    make_progress picks the mode ("auto" = rich on a terminal, plain otherwise) or returns
+    the original per-asset rich Progress ("bars").
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - sys
+    - threading
+    - time
+    - rich (only for the "rich" and "bars" modes)
+
+Usage:
+    with make_progress("auto", top_n=8) as progress:
+        extract_images(md_path, ..., progress=progress)   # or run_batch(..., progress=progress)
+
+
+"""
+import sys
+import threading
+import time
+
+PROGRESS_MODES = ("auto", "rich", "plain", "bars", "none")
+
+#####################################
+def _format_bytes(size):
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1000 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+
+#####################################
+class AggregateProgress:
+    """
+    Drop-in for the parts of rich.progress.Progress used by the download engines.
+    Each task is a small list [description, completed, total, started_at]; only the worker
+    downloading that asset writes it, so updates need no lock.
+    """
+
+    def __init__(self, mode="rich", top_n=8, interval=0.25, log_interval=5.0, console=None, stream=None):
+        if mode not in ("rich", "plain"):
+            raise ValueError(f"Unknown aggregate progress mode {mode!r}, expected 'rich' or 'plain'")
+        self.mode = mode
+        self.top_n = top_n
+        self.interval = interval
+        self.log_interval = log_interval
+        self.console = console
+        self.stream = stream or sys.stdout
+        self.tasks = []
+        self.active = set()
+        self.lock = threading.Lock()
+        self.finished = 0
+        self.failed = 0
+        self.done_bytes = 0
+        self.updates = 0
+        self.renders = 0
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._live = None
+
+    #####################################
+    def add_task(self, description, total=None, **kwargs):
+        with self.lock:
+            self.tasks.append([description, 0, total, None])
+            return len(self.tasks) - 1
+
+    def update(self, task_id, total=None, completed=None, advance=None, **kwargs):
+        task = self.tasks[task_id]
+        if task[3] is None:
+            task[3] = time.perf_counter()
+            self.active.add(task_id)
+        if total is not None:
+            task[2] = total
+        if completed is not None:
+            task[1] = completed
+        if advance is not None:
+            task[1] += advance
+        self.updates += 1  # approximate under threads; only reported as a statistic
+
+    def finish(self, task_id, status=None):
+        """
+        Mark a task as done (called once per asset from the on_done callback).
+        """
+        task = self.tasks[task_id]
+        with self.lock:
+            self.active.discard(task_id)
+            self.finished += 1
+            if status == 'failed':
+                self.failed += 1
+            else:
+                self.done_bytes += task[1] if task[2] and task[2] > 1 else 0
+
+    #####################################
+    def snapshot(self):
+        """
+        (finished, total, bytes so far, [(description, completed, total, seconds), ...] for the
+        top_n longest-running active tasks).
+        """
+        now = time.perf_counter()
+        with self.lock:
+            active = list(self.active)
+            finished = self.finished
+            done_bytes = self.done_bytes
+        running = []
+        active_bytes = 0
+        for task_id in active:
+            description, completed, total, started = self.tasks[task_id]
+            if total and total > 1:
+                active_bytes += completed
+            running.append((description, completed, total, now - (started or now)))
+        running.sort(key=lambda item: -item[3])
+        return finished, len(self.tasks), done_bytes + active_bytes, running[:self.top_n], len(running)
+
+    def _plain_line(self):
+        finished, total, size, _, active = self.snapshot()
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"[{elapsed:7.1f}s] {finished}/{total} assets, {_format_bytes(size)}, "
+            f"{active} active, {self.failed} failed"
+        )
+
+    def _rich_renderable(self):
+        from rich.console import Group
+        from rich.progress_bar import ProgressBar
+        from rich.table import Table
+
+        finished, total, size, running, active = self.snapshot()
+        elapsed = time.perf_counter() - self.started
+        header = Table.grid(padding=(0, 1))
+        header.add_row(
+            "Downloading assets",
+            ProgressBar(total=max(total, 1), completed=finished, width=40),
+            f"{finished}/{total}",
+            _format_bytes(size),
+            f"{size / 1e6 / elapsed:.1f} MB/s" if elapsed else "",
+            f"{active} active, {self.failed} failed",
+        )
+        table = Table(show_header=bool(running), box=None, padding=(0, 1))
+        table.add_column("Longest running", overflow="ellipsis", no_wrap=True, max_width=60)
+        table.add_column("Received", justify="right")
+        table.add_column("Time", justify="right")
+        for description, completed, task_total, seconds in running:
+            received = _format_bytes(completed) if task_total and task_total > 1 else "-"
+            if task_total and task_total > 1:
+                received += f" / {_format_bytes(task_total)}"
+            table.add_row(description, received, f"{seconds:.1f}s")
+        return Group(header, table)
+
+    #####################################
+    def _run(self):
+        last_log = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            if self.mode == "rich":
+                self._live.update(self._rich_renderable(), refresh=True)
+                self.renders += 1
+            elif time.perf_counter() - last_log >= self.log_interval:
+                print(self._plain_line(), file=self.stream, flush=True)
+                last_log = time.perf_counter()
+                self.renders += 1
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if self.mode == "rich":
+            from rich.live import Live
+
+            self._live = Live(self._rich_renderable(), console=self.console, auto_refresh=False, transient=False)
+            self._live.__enter__()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        if self.mode == "rich":
+            self._live.update(self._rich_renderable(), refresh=True)
+            self._live.__exit__(*exc_info)
+        else:
+            print(self._plain_line(), file=self.stream, flush=True)
+        return False
+
+#####################################
+class _NullProgress:
+    # "none" mode: the download code still gets something to call
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+def make_progress(mode="auto", top_n=8, interval=0.25, log_interval=5.0, console=None):
+    """
+    Context manager yielding the progress object to pass to extract_images / run_batch:
+    - "auto":  "rich" on a terminal, "plain" otherwise
+    - "rich" / "plain": AggregateProgress
+    - "bars":  the original rich Progress with one bar per asset
+    - "none":  None (no progress output)
+    """
+    if mode not in PROGRESS_MODES:
+        raise ValueError(f"Unknown progress mode {mode!r}, expected one of {PROGRESS_MODES}")
+    if mode == "auto":
+        is_tty = console.is_terminal if console is not None else sys.stdout.isatty()
+        mode = "rich" if is_tty else "plain"
+    if mode == "none":
+        return _NullProgress()
+    if mode == "bars":
+        from rich.progress import (
+            Progress, BarColumn, TextColumn, TimeElapsedColumn, DownloadColumn, TaskProgressColumn,
+        )
+
+        return Progress(
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TaskProgressColumn(),
+            DownloadColumn(),
+            TimeElapsedColumn(),  # Only elapsed time
+            console=console,
+            transient=False,
+        )
+    return AggregateProgress(mode, top_n=top_n, interval=interval, log_interval=log_interval, console=console)
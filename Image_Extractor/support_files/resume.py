@@ -0,0 +1,210 @@
+"""
+File: resume.py
+
+Description:
+    Partial-file handling for resumable downloads in the Markdown Image Downloader.
+    Every download is written to Images/<uuid>.part, never to the final file name,
+    and renamed into place only once its size matches what the server announced.
+    Next to it, <uuid>.part.json remembers the final URL, ETag / Last-Modified and
+    total size, so an interrupted download can be resumed with a Range request
+    (guarded by If-Range, so a changed asset is fetched again from the start).
+    Servers that ignore Range simply answer 200 and the part file is restarted.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - hashlib
+    - json
+    - os
+    - re
+    - pathlib
+
+Usage:
+    partial = PartialDownload(images_dir, filename)
+    headers = partial.range_headers()          # {} when there is nothing to resume
+    offset = partial.begin(status, response_headers, final_url)
+    with partial.open(offset) as f: ... partial.update(chunk) ...
+    image_path = partial.finish(ext)           # None if the body was short
+
+
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+PART_SUFFIX = ".part"
+
+CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+#####################################
+def is_partial_file(name):
+    # Part files and their metadata are never treated as downloaded images
+    return PART_SUFFIX in Path(name).suffixes
+
+def _header(headers, name):
+    # requests and aiohttp both use case-insensitive header mappings
+    return headers.get(name) if headers is not None else None
+
+#####################################
+def expected_size(status, headers):
+    """
+    Full size of the asset announced by a 200 or 206 response, or None if unknown.
+    Content-Length is not trusted when the body is content-encoded (it is decoded on the fly).
+    """
+    if status == 206:
+        match = CONTENT_RANGE.match(_header(headers, "Content-Range") or "")
+        if match and match.group(3) != "*":
+            return int(match.group(3))
+        return None
+    if (_header(headers, "Content-Encoding") or "identity") != "identity":
+        return None
+    length = _header(headers, "Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+def _range_start(headers):
+    match = CONTENT_RANGE.match(_header(headers, "Content-Range") or "")
+    return int(match.group(1)) if match else None
+
+#####################################
+class PartialDownload:
+    """
+    One asset's .part file and its resume metadata.
+    """
+
+    def __init__(self, images_dir, filename):
+        self.images_dir = Path(images_dir)
+        self.part = self.images_dir / f"{filename}{PART_SUFFIX}"
+        self.meta_path = self.images_dir / f"{filename}{PART_SUFFIX}.json"
+        self.filename = filename
+        self.meta = self._load_meta()
+        self.digest = None
+        self.size = 0
+        self.total = None
+        self.final_url = None
+        self.etag = None
+        self.last_modified = None
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if self.part.exists():
+                return meta
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def resumable_from(self):
+        """
+        Bytes already on disk that a Range request may continue from (0 = start over).
+        A validator is required so If-Range can detect an asset that changed meanwhile.
+        """
+        if not self.meta or not (self.meta.get("etag") or self.meta.get("last_modified")):
+            return 0
+        try:
+            size = self.part.stat().st_size
+        except OSError:
+            return 0
+        total = self.meta.get("total")
+        return size if total is None or size < total else 0
+
+    def range_headers(self):
+        offset = self.resumable_from()
+        if not offset:
+            return {}
+        etag = self.meta.get("etag")
+        # If-Range needs a strong validator; fall back to the date for weak ETags
+        validator = etag if etag and not etag.startswith("W/") else self.meta.get("last_modified")
+        if not validator:
+            return {}
+        return {"Range": f"bytes={offset}-", "If-Range": validator}
+
+    def accepts(self, status, headers):
+        """
+        False for a 206 whose body does not start where the part file ends (nor at 0):
+        writing it anywhere would corrupt the file, so the caller starts over with a plain GET.
+        """
+        return status != 206 or _range_start(headers) in (0, self.resumable_from())
+
+    #####################################
+    def begin(self, status, headers, final_url):
+        """
+        Inspect the response to a (possibly ranged) GET that accepts() and return the offset
+        the body starts at: the current part size for a matching 206, else 0 (start over).
+        Records the validators so a later run can resume this download.
+        """
+        offset = 0
+        resumable = self.resumable_from()
+        if status == 206 and resumable and _range_start(headers) == resumable:
+            offset = resumable
+        self.total = expected_size(status, headers)
+        self.final_url = final_url
+        self.etag = _header(headers, "ETag")
+        self.last_modified = _header(headers, "Last-Modified")
+        self.digest = hashlib.sha256()
+        self.size = 0
+        if offset:
+            # The hash covers the whole file, so feed it what is already on disk
+            with open(self.part, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    self.digest.update(chunk)
+                    self.size += len(chunk)
+        self._save_meta()
+        return offset
+
+    def _save_meta(self):
+        # Kept in self.meta too, so a retry later in this run can resume with Range
+        self.meta = {
+            "final_url": self.final_url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "total": self.total,
+        }
+        self.images_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    def open(self, offset):
+        # Append to the part file when resuming, otherwise start it afresh
+        return open(self.part, "ab" if offset else "wb")
+
+    def update(self, chunk):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+
+    #####################################
+    def finish(self, ext):
+        """
+        Rename the part file to <filename><ext> if it is complete and return the new path.
+        A short body leaves the part file in place for the next attempt, an over-long
+        one is discarded; both return None.
+        """
+        if self.total is not None and self.size != self.total:
+            if self.size > self.total:
+                self.discard()
+            return None
+        image_path = self.images_dir / f"{self.filename}{ext}"
+        os.replace(self.part, image_path)
+        self._remove_meta()
+        return image_path
+
+    def discard(self):
+        self.meta = {}
+        for path in (self.part, self.meta_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_meta(self):
+        try:
+            os.remove(self.meta_path)
+        except OSError:
+            pass
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
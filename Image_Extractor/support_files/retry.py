@@ -0,0 +1,231 @@
+"""
+File: retry.py
+
+Description:
+    Retry scheduling for GitHub asset fetches in the Markdown Image Downloader.
+    One RetryScheduler is shared by every worker in a run and combines:
+    - a retry budget: each asset gets up to `attempts` tries, and the whole run at most
+      `budget` retries, so a dead host cannot make a run take forever
+    - jittered exponential backoff ("full jitter": a random delay up to base * 2^attempt)
+    - a token bucket per host (rate requests/second, burst), paused by Retry-After
+      and by X-RateLimit-Remaining: 0 / X-RateLimit-Reset
+    - a circuit breaker per host: after `breaker_threshold` consecutive failures the host
+      is skipped for `breaker_cooldown` seconds, then one probe request decides whether
+      it is healthy again
+    429, 500, 502, 503, 504 and dropped connections are retried; any other status is final.
+    The scheduler only computes delays, so the thread engine sleeps with time.sleep and
+    the async engine with asyncio.sleep.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - email.utils
+    - random
+    - threading
+    - time
+    - urllib.parse
+
+Usage:
+    scheduler = RetryScheduler(attempts=5, rate=10, burst=20)
+    for attempt in range(scheduler.attempts):
+        delay = scheduler.reserve(url)          # None: circuit open, give up
+        time.sleep(delay)
+        ... request ...
+        delay = scheduler.retry_delay(url, attempt, status, headers)
+        if delay is None: break                 # success, or not worth retrying
+        time.sleep(delay)
+
+
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SUCCESS_STATUSES = {200, 206, 304}
+
+#####################################
+def retry_after_seconds(headers, now=None):
+    """
+    Seconds the server asked us to wait (Retry-After, or a zero X-RateLimit-Remaining
+    with its X-RateLimit-Reset), or None.
+    """
+    if not headers:
+        return None
+    now = time.time() if now is None else now
+    value = headers.get("Retry-After")
+    if value:
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            pass
+    if headers.get("X-RateLimit-Remaining") == "0":
+        reset = headers.get("X-RateLimit-Reset")
+        if reset and reset.isdigit():
+            return max(0.0, int(reset) - now)
+    return None
+
+#####################################
+class TokenBucket:
+    """
+    rate tokens per second up to burst; reserve() takes one and says how long to wait for it.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now):
+        # Tokens may go negative: each caller waits for its own place in the queue
+        start = max(now, self.paused_until)
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + max(0.0, now - self.updated) * self.rate)
+            self.updated = max(now, self.updated)
+            self.tokens -= 1
+            if self.tokens < 0:
+                return start - now + (-self.tokens) / self.rate
+        return start - now
+
+    def pause(self, until):
+        # Retry-After: nobody gets a token before `until`, and the bucket refills from empty
+        if until > self.paused_until:
+            self.paused_until = until
+            self.tokens = min(self.tokens, 0.0)
+            self.updated = until
+
+#####################################
+class CircuitBreaker:
+    """
+    Closed: requests flow. Open: requests fail fast until the cooldown ends.
+    Half-open: one probe request is let through; its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self, now):
+        if self.opened_at is None:
+            return True
+        if now - self.opened_at < self.cooldown or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def record(self, success, now):
+        self.probing = False
+        if success:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.opened_at is not None or (self.threshold and self.failures >= self.threshold):
+            self.opened_at = now
+
+#####################################
+class RetryScheduler:
+    """
+    Shared retry / rate-limit / circuit-breaker state for one download run.
+    Thread-safe; the async engine uses it from a single event loop.
+    """
+
+    def __init__(
+        self,
+        attempts=5,
+        base_delay=0.5,
+        max_delay=60.0,
+        budget=200,
+        rate=0,
+        burst=20,
+        breaker_threshold=10,
+        breaker_cooldown=30.0,
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.rate = rate
+        self.burst = burst
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.breakers = {}
+        self.retries = 0
+        self.gave_up = 0
+
+    def _host_state(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return self.buckets[host], self.breakers[host]
+
+    def backoff(self, attempt):
+        # Full jitter: anywhere between 0 and the exponential ceiling
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    #####################################
+    def reserve(self, url):
+        """
+        Seconds to wait before sending a request to url's host, or None if its circuit is open.
+        """
+        now = time.monotonic()
+        with self.lock:
+            bucket, breaker = self._host_state(url)
+            if not breaker.allow(now):
+                return None
+            return bucket.reserve(now)
+
+    def retry_delay(self, url, attempt, status=None, headers=None):
+        """
+        Record the outcome of attempt number `attempt` (0-based) for url.
+        status None means the connection failed (reset, timeout, DNS).
+        Returns the seconds to wait before trying again, or None if the request
+        succeeded, failed for good, or the retry budget is spent.
+        """
+        now = time.monotonic()
+        wait = retry_after_seconds(headers)
+        with self.lock:
+            bucket, breaker = self._host_state(url)
+            if wait is not None:
+                # Rate limited: hold every request to this host, not just this one
+                bucket.pause(now + min(wait, self.max_delay))
+            if status in SUCCESS_STATUSES:
+                breaker.record(True, now)
+                return None
+            if status is not None and status not in RETRY_STATUSES:
+                # 404, 403, ...: the host is fine, the asset is not
+                breaker.record(True, now)
+                return None
+            breaker.record(False, now)
+            if attempt + 1 >= self.attempts or self.retries >= self.budget:
+                self.gave_up += 1
+                return None
+            self.retries += 1
+        delay = self.backoff(attempt)
+        if wait is not None:
+            delay = max(delay, min(wait, self.max_delay))
+        return delay
+
+    def stats(self):
+        with self.lock:
+            return {
+                "retries": self.retries,
+                "gave_up": self.gave_up,
+                "open_circuits": sorted(h for h, b in self.breakers.items() if b.opened_at is not None),
+            }
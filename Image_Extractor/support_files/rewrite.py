@@ -0,0 +1,46 @@
+"""
+File: rewrite.py
+
+Description:
+    Offset-based rewrite engine for the Markdown Image Downloader.
+    The tokenizer (parser.py) already knows where every URL starts and ends, so
+    splice_refs replaces the mapped ones by offset in one pass over the document,
+    instead of one full str.replace (and one full copy of the document) per URL,
+    and without searching the text again.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - parser.py (ImageRef spans)
+
+Usage:
+    content, replaced = splice_refs(content, refs, mapping)  # refs from parser.py
+
+
+"""
+
+#####################################
+def splice_refs(content, refs, mapping):
+    """
+    Replace URLs by offset using refs from parser.iter_image_refs (no search at all).
+    refs must come from this exact content, in document order. content may be str or
+    bytes (mapping values are encoded to UTF-8 for bytes).
+    Returns (new_content, replaced_refs).
+    """
+    is_bytes = not isinstance(content, str)
+    pieces = []
+    replaced = []
+    position = 0
+    for ref in refs:
+        image_rel_path = mapping.get(ref.url)
+        if image_rel_path is None:
+            continue
+        pieces.append(content[position:ref.start])
+        pieces.append(image_rel_path.encode("utf-8") if is_bytes else image_rel_path)
+        position = ref.end
+        replaced.append(ref)
+    if not replaced:
+        return content, replaced
+    pieces.append(content[position:])
+    return (b"" if is_bytes else "").join(pieces), replaced
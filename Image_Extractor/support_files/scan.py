@@ -0,0 +1,108 @@
+"""
+File: scan.py
+
+Description:
+    Zero-copy scanning of Markdown files for GitHub asset references.
+    Each file is memory-mapped and searched as bytes, never decoded as a whole:
+    - a plain substring search (mmap.find, a memchr-style scan in C) for the assets
+      endpoint and the base URL decides whether the file can contain an asset at all;
+      most files in a docs corpus do not, and they are skipped without being parsed
+    - otherwise the tokenizer (parser.py) runs its compiled bytes patterns directly on
+      the mapped buffer, only over the paragraphs around each assets endpoint hit, and
+      decodes only the matched URLs and <img> attributes
+    Offsets in the returned ImageRefs are byte offsets, so the rewrite splices the raw
+    bytes of the file (rewrite.splice_refs accepts bytes) and keeps everything else
+    byte-for-byte, line endings included.
+    scan_local_images does the same for references to local Images/ files (see upload.py).
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - mmap
+    - pathlib
+    - parser.py
+    - rewrite.py
+    - utils.py
+
+Usage:
+    refs = scan_file("docs/notes.md", BASE_URL, ASSETS_ENDPOINT)   # [] = nothing to do
+    replaced = rewrite_file("docs/notes.md", refs, {url: "Images/uuid.png"}, BASE_URL, ASSETS_ENDPOINT)
+
+
+"""
+import mmap
+from pathlib import Path
+from urllib.parse import unquote
+
+from support_files.parser import extract_image_refs, iter_image_refs
+from support_files.rewrite import splice_refs
+from support_files.utils import atomic_write
+
+#####################################
+def file_stamp(path):
+    # (size, mtime) to notice a file edited between scanning and rewriting
+    stat = Path(path).stat()
+    return stat.st_size, stat.st_mtime_ns
+
+#####################################
+def _scan(path, needles, select):
+    # select(buffer) on the mapped file if every needle occurs in it, else []
+    with open(path, "rb") as f:
+        if Path(path).stat().st_size == 0:
+            # An empty file cannot be mapped (and has nothing in it)
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if any(buffer.find(needle) < 0 for needle in needles):
+                return []
+            return select(buffer)
+
+def scan_file(path, base_url, assets_endpoint):
+    """
+    Return the asset ImageRefs of one file (byte offsets), or [] without tokenizing
+    when the file cannot contain an asset URL.
+    """
+    # Both parts must appear somewhere for parser.is_asset_url to accept any URL
+    return _scan(
+        path,
+        (assets_endpoint.encode(), base_url.encode()),
+        lambda buffer: extract_image_refs(buffer, base_url, assets_endpoint),
+    )
+
+def is_local_image(url, images_folder="Images"):
+    # Images/<file> or ./Images/<file>, as written by the downloader's rewrite,
+    # never a path that climbs out of the folder (Images/../../.ssh/id_rsa)
+    if "://" in url or not url.startswith((f"{images_folder}/", f"./{images_folder}/")):
+        return False
+    path = unquote(url.split("#", 1)[0].split("?", 1)[0]).replace("\\", "/")
+    return ".." not in path.split("/")
+
+def local_image_refs(content, images_folder="Images"):
+    return [ref for ref in iter_image_refs(content) if is_local_image(ref.url, images_folder)]
+
+def scan_local_images(path, images_folder="Images"):
+    """
+    Return the ImageRefs of one file that point into its local images folder (byte offsets).
+    """
+    return _scan(path, (f"{images_folder}/".encode(),), lambda buffer: local_image_refs(buffer, images_folder))
+
+#####################################
+def rewrite_file(path, refs, mapping, base_url, assets_endpoint, stamp=None, rescan=None):
+    """
+    Splice mapped URLs into a file by the byte offsets in refs, through a temporary file
+    and an atomic rename. If the file changed since stamp (see file_stamp) it is scanned
+    again first (with rescan(content) if given, else for asset URLs).
+    Files with nothing to replace are not written. Returns the references replaced.
+    """
+    if not mapping:
+        return 0
+    with open(path, "rb") as f:
+        content = f.read()
+    if stamp is not None and file_stamp(path) != stamp:
+        # Edited since it was scanned: the stored offsets are stale
+        refs = rescan(content) if rescan else extract_image_refs(content, base_url, assets_endpoint)
+    updated, replaced = splice_refs(content, refs, mapping)
+    if replaced:
+        with atomic_write(path, "wb") as f:
+            f.write(updated)
+    return len(replaced)
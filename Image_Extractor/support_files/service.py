@@ -0,0 +1,185 @@
+"""
+File: service.py
+
+Description:
+    Long-running worker service for the Markdown Image Downloader.
+    Instead of one process per run (interpreter start-up, a new connection pool and
+    thread pool each time), one process stays up and keeps warm:
+    - a DownloadPool (pooled keep-alive HTTP session + worker threads, see downloader.py)
+    - the RetryScheduler, AssetCache and optional DownloadMetrics
+    and processes Markdown files from a durable JobQueue (see jobqueue.py) as they arrive,
+    a batch at a time through run_batch (assets shared by the batch are downloaded once).
+    With watch targets, a ChangeWatcher polls the files' (size, mtime) stamps and enqueues
+    only the new or modified ones; the service's own rewrites are not reported as changes.
+    SIGINT / SIGTERM finish the current batch, then stop.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - signal
+    - threading
+    - time
+    - pathlib
+    - batch.py
+    - downloader.py (DownloadPool)
+    - jobqueue.py
+    - scan.py (file_stamp)
+
+Usage:
+    queue = JobQueue(QUEUE_PATH)
+    service = ExtractorService(queue, USER_SESSION, BASE_URL, ASSETS_ENDPOINT, max_workers=16)
+    service.serve(watch=ChangeWatcher(["docs/"]))     # until SIGINT / SIGTERM
+    service.serve(once=True)                          # drain the queue and return
+
+
+"""
+import signal
+import threading
+import time
+from pathlib import Path
+
+from support_files.batch import find_markdown_files, run_batch
+from support_files.downloader import DownloadPool
+from support_files.scan import file_stamp
+
+#####################################
+class ChangeWatcher:
+    """
+    Poll a set of directories / files / glob patterns for new or modified Markdown files.
+    The first poll reports every file (nothing is known yet) unless initial=False.
+    """
+    def __init__(self, targets, pattern="**/*.md", initial=True):
+        self.targets = targets
+        self.pattern = pattern
+        self.stamps = {}
+        if not initial:
+            self.poll()
+
+    def poll(self):
+        # Paths whose (size, mtime) differs from the last poll or mark()
+        changed = []
+        seen = set()
+        for path in find_markdown_files(self.targets, self.pattern):
+            seen.add(path)
+            try:
+                stamp = file_stamp(path)
+            except OSError:
+                continue
+            if self.stamps.get(path) != stamp:
+                self.stamps[path] = stamp
+                changed.append(path)
+        for path in set(self.stamps) - seen:
+            del self.stamps[path]
+        return changed
+
+    def mark(self, paths):
+        # Take the current stamps as seen, e.g. after the service rewrote the files itself
+        for path in paths:
+            try:
+                self.stamps[path] = file_stamp(path)
+            except OSError:
+                self.stamps.pop(path, None)
+
+#####################################
+class ExtractorService:
+    """
+    Process queued Markdown files with warm, reused download state.
+    Finished jobs older than keep_seconds are pruned from the queue at start-up.
+    on_batch(jobs, summary) is called after each batch (e.g. to log it).
+    Keyword arguments not listed here are passed to every run_batch call
+    (engine, per_host_limit, cache, refresh, scheduler, metrics, streaming_threshold, ...).
+    An AdaptiveConcurrency passed as concurrency keeps what it learnt from batch to batch; it is
+    capped at per_host_limit, which then also sizes the warm pool (every asset is on one host).
+    """
+    def __init__(
+        self, queue, user_session, base_url, assets_endpoint, max_workers=16, batch_size=100,
+        poll_interval=1.0, keep_seconds=None, on_batch=None, **batch_options
+    ):
+        self.queue = queue
+        self.user_session = user_session
+        self.base_url = base_url
+        self.assets_endpoint = assets_endpoint
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.keep_seconds = keep_seconds
+        self.on_batch = on_batch
+        self.batch_options = batch_options
+        self.stopping = threading.Event()
+        self.stats = {"batches": 0, "jobs": 0, "failed_jobs": 0, "downloaded": 0, "started": time.time()}
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    #####################################
+    def process(self, jobs, pool):
+        """
+        Run one claimed batch of jobs through run_batch and record each job's outcome.
+        A job fails if one of its document's assets could not be downloaded.
+        """
+        paths = sorted({job["path"] for job in jobs})
+        start = time.perf_counter()
+        try:
+            summary = run_batch(
+                paths, self.user_session, self.base_url, self.assets_endpoint,
+                max_workers=self.max_workers, pool=pool, **self.batch_options
+            )
+        except Exception as e:
+            for job in jobs:
+                self.queue.finish(job["id"], "failed", {"error": f"{type(e).__name__}: {e}"})
+            self.stats["failed_jobs"] += len(jobs)
+            return None
+        failed_docs = set(summary["failed_docs"])
+        rewritten = {str(path) for path in summary["rewritten"]}
+        for job in jobs:
+            failed = job["path"] in failed_docs
+            self.queue.finish(job["id"], "failed" if failed else "done", {
+                "rewritten": job["path"] in rewritten,
+                "batch_downloaded": summary["downloaded"],
+                "batch_failed": summary["failed"] if failed else [],
+            })
+            self.stats["failed_jobs"] += failed
+        self.stats["batches"] += 1
+        self.stats["jobs"] += len(jobs)
+        self.stats["downloaded"] += summary["downloaded"]
+        summary["seconds"] = time.perf_counter() - start
+        if self.on_batch:
+            self.on_batch(jobs, summary)
+        return summary
+
+    def serve(self, watch=None, once=False):
+        """
+        Claim and process batches until stop() (or SIGINT / SIGTERM in the main thread);
+        with once=True, return as soon as the queue has nothing pending.
+        watch is an optional ChangeWatcher whose changes are enqueued before every claim.
+        Returns the service stats.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        self.queue.recover()
+        if self.keep_seconds:
+            self.queue.prune(self.keep_seconds)
+        concurrency = self.batch_options.get("concurrency")
+        pool_size = self.max_workers
+        if concurrency is not None:
+            # Every asset is on base_url's host, so no more than per_host_limit threads can ever be busy
+            pool_size = concurrency.cap(self.batch_options.get("per_host_limit", 8))
+        with DownloadPool(pool_size) as pool:
+            while not self.stopping.is_set():
+                if watch is not None:
+                    changed = watch.poll()
+                    if changed:
+                        self.queue.enqueue(changed, source="watch")
+                jobs = self.queue.claim(self.batch_size)
+                if not jobs:
+                    if once:
+                        break
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                self.process(jobs, pool)
+                if watch is not None:
+                    # Our own rewrites are not changes to react to
+                    watch.mark({Path(job["path"]) for job in jobs})
+        return self.stats
@@ -0,0 +1,103 @@
+"""
+File: streaming.py
+
+Description:
+    Streaming, memory-bounded scanning and rewriting of very large Markdown files.
+    The file is read in binary chunks. Each chunk is cut at the last blank line (or
+    newline, or whitespace) and the tail is carried over into the next chunk, so a URL
+    or <img> tag that crosses a chunk boundary is always parsed whole. An open fenced
+    code block is carried across chunks as tokenizer state. The rewrite goes to a
+    temporary file that is renamed over the original only when complete.
+    Peak memory is about chunk_size + max_carry, whatever the file size.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - parser.py
+    - rewrite.py
+    - utils.py
+
+Usage:
+    refs = list(stream_image_refs(path, BASE_URL, ASSETS_ENDPOINT))
+    replaced = stream_rewrite(path, {url: "Images/uuid.png"}, BASE_URL, ASSETS_ENDPOINT)
+
+
+"""
+from support_files.parser import ImageRef, iter_asset_refs
+from support_files.rewrite import splice_refs
+from support_files.utils import atomic_write
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CARRY = 256 * 1024
+
+#####################################
+def _safe_cut(buffer, max_carry):
+    # Cut where no token can be open: blank line, then newline, then any whitespace
+    floor = max(0, len(buffer) - max_carry)
+    for separator in (b"\n\n", b"\n", b" ", b"\t"):
+        index = buffer.rfind(separator, floor)
+        if index >= 0:
+            return index + len(separator)
+    # One enormous line with no whitespace: give up on keeping it whole
+    return len(buffer)
+
+def iter_segments(f, chunk_size=CHUNK_SIZE, max_carry=MAX_CARRY):
+    """
+    Yield (offset, segment) for consecutive segments of a binary file; together the
+    segments are exactly the file contents and none ends inside a line (if avoidable).
+    """
+    carry = b""
+    offset = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            if carry:
+                yield offset, carry
+            return
+        buffer = carry + chunk
+        cut = _safe_cut(buffer, max_carry)
+        yield offset, buffer[:cut]
+        offset += cut
+        carry = buffer[cut:]
+
+#####################################
+def _segment_refs(segment, state, base_url, assets_endpoint):
+    # Only the paragraphs around asset URLs are tokenized (see parser.iter_asset_refs)
+    return list(iter_asset_refs(segment, base_url, assets_endpoint, state))
+
+def stream_image_refs(path, base_url, assets_endpoint, chunk_size=CHUNK_SIZE):
+    """
+    Yield asset ImageRefs for a file of any size; start/end are byte offsets in the file.
+    """
+    state = {}
+    with open(path, "rb") as f:
+        for offset, segment in iter_segments(f, chunk_size):
+            for ref in _segment_refs(segment, state, base_url, assets_endpoint):
+                yield ImageRef(ref.url, ref.start + offset, ref.end + offset, ref.kind, ref.attrs)
+
+#####################################
+def stream_rewrite(path, mapping, base_url, assets_endpoint, chunk_size=CHUNK_SIZE):
+    """
+    Rewrite every mapped URL in a file of any size through a temporary file and an
+    atomic rename. The original is left untouched when nothing needs replacing.
+    Returns the number of references replaced.
+    """
+    replaced = 0
+    state = {}
+    try:
+        with open(path, "rb") as src, atomic_write(path, "wb") as dst:
+            for _, segment in iter_segments(src, chunk_size):
+                refs = _segment_refs(segment, state, base_url, assets_endpoint)
+                segment, done = splice_refs(segment, refs, mapping)
+                replaced += len(done)
+                dst.write(segment)
+            if not replaced:
+                raise _NothingToReplace
+    except _NothingToReplace:
+        pass
+    return replaced
+
+class _NothingToReplace(Exception):
+    # Aborts atomic_write so the temporary copy is discarded
+    pass
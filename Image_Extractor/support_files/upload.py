@@ -0,0 +1,320 @@
+"""
+File: upload.py
+
+Description:
+    Reverse pipeline for the Markdown Image Downloader: re-host local images.
+    Finds every Images/ reference in a corpus of Markdown files (scan.scan_local_images),
+    uploads each distinct image once to an upload endpoint and rewrites the references
+    back to the URLs the endpoint returns, one pass per Markdown file.
+    - uploads are multipart/form-data POSTs (the file in one form field) sent by a
+      ThreadPoolExecutor over one pooled keep-alive session, at most max_workers at a time
+    - 429 / 5xx answers and dropped connections are retried through a RetryScheduler
+    - images are identified by their SHA-256 (taken from the Images folder's manifest when
+      it is still current, hashed otherwise), so identical files in different folders are
+      uploaded once, and every upload is recorded in an upload log keyed by endpoint and
+      hash: an interrupted run, or a run over more documents, skips whatever is already hosted
+    The endpoint must answer 200 / 201 with the hosted URL in a JSON field (url_field) or
+    in a Location header.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - json
+    - mimetypes
+    - threading
+    - time
+    - concurrent.futures
+    - pathlib
+    - urllib.parse
+    - batch.py (find_markdown_files)
+    - cache.py (file_sha256)
+    - downloader.py (make_http_session)
+    - manifest.py
+    - retry.py
+    - scan.py
+    - utils.py
+
+Usage:
+    from support_files.upload import run_upload
+    summary = run_upload(["docs/"], "https://assets.example.com/upload", token="...")
+    # docs/notes.md: ![](Images/uuid.png) -> ![](https://assets.example.com/a/<sha256>.png)
+
+
+"""
+import json
+import mimetypes
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import unquote, urljoin
+
+import requests
+
+from support_files.batch import find_markdown_files
+from support_files.cache import file_sha256
+from support_files.downloader import make_http_session
+from support_files.manifest import ManifestSet
+from support_files.retry import RetryScheduler
+from support_files.scan import file_stamp, local_image_refs, rewrite_file, scan_local_images
+from support_files.utils import atomic_write
+
+UPLOADED_STATUSES = {200, 201}
+
+# Save the upload log after this many new uploads, so a killed run loses little
+SAVE_EVERY = 50
+
+#####################################
+class UploadLog:
+    """
+    Hosted URL of every image uploaded so far, as {endpoint: {sha256: url}} in one JSON file.
+    Thread-safe; saved atomically.
+    """
+    def __init__(self, path, endpoint):
+        self.path = Path(path) if path else None
+        self.endpoint = endpoint
+        self.lock = threading.Lock()
+        self.logs = {}
+        if self.path is not None and self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.logs = json.load(f)
+        self.uploads = self.logs.setdefault(endpoint, {})
+        self.pending = 0
+
+    def get(self, sha256):
+        with self.lock:
+            return self.uploads.get(sha256)
+
+    def record(self, sha256, url):
+        with self.lock:
+            self.uploads[sha256] = url
+            self.pending += 1
+            due = self.pending >= SAVE_EVERY
+        if due:
+            self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.lock:
+            if not self.pending:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with atomic_write(self.path) as f:
+                json.dump(self.logs, f, indent=1)
+            self.pending = 0
+
+#####################################
+def local_image_path(md_path, url, images_folder="Images"):
+    """
+    Images/a%20b.png in docs/notes.md -> docs/Images/a b.png (resolved), or None when the
+    path ends up outside docs/Images (.. segments, symlinks), so nothing else is ever uploaded.
+    """
+    root = (Path(md_path).parent / images_folder).resolve()
+    path = (Path(md_path).parent / unquote(url.split("#", 1)[0].split("?", 1)[0])).resolve()
+    return path if path.is_relative_to(root) and path != root else None
+
+def _manifest_hashes(manifest):
+    # {file name: (size, sha256)} for the images the downloader recorded a hash for
+    return {
+        entry["file"]: (entry.get("size"), entry["sha256"])
+        for entry in manifest.assets.values()
+        if entry.get("sha256")
+    }
+
+def collect_local_images(md_files, images_folder="Images"):
+    """
+    Scan md_files for references into their images folder.
+    Returns (images, doc_refs, doc_images): images is {resolved path: {"docs": {md_path: [url, ...]}}},
+    doc_refs {md_path: (file_stamp, refs)} for the rewrite and doc_images {md_path: {url: resolved path}}.
+    Files without any are left out, and references that resolve outside the images folder are ignored.
+    """
+    images = {}
+    doc_refs = {}
+    doc_images = {}
+    for md_path in md_files:
+        stamp = file_stamp(md_path)
+        refs = scan_local_images(md_path, images_folder)
+        if not refs:
+            continue
+        doc_refs[md_path] = (stamp, refs)
+        paths = doc_images.setdefault(md_path, {})
+        for ref in refs:
+            if ref.url in paths:
+                continue
+            path = local_image_path(md_path, ref.url, images_folder)
+            if path is None:
+                continue
+            paths[ref.url] = path
+            images.setdefault(path, {"docs": {}})["docs"].setdefault(md_path, []).append(ref.url)
+    return images, doc_refs, doc_images
+
+def hash_images(images):
+    """
+    Add "sha256" and "size" to every image entry that exists; the manifest's hash is used
+    when its recorded size still matches the file, otherwise the file is hashed.
+    """
+    manifests = ManifestSet()
+    known = {}
+    for path, entry in images.items():
+        if not path.is_file():
+            continue
+        size = path.stat().st_size
+        if path.parent not in known:
+            known[path.parent] = _manifest_hashes(manifests.get(path.parent))
+        recorded_size, sha256 = known[path.parent].get(path.name, (None, None))
+        entry["size"] = size
+        entry["sha256"] = sha256 if recorded_size == size else file_sha256(path)
+    return images
+
+#####################################
+def upload_file(path, endpoint, http_session, headers=None, field="file", url_field="url"):
+    """
+    POST one image to endpoint as multipart/form-data.
+    Returns (status, response headers, hosted URL or None); status None when the
+    connection failed.
+    """
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    try:
+        with open(path, "rb") as f:
+            response = http_session.post(
+                endpoint, files={field: (path.name, f, content_type)}, headers=headers or {}
+            )
+    except (requests.RequestException, OSError):
+        return None, None, None
+    with response:
+        if response.status_code not in UPLOADED_STATUSES:
+            return response.status_code, response.headers, None
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        hosted = body.get(url_field) if isinstance(body, dict) else None
+        hosted = hosted or response.headers.get("Location")
+        # A relative Location / URL is relative to the endpoint
+        return response.status_code, response.headers, urljoin(endpoint, hosted) if hosted else None
+
+def _upload_with_retries(path, endpoint, http_session, headers, field, url_field, scheduler):
+    status = None
+    for attempt in range(scheduler.attempts):
+        wait = scheduler.reserve(endpoint)
+        if wait is None:
+            break
+        if wait > 0:
+            time.sleep(wait)
+        status, response_headers, hosted = upload_file(path, endpoint, http_session, headers, field, url_field)
+        if hosted is not None:
+            scheduler.retry_delay(endpoint, attempt, status, response_headers)
+            return status, hosted
+        delay = scheduler.retry_delay(endpoint, attempt, status, response_headers)
+        if delay is None:
+            break
+        time.sleep(delay)
+    return status, None
+
+def upload_images(
+    images, endpoint, log, max_workers=8, token=None, field="file", url_field="url",
+    scheduler=None, progress=None,
+):
+    """
+    Upload every hashed image entry whose hash is not in the upload log yet, once per hash,
+    concurrently. Sets "state" ('uploaded', 'logged', 'missing' or 'failed') and "remote_url"
+    on every entry. progress is an optional AggregateProgress (see progress.py).
+    """
+    if scheduler is None:
+        scheduler = RetryScheduler()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    pending = {}
+    for path, entry in images.items():
+        if "sha256" not in entry:
+            entry["state"] = "missing"
+        elif log.get(entry["sha256"]):
+            entry.update(state="logged", remote_url=log.get(entry["sha256"]))
+        else:
+            pending.setdefault(entry["sha256"], []).append(path)
+
+    task_ids = {
+        sha256: progress.add_task(paths[0].name, total=images[paths[0]]["size"] or 1)
+        for sha256, paths in pending.items()
+    } if progress is not None else {}
+    finish = getattr(progress, "finish", None)
+
+    with make_http_session(max_workers) as http_session:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    _upload_with_retries, paths[0], endpoint, http_session, headers, field, url_field, scheduler
+                ): sha256
+                for sha256, paths in pending.items()
+            }
+            for future in as_completed(futures):
+                sha256 = futures[future]
+                status, hosted = future.result()
+                if hosted is not None:
+                    log.record(sha256, hosted)
+                for path in pending[sha256]:
+                    images[path].update(state="uploaded" if hosted else "failed", remote_url=hosted, http_status=status)
+                if sha256 in task_ids:
+                    progress.update(task_ids[sha256], completed=images[pending[sha256][0]]["size"] or 1)
+                    if finish is not None:
+                        finish(task_ids[sha256], "uploaded" if hosted else "failed")
+    return images
+
+#####################################
+def run_upload(
+    targets,
+    endpoint,
+    pattern="**/*.md",
+    max_workers=8,
+    token=None,
+    state_path=None,
+    field="file",
+    url_field="url",
+    images_folder="Images",
+    scheduler=None,
+    progress=None,
+):
+    """
+    Upload the local images referenced by a corpus of Markdown files and rewrite every
+    reference to its hosted URL. state_path is the upload log (None: no resume).
+    References to missing or failed images are left as they are.
+    Returns a summary dict with counts, the failed / missing image paths and the rewritten files.
+    """
+    md_files = find_markdown_files(targets, pattern)
+    images, doc_refs, doc_images = collect_local_images(md_files, images_folder)
+    hash_images(images)
+    log = UploadLog(state_path, endpoint)
+    try:
+        upload_images(images, endpoint, log, max_workers, token, field, url_field, scheduler, progress)
+    finally:
+        log.save()
+
+    # Rewrite each Markdown file once, by the scanned byte offsets
+    def rescan(content):
+        return local_image_refs(content, images_folder)
+
+    rewritten = []
+    for md_path, (stamp, refs) in doc_refs.items():
+        mapping = {
+            url: images[path]["remote_url"]
+            for url, path in doc_images[md_path].items()
+            if images[path].get("remote_url")
+        }
+        if rewrite_file(md_path, refs, mapping, None, None, stamp, rescan=rescan):
+            rewritten.append(str(md_path))
+
+    states = [entry["state"] for entry in images.values()]
+    uploaded = {entry["sha256"]: entry["size"] for entry in images.values() if entry["state"] == "uploaded"}
+    return {
+        "markdown_files": len(md_files),
+        "images_found": len(images),
+        "uploaded": len(uploaded),
+        "duplicates": states.count("uploaded") - len(uploaded),
+        "already_uploaded": states.count("logged"),
+        "bytes_uploaded": sum(uploaded.values()),
+        "missing": sorted(str(p) for p, entry in images.items() if entry["state"] == "missing"),
+        "failed": sorted(str(p) for p, entry in images.items() if entry["state"] == "failed"),
+        "rewritten": rewritten,
+    }
@@ -8,16 +8,25 @@ Description:
     - Extracting and filtering image URLs
     - Handling HTTP requests and downloads
     - Replacing URLs in Markdown content with local image paths
+    - Writing files atomically
+    - Resuming interrupted downloads from .part files (see resume.py)
+    - Retrying rate-limited / failed requests (see retry.py)
 
 Author: Richard Mulholland
 Date: 2025-11-23
 
 Dependencies:
     - os
+    - shutil
+    - tempfile
+    - time
+    - contextlib
     - requests
     - re
     - urllib.parse
     - pathlib
+    - resume.py
+    - retry.py (a RetryScheduler is passed in by downloader.py)
 
 Usage:
     Import these functions into main.py or other scripts as needed.
@@ -27,8 +36,14 @@ Usage:
 import os
 import requests
 import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 from urllib.parse import urlparse
 from pathlib import Path
+
+from support_files.resume import PartialDownload, is_partial_file
 #####################################
 def clear_terminal():
     # For Windows
@@ -50,20 +65,43 @@ def extract_filtered_urls_OLD(content, base_url, assets_endpoint):
     return list(set(filtered))
 
 #####################################
-def get_final_url_and_filename(url,user_session):
+def build_headers(user_session):
+    headers = {"User-Agent": "Mozilla/5.0"}
+    # None: an anonymous request (e.g. straight to a planned S3 URL)
+    if user_session is not None:
+        headers["Cookie"] = f"user_session={user_session}; logged_in=yes"
+    return headers
+
+def session_for(url, fetch_url, user_session):
+    """
+    The user_session to send when fetching fetch_url for the GitHub asset url: only to url's
+    own host, never to a planned S3 / CDN URL on another host (requests itself drops the
+    Cookie header on cross-host redirects).
+    """
+    return user_session if urlparse(fetch_url).netloc == urlparse(url).netloc else None
+
+#####################################
+def get_final_url_and_filename(url, user_session, http_session=None, extra_headers=None):
 
-    headers = {
-        "User-Agent": "Mozilla/5.0",
-        "Cookie": f"user_session={user_session}; logged_in=yes"
-    }
-    response = requests.get(url, allow_redirects=True, stream=True, headers=headers)
+    headers = build_headers(user_session)
+    # Conditional request headers (If-None-Match / If-Modified-Since) for refresh mode
+    if extra_headers:
+        headers.update(extra_headers)
+    # Reuse a pooled keep-alive session when one is given (see downloader.py)
+    getter = http_session.get if http_session is not None else requests.get
+    response = getter(url, allow_redirects=True, stream=True, headers=headers)
     #response = requests.get(url, allow_redirects=True,headers=headers)
 
-    if response.status_code == 200:
+    # 206: the rest of a partial download (Range request, see resume.py)
+    if response.status_code in (200, 206):
         final_url = response.url
         filename = Path(urlparse(final_url).path).name
         return final_url, filename, response
-    return None, None, None
+    # Release the connection back to the pool
+    response.close()
+    # 304 Not Modified, 429 / 5xx (retry, see retry.py), 404, ...: hand back the closed
+    # response so the caller can look at its status and headers (Retry-After)
+    return None, None, response
 
 #####################################
 def download_image(response, image_path):
@@ -103,3 +141,188 @@ def replace_url_with_image_path(content, url, image_rel_path):
     """
     return content.replace(url, image_rel_path)
 
+######################################
+
+def _fetch_to_part(url, user_session, http_session, extra_headers, partial, update, trace=None):
+    """
+    One GET of url into partial's .part file, resuming it with a Range request when possible.
+    Returns (status, headers, image_path). status is None when the connection failed or the
+    body came up short (both worth a retry); image_path is set once the complete body has
+    been renamed into place.
+    trace (see metrics.py) collects attempts, wait / transfer seconds, bytes and redirects.
+    """
+    if trace is None:
+        trace = {}
+    trace["attempts"] = trace.get("attempts", 0) + 1
+    range_headers = partial.range_headers()
+    sent = time.perf_counter()
+    try:
+        final_url, redirected_filename, response = get_final_url_and_filename(
+            url, user_session, http_session, {**extra_headers, **range_headers}
+        )
+        if range_headers and response is not None and (
+            response.status_code == 416 or not partial.accepts(response.status_code, response.headers)
+        ):
+            # Range not satisfiable, or a 206 for some other offset (the part is unusable): start again from zero
+            response.close()
+            partial.discard()
+            final_url, redirected_filename, response = get_final_url_and_filename(
+                url, user_session, http_session, extra_headers
+            )
+        headers_at = time.perf_counter()
+        trace["wait"] = trace.get("wait", 0.0) + headers_at - sent
+        if response is not None:
+            trace["redirects"] = len(response.history)
+            trace["http_status"] = response.status_code
+        if response is None or not final_url:
+            return (response.status_code, response.headers, None) if response is not None else (None, None, None)
+        if not partial.accepts(response.status_code, response.headers):
+            # A 206 for a range nobody asked for: worth a retry, not worth writing
+            response.close()
+            return None, None, None
+        with response:
+            offset = partial.begin(response.status_code, response.headers, final_url)
+            update(total=partial.total or 0, completed=offset)
+            with partial.open(offset) as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:
+                        f.write(chunk)
+                        partial.update(chunk)
+                        update(advance=len(chunk))
+                        trace["bytes"] = trace.get("bytes", 0) + len(chunk)
+        trace["transfer"] = trace.get("transfer", 0.0) + time.perf_counter() - headers_at
+        # Only a complete body is renamed into place; a short one stays .part to be resumed
+        image_path = partial.finish(Path(redirected_filename).suffix)
+        return (response.status_code if image_path else None), response.headers, image_path
+    except (requests.RequestException, OSError):
+        # Connection reset / timeout: the .part file is kept and resumed on the next attempt
+        return None, None, None
+
+def download_image_task(
+    url,
+    filename,
+    images_dir,
+    session,
+    progress=None,
+    task_id=None,
+    http_session=None,
+    manifest=None,
+    refresh=False,
+    scheduler=None,
+    trace=None,
+    resolved_url=None,
+):
+    """
+    Download a single asset into images_dir unless it is already there.
+    Returns (url, image_rel_path, status) where status is 'downloaded', 'exists' or 'failed'.
+    With a manifest (see manifest.py) the existence check is a lookup instead of a glob,
+    and refresh=True re-validates existing files with a conditional GET.
+    With a RetryScheduler (see retry.py), 429 / 5xx answers and dropped connections are
+    retried with backoff, rate limits are honoured and an open circuit fails fast.
+    trace is an optional DownloadMetrics trace dict (see metrics.py) filled in per attempt.
+    resolved_url is the final URL from a download plan (see plan.py), requested instead of url.
+    Progress updates are skipped when no progress/task_id is given (headless runs).
+    """
+    def update(**kwargs):
+        if progress is not None and task_id is not None:
+            progress.update(task_id, **kwargs)
+
+    if manifest is not None:
+        existing = manifest.find(url, filename)
+    else:
+        # Check if any file with this base name exists in the images directory (any extension)
+        existing_files = [p for p in images_dir.glob(f"{filename}.*") if not is_partial_file(p.name)]
+        existing = f"Images/{existing_files[0].name}" if existing_files else None
+    extra_headers = {}
+    if existing:
+        extra_headers = conditional_headers(manifest.entry(url)) if refresh and manifest is not None else None
+        if not extra_headers:
+            update(completed=1)
+            return url, existing, 'exists'
+    # Downloads go to a .part file; continue an interrupted one with a Range request
+    partial = PartialDownload(images_dir, filename)
+    fetch_url = resolved_url or url
+    for attempt in range(scheduler.attempts if scheduler is not None else 1):
+        if scheduler is not None:
+            wait = scheduler.reserve(url)
+            if wait is None:
+                # Circuit open: this host keeps failing, do not add to its load
+                break
+            if wait > 0:
+                time.sleep(wait)
+        status, headers, image_path = _fetch_to_part(
+            fetch_url, session_for(url, fetch_url, session), http_session, extra_headers, partial, update, trace
+        )
+        if fetch_url != url and planned_url_expired(status):
+            # Signed S3 URLs are short-lived: resolve through the GitHub URL again
+            fetch_url = url
+            status, headers, image_path = _fetch_to_part(
+                url, session, http_session, extra_headers, partial, update, trace
+            )
+        delay = scheduler.retry_delay(url, attempt, status, headers) if scheduler is not None else None
+        if existing and status == 304:
+            update(completed=1)
+            return url, existing, 'exists'
+        if image_path is not None:
+            if manifest is not None:
+                manifest.record(
+                    url,
+                    image_path.name,
+                    final_url=partial.final_url,
+                    etag=partial.etag,
+                    last_modified=partial.last_modified,
+                    size=partial.size,
+                    sha256=partial.sha256,
+                )
+            update(completed=partial.size)
+            return url, f"Images/{image_path.name}", 'downloaded'
+        if delay is None:
+            break
+        time.sleep(delay)
+    update(completed=1)
+    if existing:
+        # Refresh failed but the old copy is still usable
+        return url, existing, 'exists'
+    return url, None, 'failed'
+
+######################################
+
+def planned_url_expired(status):
+    # 4xx (but not 429) from a URL resolved by an earlier plan: the signature is no longer valid
+    return status is not None and 400 <= status < 500 and status != 429
+
+######################################
+
+def conditional_headers(entry):
+    """
+    Build If-None-Match / If-Modified-Since headers from a manifest entry (or None).
+    """
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+######################################
+
+@contextmanager
+def atomic_write(path, mode="w", encoding="utf-8"):
+    """
+    Open a temporary file next to path for writing and rename it over path only
+    once the block finishes without error, so readers never see a half-written file.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+        if path.exists():
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
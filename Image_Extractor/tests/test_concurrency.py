@@ -0,0 +1,115 @@
+"""
+File: test_concurrency.py
+
+Description:
+    Adaptive download concurrency against benchmarks/local_server.py: the limit the
+    controller reports must be what is really in flight. Every asset is on one host, so the
+    per-host limit caps the limit no matter how high the ceiling is, and the peak number of
+    downloads in flight (DownloadMetrics) never exceeds the highest limit reported.
+    Skipped when requests is not installed; the async case also needs aiohttp.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - aiohttp (optional)
+    - unittest
+    - benchmarks/local_server.py
+    - support_files/concurrency.py
+    - support_files/downloader.py
+    - support_files/metrics.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python -m unittest discover tests
+    python -m pytest tests
+
+
+"""
+import sys
+import tempfile
+import unittest
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+try:
+    import requests  # noqa: F401
+except ImportError:
+    requests = None
+
+try:
+    import aiohttp  # noqa: F401
+except ImportError:
+    aiohttp = None
+
+if requests is not None:
+    from local_server import start_server
+    from support_files.concurrency import AdaptiveConcurrency
+    from support_files.config import ASSETS_ENDPOINT
+    from support_files.downloader import download_assets
+    from support_files.metrics import DownloadMetrics
+
+PER_HOST = 4
+COUNT = 120
+
+#####################################
+@unittest.skipIf(requests is None, "the download engines need requests")
+class AdaptiveConcurrencyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server, self.base_url = start_server(asset_size=5_000, latency=0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def download(self, engine):
+        concurrency = AdaptiveConcurrency(initial=2, floor=1, ceiling=64)
+        metrics = DownloadMetrics()
+        images_dir = Path(self.tmp.name)
+        jobs = [
+            (f"{self.base_url}{ASSETS_ENDPOINT}/{name}", name, images_dir)
+            for name in (str(uuid.uuid4()) for _ in range(COUNT))
+        ]
+        results = download_assets(
+            jobs, "token", engine=engine, max_workers=2, per_host_limit=PER_HOST,
+            metrics=metrics, concurrency=concurrency,
+        )
+        self.assertEqual([status for _, _, status in results], ["downloaded"] * COUNT)
+        return concurrency.summary(), metrics.summary()
+
+    def check_limit_matches_in_flight(self, engine):
+        limits, stats = self.download(engine)
+        # One host: the limit can never go past what that host is allowed
+        self.assertEqual(limits["max_limit"], PER_HOST)
+        self.assertLessEqual(limits["highest"], PER_HOST)
+        # What was really in flight reached the reported limit and never went past it
+        self.assertEqual(stats["peak_in_flight"], limits["highest"])
+        self.assertEqual(stats["max_workers"], PER_HOST)
+
+    #####################################
+    def test_thread_engine_in_flight_matches_limit(self):
+        self.check_limit_matches_in_flight("thread")
+
+    @unittest.skipIf(aiohttp is None, "the async engine needs aiohttp")
+    def test_async_engine_in_flight_matches_limit(self):
+        self.check_limit_matches_in_flight("async")
+
+    def test_cap_clamps_the_limit(self):
+        concurrency = AdaptiveConcurrency(initial=16, floor=2, ceiling=64)
+        self.assertEqual(concurrency.cap(8), 8)
+        limits = concurrency.summary()
+        self.assertEqual((limits["final"], limits["highest"]), (8, 8))
+        self.assertEqual(limits["decisions"][-1]["reason"], "cap")
+        # A later run over more hosts may use more slots again, up to the ceiling
+        self.assertEqual(concurrency.cap(200), 64)
+
+
+if __name__ == "__main__":
+    unittest.main()
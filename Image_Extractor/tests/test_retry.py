@@ -0,0 +1,140 @@
+"""
+File: test_retry.py
+
+Description:
+    Retry behaviour of the thread download engine against benchmarks/local_server.py,
+    whose faults are drawn from a seeded random generator so every run sees the same ones:
+    - a 429 is retried no sooner than its Retry-After
+    - a connection dropped mid-body is retried and resumed with a Range request
+    - the circuit breaker stops requests to a host after breaker_threshold failures
+    - the run-wide retry budget is never exceeded
+    Skipped when requests is not installed.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - requests
+    - unittest
+    - benchmarks/local_server.py
+    - support_files/downloader.py
+    - support_files/resume.py
+    - support_files/retry.py
+
+Usage:
+    Run from the Image_Extractor folder:
+    python -m unittest discover tests
+    python -m pytest tests
+
+
+"""
+import sys
+import tempfile
+import time
+import unittest
+import uuid
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+try:
+    import requests  # noqa: F401
+except ImportError:
+    requests = None
+
+if requests is not None:
+    from local_server import start_server
+    from support_files.config import ASSETS_ENDPOINT
+    from support_files.downloader import download_assets
+    from support_files.resume import PartialDownload
+    from support_files.retry import RetryScheduler
+
+ASSET_SIZE = 50_000
+
+#####################################
+@unittest.skipIf(requests is None, "the download engines need requests")
+class RetryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.images_dir = Path(self.tmp.name)
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.tmp.cleanup()
+
+    def download(self, count, scheduler, **server_options):
+        # Fetch count fresh assets one at a time; returns {filename: status}
+        self.server, base_url = start_server(asset_size=ASSET_SIZE, **server_options)
+        names = [str(uuid.uuid4()) for _ in range(count)]
+        jobs = [(f"{base_url}{ASSETS_ENDPOINT}/{name}", name, self.images_dir) for name in names]
+        results = download_assets(jobs, "token", max_workers=1, per_host_limit=1, scheduler=scheduler)
+        statuses = {url.rsplit("/", 1)[-1]: status for url, _, status in results}
+        return [statuses[name] for name in names]
+
+    #####################################
+    def test_429_waits_for_retry_after(self):
+        # Seed 1 answers the first request 429 and the second 200
+        scheduler = RetryScheduler(attempts=3, base_delay=0.0)
+        start = time.perf_counter()
+        statuses = self.download(1, scheduler, fault_rate=0.5, retry_after=0.5, seed=1)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(statuses, ["downloaded"])
+        self.assertEqual(self.server.faults["429"], 1)
+        self.assertEqual(scheduler.stats()["retries"], 1)
+        # base_delay=0: any wait comes from Retry-After alone
+        self.assertGreaterEqual(elapsed, 0.5)
+
+    def test_reset_is_resumed_with_range(self):
+        # Seed 1 cuts the first body off half way, then answers normally
+        scheduler = RetryScheduler(attempts=3, base_delay=0.0)
+        part_sizes = []
+        range_headers = PartialDownload.range_headers
+
+        def recording_range_headers(partial):
+            # Size of the .part file left by the reset, as the retry sees it
+            if partial.part.exists():
+                part_sizes.append(partial.part.stat().st_size)
+            return range_headers(partial)
+
+        with mock.patch.object(PartialDownload, "range_headers", recording_range_headers):
+            statuses = self.download(1, scheduler, reset_rate=0.5, seed=1)
+        self.assertEqual(statuses, ["downloaded"])
+        self.assertEqual(self.server.faults["reset"], 1)
+        # One Range request, continuing from what was on disk instead of starting over. The client
+        # writes whole chunks, so that is at most the half the server sent before dropping
+        self.assertEqual(len(self.server.ranges), 1)
+        self.assertGreater(self.server.ranges[0], 0)
+        self.assertLessEqual(self.server.ranges[0], ASSET_SIZE // 2)
+        self.assertEqual(self.server.ranges, part_sizes)
+        images = [p for p in self.images_dir.iterdir() if p.suffix == ".png"]
+        self.assertEqual(len(images), 1)
+        self.assertEqual(images[0].stat().st_size, ASSET_SIZE)
+        self.assertFalse(list(self.images_dir.glob("*.part*")))
+
+    def test_circuit_opens_after_threshold(self):
+        scheduler = RetryScheduler(attempts=10, base_delay=0.0, breaker_threshold=3, breaker_cooldown=60.0)
+        statuses = self.download(2, scheduler, fault_rate=1.0, retry_after=0)
+        self.assertEqual(statuses, ["failed", "failed"])
+        # Three failures open the circuit; the second asset is never requested
+        self.assertEqual(self.server.faults["429"], 3)
+        self.assertEqual(scheduler.stats()["open_circuits"], [f"127.0.0.1:{self.server.server_port}"])
+
+    def test_retry_budget_is_enforced(self):
+        scheduler = RetryScheduler(attempts=10, base_delay=0.0, budget=2, breaker_threshold=100)
+        statuses = self.download(3, scheduler, fault_rate=1.0, retry_after=0)
+        self.assertEqual(statuses, ["failed"] * 3)
+        stats = scheduler.stats()
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["gave_up"], 3)
+        # One request per asset plus the two retries the budget allowed
+        self.assertEqual(self.server.faults["429"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+"""
+File: worker.py
+
+Description:
+    Long-lived worker service for the Markdown Image Downloader.
+    Runs as a daemon that keeps its HTTP connection pool, worker threads, retry state and
+    asset cache warm, and processes Markdown files from a durable SQLite job queue as they
+    arrive (see service.py / jobqueue.py). With --watch it also polls directories for new
+    or modified Markdown files and queues only those.
+    Other processes (CI steps, git hooks) add work with `worker.py enqueue`.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - argparse
+    - time
+    - config.py
+    - cache.py
+    - concurrency.py
+    - downloader.py
+    - index.py
+    - jobqueue.py
+    - metrics.py
+    - retry.py
+    - service.py
+
+Usage:
+    python worker.py run --watch docs/ other_repo/      # daemon: watch and process changes
+    python worker.py run --once                         # drain the queue, then exit
+    python worker.py enqueue docs/notes.md "notes/**/*.md"
+    python worker.py status
+
+Version:
+    001 - Initial worker service: SQLite job queue, warm download pool, watch mode
+    002 - Corpus index (--index) and SKIP_INCOMPLETE_DOCS
+    003 - Adaptive download concurrency, kept across batches (--fixed-workers)
+"""
+import argparse
+import time
+
+from support_files.batch import find_markdown_files
+from support_files.config import (
+    USER_SESSION,
+    BASE_URL,
+    ASSETS_ENDPOINT,
+    BATCH_MAX_WORKERS,
+    MARKDOWN_GLOB,
+    PER_HOST_LIMIT,
+    ADAPTIVE_CONCURRENCY,
+    CONCURRENCY_FLOOR,
+    CONCURRENCY_CEILING,
+    CONCURRENCY_BACKOFF,
+    CONCURRENCY_MAX_ERROR_RATE,
+    CONCURRENCY_LATENCY_TOLERANCE,
+    USE_CACHE,
+    CACHE_DIR,
+    CACHE_MAX_BYTES,
+    STREAMING_THRESHOLD_BYTES,
+    STREAM_CHUNK_BYTES,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_BUDGET,
+    REQUESTS_PER_SECOND,
+    REQUEST_BURST,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    METRICS_PATH,
+    DEDUP_IMAGES,
+    QUEUE_PATH,
+    QUEUE_BATCH_SIZE,
+    QUEUE_POLL_INTERVAL,
+    QUEUE_KEEP_SECONDS,
+    CORPUS_INDEX_PATH,
+    SKIP_INCOMPLETE_DOCS,
+)
+from support_files.cache import AssetCache
+from support_files.concurrency import AdaptiveConcurrency
+from support_files.dedup import DEDUP_SCOPES
+from support_files.index import CorpusIndex
+from support_files.jobqueue import JobQueue
+from support_files.metrics import DownloadMetrics
+from support_files.retry import RetryScheduler
+from support_files.service import ChangeWatcher, ExtractorService
+
+#####################################
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Markdown Image Downloader as a worker service.")
+    parser.add_argument("--queue", default=str(QUEUE_PATH), help="SQLite job queue file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Process queued Markdown files (and watch for changes)")
+    run.add_argument("--watch", nargs="*", default=[], metavar="TARGET",
+                     help="Directories, files or glob patterns to poll for new / modified Markdown files")
+    run.add_argument("--no-initial", action="store_true",
+                     help="With --watch, only queue files that change after start-up")
+    run.add_argument("--once", action="store_true", help="Exit when the queue has nothing pending")
+    run.add_argument("--pattern", default=MARKDOWN_GLOB, help="Glob used inside watched directories")
+    run.add_argument("--workers", type=int, default=BATCH_MAX_WORKERS,
+                     help="Download workers kept alive (the starting point with --adaptive-workers)")
+    run.add_argument("--fixed-workers", action="store_true", default=not ADAPTIVE_CONCURRENCY,
+                     help="Keep --workers downloads in flight instead of adapting to latency and errors")
+    run.add_argument("--adaptive-workers", action="store_false", dest="fixed_workers",
+                     help="Adapt the number of downloads in flight to latency and errors, starting at --workers")
+    run.add_argument("--per-host", type=int, default=PER_HOST_LIMIT, help="Concurrent downloads per host")
+    run.add_argument("--batch-size", type=int, default=QUEUE_BATCH_SIZE, help="Markdown files claimed per batch")
+    run.add_argument("--interval", type=float, default=QUEUE_POLL_INTERVAL, help="Seconds between polls when idle")
+    run.add_argument("--no-cache", action="store_true", default=not USE_CACHE, help="Do not use the asset cache")
+    run.add_argument("--dedup", choices=DEDUP_SCOPES, default=DEDUP_IMAGES, help="See batch.py --dedup")
+    run.add_argument("--metrics", default=METRICS_PATH, help="Write download metrics here on exit")
+    run.add_argument("--index", default=CORPUS_INDEX_PATH, help="Corpus index: see batch.py --index")
+    run.add_argument("--session", default=USER_SESSION, help="GitHub user_session cookie")
+
+    enqueue = commands.add_parser("enqueue", help="Queue Markdown files for a running worker")
+    enqueue.add_argument("targets", nargs="+", help="Directories, Markdown files or glob patterns")
+    enqueue.add_argument("--pattern", default=MARKDOWN_GLOB, help="Glob used inside directories")
+
+    status = commands.add_parser("status", help="Show queue counts and recently finished jobs")
+    status.add_argument("--recent", type=int, default=10, help="Finished jobs to list")
+    return parser.parse_args()
+
+#####################################
+def log_batch(jobs, summary):
+    # One plain line per batch, so the service log reads well under systemd / CI
+    print(
+        f"{time.strftime('%H:%M:%S')} {len(jobs)} files: {summary['urls_found']} assets, "
+        f"{summary['downloaded']} downloaded, {summary['from_cache']} from cache, "
+        f"{len(summary['failed'])} failed, {len(summary['rewritten'])} rewritten ({summary['seconds']:.1f}s)"
+        + (f", {summary['concurrency']['final']} in flight" if summary["concurrency"] is not None else ""),
+        flush=True,
+    )
+
+def run(args, queue):
+    scheduler = RetryScheduler(
+        attempts=RETRY_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        budget=RETRY_BUDGET,
+        rate=REQUESTS_PER_SECOND,
+        burst=REQUEST_BURST,
+        breaker_threshold=BREAKER_THRESHOLD,
+        breaker_cooldown=BREAKER_COOLDOWN,
+    )
+    metrics = DownloadMetrics(args.workers, "thread") if args.metrics else None
+    service = ExtractorService(
+        queue,
+        args.session,
+        BASE_URL,
+        ASSETS_ENDPOINT,
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+        poll_interval=args.interval,
+        keep_seconds=QUEUE_KEEP_SECONDS,
+        on_batch=log_batch,
+        per_host_limit=args.per_host,
+        cache=None if args.no_cache else AssetCache(CACHE_DIR, CACHE_MAX_BYTES),
+        scheduler=scheduler,
+        metrics=metrics,
+        streaming_threshold=STREAMING_THRESHOLD_BYTES,
+        chunk_size=STREAM_CHUNK_BYTES,
+        dedup=args.dedup,
+        index=CorpusIndex(args.index) if args.index else None,
+        skip_incomplete=SKIP_INCOMPLETE_DOCS,
+        concurrency=None if args.fixed_workers else AdaptiveConcurrency(
+            initial=args.workers,
+            floor=CONCURRENCY_FLOOR,
+            ceiling=CONCURRENCY_CEILING,
+            latency_tolerance=CONCURRENCY_LATENCY_TOLERANCE,
+            max_error_rate=CONCURRENCY_MAX_ERROR_RATE,
+            backoff=CONCURRENCY_BACKOFF,
+        ),
+    )
+    watch = ChangeWatcher(args.watch, args.pattern, initial=not args.no_initial) if args.watch else None
+    print(f"Worker started: queue {args.queue}, {args.workers} workers"
+          + (f", watching {', '.join(args.watch)}" if watch else ""), flush=True)
+    stats = service.serve(watch=watch, once=args.once)
+    if metrics is not None:
+        metrics.write(args.metrics)
+    print(f"Worker stopped: {stats['jobs']} files in {stats['batches']} batches, "
+          f"{stats['downloaded']} downloaded, {stats['failed_jobs']} failed", flush=True)
+
+#####################################
+def main():
+    args = parse_args()
+    queue = JobQueue(args.queue)
+    try:
+        if args.command == "run":
+            run(args, queue)
+        elif args.command == "enqueue":
+            added = queue.enqueue(find_markdown_files(args.targets, args.pattern), source="cli")
+            print(f"Queued {added} Markdown files")
+        else:
+            counts = queue.counts()
+            print(", ".join(f"{state}: {n}" for state, n in counts.items()))
+            for job in queue.recent(args.recent):
+                print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['finished_at']))} "
+                      f"{job['state']:<6} {job['path']}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
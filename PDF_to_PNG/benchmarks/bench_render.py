@@ -0,0 +1,111 @@
+"""
+File: bench_render.py
+
+Description:
+    Pages/second vs. core count for the PDF to PNG pipeline.
+    Generates a multi-page PDF with Pillow (one drawn slide per page), then converts
+    it with save_slides at --jobs 1, 2, 4, ... up to the number of cores.
+    --format / --colors / --thumbnails pick the output encoding; bytes written and
+    encode time per format are printed for the first run.
+    Needs Poppler installed, like main.py.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - Pillow
+    - pdf2image (+ Poppler)
+    - support_files/slides.py
+
+Usage:
+    Run from the PDF_to_PNG folder:
+    python benchmarks/bench_render.py --pages 60 --dpi 150
+    python benchmarks/bench_render.py --jobs 1 --format webp --thumbnails 320
+
+
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from support_files.slides import save_slides
+from support_files.slides_encode import OUTPUT_FORMATS, EncodeReport, check_output, output_settings
+
+#####################################
+def make_pdf(path, pages, size=(1280, 720)):
+    """
+    Write a PDF of `pages` slides, each with a title, some boxes and lines of text.
+    """
+    slides = []
+    for number in range(1, pages + 1):
+        img = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([0, 0, size[0], 90], fill=(30, 60, 120))
+        draw.text((40, 30), f"Slide {number}", fill="white")
+        for row in range(8):
+            draw.text((60, 130 + row * 50), f"Bullet point {row} on slide {number}", fill="black")
+        draw.ellipse([900, 200, 1150, 450], outline=(200, 40, 40), width=6)
+        slides.append(img)
+    slides[0].save(path, "PDF", save_all=True, append_images=slides[1:], resolution=96)
+
+#####################################
+def job_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF rendering.")
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--jobs", type=int, nargs="+", default=None, help="Job counts (default 1, 2, 4 .. cores)")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default="png")
+    parser.add_argument("--colors", type=int, default=0)
+    parser.add_argument("--lossy", action="store_true")
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--thumbnails", type=int, nargs="*", default=[])
+    args = parser.parse_args()
+    output = output_settings(
+        args.format, colors=args.colors, lossless=not args.lossy, quality=args.quality, thumbnails=args.thumbnails
+    )
+    check_output(output)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "bench.pdf"
+        make_pdf(pdf_path, args.pages)
+        print(f"{args.pages} pages at {args.dpi} DPI, batch size {args.batch_size}")
+        print(f"{'jobs':>5} {'seconds':>8} {'pages/s':>8} {'speedup':>8}")
+        base = None
+        report = None
+        for jobs in args.jobs or job_counts():
+            out = Path(tmp) / f"out_{jobs}"
+            out.mkdir()
+            start = time.perf_counter()
+            run_report = EncodeReport()
+            saved = list(save_slides(
+                pdf_path, out, "bench", dpi=args.dpi, batch_size=args.batch_size, jobs=jobs,
+                output=output, report=run_report,
+            ))
+            report = report or run_report
+            elapsed = time.perf_counter() - start
+            assert [n for n, _ in saved] == list(range(1, args.pages + 1))
+            base = base or elapsed
+            print(f"{jobs:>5} {elapsed:>8.2f} {args.pages / elapsed:>8.1f} {base / elapsed:>7.2f}x")
+        for line in report.lines():
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
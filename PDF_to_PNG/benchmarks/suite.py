@@ -0,0 +1,185 @@
+"""
+File: suite.py
+
+Description:
+    Regression benchmark suite for the PDF to PNG converter.
+    Generates a multi-page slide deck PDF (bench_render.make_pdf) and measures:
+    - render:  pages/second from Poppler (pdf2image) alone, at --dpi
+    - encode:  pages/second and bytes/page for each output encoding, on pages rendered once
+               (PNG, PNG with a 256 colour palette, WebP lossless and lossy, AVIF if available)
+    - convert: pages/second for the whole save_slides pipeline at --jobs 1 and all cores
+    Every result is the best of --repeat runs. Baselines use the same JSON format as
+    Image_Extractor/benchmarks/suite.py: --save writes one, --compare exits with status 1
+    if a result is more than --tolerance worse (slower, or bigger files).
+    Needs Poppler installed, like main.py.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - Pillow
+    - pdf2image (+ Poppler)
+    - json
+    - platform
+    - bench_render.py (PDF generator)
+    - support_files/slides.py
+    - support_files/slides_encode.py
+
+Usage:
+    Run from the PDF_to_PNG folder:
+    python benchmarks/suite.py --save benchmarks/baseline.json
+    python benchmarks/suite.py --compare benchmarks/baseline.json --tolerance 0.25
+    python benchmarks/suite.py --pages 10 --only encode
+
+
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pdf2image import convert_from_path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_render import make_pdf
+from support_files.slides import save_slides
+from support_files.slides_encode import check_output, output_settings, save_page
+
+BASELINE_VERSION = 1
+SECTIONS = ("render", "encode", "convert")
+
+ENCODINGS = {
+    "png": output_settings("png"),
+    "png_palette": output_settings("png", colors=256),
+    "webp_lossless": output_settings("webp"),
+    "webp_q80": output_settings("webp", lossless=False, quality=80),
+    "avif_q60": output_settings("avif", quality=60),
+}
+
+#####################################
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def record(results, name, value, unit, better="higher"):
+    results[name] = {"value": round(value, 3), "unit": unit, "better": better}
+    print(f"{name:<32} {value:>12.1f} {unit}")
+
+#####################################
+def bench_render(results, pdf_path, pages, dpi, repeat):
+    seconds, images = best_of(repeat, lambda: convert_from_path(str(pdf_path), dpi=dpi))
+    assert len(images) == pages
+    record(results, f"render.{dpi}dpi", pages / seconds, "pages/s")
+    return images
+
+def bench_encode(results, images, repeat, tmp):
+    for label, output in ENCODINGS.items():
+        try:
+            check_output(output)
+        except ValueError:
+            print(f"{'encode.' + label:<32} {'skipped':>12} (not supported by this Pillow)")
+            continue
+        out = Path(tmp) / f"encode_{label}"
+        out.mkdir()
+        seconds, stats = best_of(repeat, lambda: [
+            save_page(img, out, "bench", number, output) for number, img in enumerate(images, start=1)
+        ])
+        size = sum(entry[1] for page in stats for entry in page)
+        record(results, f"encode.{label}", len(images) / seconds, "pages/s")
+        record(results, f"encode.{label}.bytes", size / len(images) / 1e3, "kB/page", better="lower")
+
+def bench_convert(results, pdf_path, pages, dpi, repeat, tmp):
+    cores = os.cpu_count() or 1
+    for jobs in sorted({1, cores}):
+        def run():
+            out = Path(tempfile.mkdtemp(dir=tmp))
+            return list(save_slides(pdf_path, out, "bench", dpi=dpi, jobs=jobs))
+        seconds, saved = best_of(repeat, run)
+        assert [n for n, _ in saved] == list(range(1, pages + 1))
+        record(results, f"convert.jobs{jobs}", pages / seconds, "pages/s")
+
+#####################################
+def save_baseline(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": BASELINE_VERSION,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "results": results,
+        }, f, indent=2)
+
+def compare_baseline(results, path, tolerance):
+    """
+    Print each result against the baseline. Returns the names that got worse by more than tolerance.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path} is not a version {BASELINE_VERSION} baseline")
+    if baseline.get("machine") != platform.platform():
+        print(f"Note: baseline made on {baseline.get('machine')}, results may not be comparable")
+    regressed = []
+    print(f"\n{'benchmark':<32} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        change = result["value"] / before["value"] - 1 if before["value"] else 0.0
+        worse = -change if result.get("better", "higher") == "higher" else change
+        flag = ""
+        if worse > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {before['value']:>12.1f} {result['value']:>12.1f} {change:>+7.0%}{flag}")
+    return regressed
+
+#####################################
+def main():
+    parser = argparse.ArgumentParser(description="Regression benchmarks for the PDF to PNG converter.")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs")
+    parser.add_argument("--save", metavar="BASELINE", help="Write the results as a baseline")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a baseline, exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed change for the worse before failing")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "bench.pdf"
+        make_pdf(pdf_path, args.pages)
+        print(f"{args.pages} pages at {args.dpi} DPI, best of {args.repeat}")
+        print(f"{'benchmark':<32} {'result':>12}")
+        images = None
+        if "render" in args.only or "encode" in args.only:
+            images = bench_render(results, pdf_path, args.pages, args.dpi, args.repeat)
+        if "encode" in args.only:
+            bench_encode(results, images, args.repeat, tmp)
+        if "convert" in args.only:
+            bench_convert(results, pdf_path, args.pages, args.dpi, args.repeat, tmp)
+
+    if args.save:
+        save_baseline(results, args.save)
+        print(f"\nBaseline written to {args.save}")
+    if args.compare:
+        regressed = compare_baseline(results, args.compare, args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} benchmarks more than {args.tolerance:.0%} worse than the baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,41 +12,58 @@ Features:
 - Prompts the user to select a PDF file via a graphical file dialog.
 - Asks the user for a base filename for output files.
 - Allows the user to choose a target directory for saving results.
-- Converts each page of the selected PDF into a PNG image using pdf2image.
+- Converts each page of the selected PDF into a PNG image using pdf2image,
+  streaming pages in bounded batches so memory does not grow with the page count.
+- Optionally renders and encodes page batches on several cores (--jobs).
+- Re-runs only re-render pages that changed since the last run (--full forces all).
+- Writes PNG (compression level / palette quantisation), WebP or AVIF slides, plus optional
+  thumbnails from the same rendered page, and reports bytes written and encode time per format.
 - Saves all images in a structured subfolder under the chosen directory.
 - Generates a Markdown (.md) file with image links to the saved PNGs.
 - Provides informative logging throughout the process.
 
 Intended Usage:
 Run this script in a terminal (preferably Bash) to interactively select a PDF, specify output options, and automatically generate slide images and a Markdown file for easy documentation or presentation sharing.
+    python main.py --jobs 8   # render / encode pages on 8 cores (0 = all cores)
+    python main.py --full     # ignore the slides manifest and re-render every page
+    python main.py --format webp --thumbnails 320   # WebP slides with 320 px thumbnails in the Markdown
+Importing this module has no side effects; to convert PDFs from other code use
+support_files.convert.pdf_to_slides, which needs no GUI.
 
 Dependencies:
-- tkinter
+- tkinter (imported in main() only)
 - pdf2image
+- support_files/convert.py (pdf_to_slides, the importable pipeline)
+- support_files/slides.py
+- support_files/slides_encode.py (Pillow; AVIF needs a Pillow build with AVIF support)
+- support_files/slides_manifest.py (pypdf optional, for per-page change detection)
+- support_files/slides_config.py
 - pathlib
 - logging
 - os
 
 Version: 
     001: Initial version
+    002: Page-streaming conversion
+    003: Parallel rendering / encoding (--jobs)
+    004: Incremental re-runs (only changed pages are re-rendered)
+    005: Output formats (optimised PNG, WebP, AVIF), thumbnails and an encode report
+    006: Pipeline moved to pdf_to_slides; tkinter and logging set up in main() only
 """
 
 
+import argparse
 import os
 from pathlib import Path
-import tkinter as tk
-from tkinter import filedialog, simpledialog, ttk
-from pdf2image import convert_from_path
+from support_files.convert import pdf_to_slides
+from support_files.slides_encode import OUTPUT_FORMATS, check_output, output_settings, report_lines
+from support_files.slides_config import DPI, POPPLER_PATH, RENDER_MODE, PAGE_BATCH_SIZE, JOBS
+from support_files.slides_config import (
+    OUTPUT_FORMAT, PNG_COMPRESS_LEVEL, PNG_OPTIMIZE, PNG_COLORS, WEBP_LOSSLESS, QUALITY, THUMBNAIL_WIDTHS
+)
 import logging
 
 #####################################
-if os.name == 'nt':
-    os.system('cls')
-else:
-    os.system('clear')
-
-#####################################
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
 GREEN = "\033[92m"
@@ -55,91 +72,128 @@ RED = "\033[91m"
 RESET = "\033[0m"
 
 #####################################
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert a PDF into PNG slides and a Markdown file.")
+    parser.add_argument("--jobs", type=int, default=JOBS,
+                        help="Worker processes for rendering and PNG encoding (0 = all cores, 1 = no pool)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-render every page, even if the slides manifest says it is unchanged")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default=OUTPUT_FORMAT,
+                        help="Image format for the slides")
+    parser.add_argument("--colors", type=int, default=PNG_COLORS,
+                        help="PNG only: quantise to a palette of this many colours (0 = full colour)")
+    parser.add_argument("--lossy", action="store_true", default=not WEBP_LOSSLESS,
+                        help="WebP only: lossy instead of lossless encoding")
+    parser.add_argument("--quality", type=int, default=QUALITY,
+                        help="Quality for lossy WebP and AVIF (0-100)")
+    parser.add_argument("--thumbnails", type=int, nargs="*", default=THUMBNAIL_WIDTHS, metavar="WIDTH",
+                        help="Also write thumbnails this many pixels wide; the Markdown links the smallest to the slide")
+    return parser.parse_args()
 
-
-logger.info(f"{GREEN}PDF to PNG process started.{RESET}")
-# Step 1: Select PDF File
-file_path = filedialog.askopenfilename(
-    initialdir = str(Path.home() / "Downloads"),  # Default to Downloads
-    title="Select a PDF file",
-    filetypes=[("PDF files", "*.pdf")]
-)
-
-
-if file_path:
-    filename_without_ext = Path(file_path).stem
-    logger.info(f"Selected file: {GREEN}{file_path}{RESET}")
-
-else:
-    logger.error(f"{RED}No filename provided. Exiting.{RESET}")
-    exit()
-#######################################
-# Step 2: Ask for Base Filename
-stem_name = simpledialog.askstring("Filename", "Enter a base filename:", initialvalue=filename_without_ext)
-
-if not stem_name:
-    logger.error(f"{RED}No filename provided. Exiting.{RESET}")
-    exit()
-
-logger.info(f"Selected stem name: {GREEN}{stem_name}{RESET}")
-########################################
-# Step 3: Choose folder to save file to, defaulting to script's folder
-script_folder = os.path.dirname(os.path.abspath(__file__))
-
-save_folder = filedialog.askdirectory(
-    title="Select folder to save output file",
-    initialdir=script_folder
-)
-
-if save_folder:
-    logger.info(f"Target folder: {GREEN}{save_folder}{RESET}")
-else:
-    logger.error(f"{RED}No taget folder selected. Exiting.{RESET}")
-    exit()
-
-###########################################
-# Step 4: Convert PDF to PNG images
-
-# Optional: Set Poppler path here if needed
-#poppler_path = r"C:\Path\To\poppler\bin"
-#pdf_images = convert_from_path(file_path, dpi=300, poppler_path=poppler_path)
-
-logger.info(f"Looking for slides in PDF.")
-pdf_images = convert_from_path(file_path, dpi=300)
-logger.info(f"Found {len(pdf_images)} slides in PDF.")
-
-#########################################
-# Step 5: Prepare output folder
-
-markdown_path = Path(save_folder) / f"{stem_name}_slides.md"
-Slides_dir = Path(save_folder) / "Slides" / stem_name
-Slides_dir.mkdir(parents=True,exist_ok=True)
-#########################################
-# Step 6: Save each image
-image_paths = []
-total = len(pdf_images)
-
-for i, img in enumerate(pdf_images, start=1):
-    number = f"{i:03}"
-    filename = f"{stem_name}_SLIDES_{number}.png"
-    image_path = os.path.join(Slides_dir, filename)
-    img.save(image_path, "PNG")
-    image_paths.append(filename)
-    logger.info(f"Saved slide {i:03}/{total:03}: {GREEN}{filename}{RESET}")
-    
-#########################################
-# Step 7: Create Markdown file
-markdown_lines = [
-    f"![{name[-7:-4]}](Slides/{stem_name}/{name})"
-    for name in image_paths
-]
-
-logger.info(f"Writing markdown lines to: {GREEN}{markdown_path}{RESET}")
-
-with open(markdown_path, "w") as md_file:
-    md_file.write("\n".join(markdown_lines))
-    
-logger.info(f"Finsihed writing markdown lines to: {GREEN}{markdown_path}{RESET}")
-
-#########################################
-logger.info(f"{GREEN}PDF to PNG process complete.{RESET}")
\ No newline at end of file
+#####################################
+def main():
+    # Interactive-only setup: importing main.py never loads tkinter or configures logging
+    from tkinter import filedialog, simpledialog
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    args = parse_args()
+    jobs = args.jobs or os.cpu_count()
+    output = output_settings(
+        args.format,
+        compress_level=PNG_COMPRESS_LEVEL,
+        optimize=PNG_OPTIMIZE,
+        colors=args.colors,
+        lossless=not args.lossy,
+        quality=args.quality,
+        thumbnails=args.thumbnails,
+    )
+    try:
+        check_output(output)
+    except ValueError as e:
+        logger.error(f"{RED}{e}. Exiting.{RESET}")
+        return
+
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        os.system('clear')
+
+    logger.info(f"{GREEN}PDF to PNG process started.{RESET}")
+    # Step 1: Select PDF File
+    file_path = filedialog.askopenfilename(
+        initialdir = str(Path.home() / "Downloads"),  # Default to Downloads
+        title="Select a PDF file",
+        filetypes=[("PDF files", "*.pdf")]
+    )
+
+
+    if file_path:
+        filename_without_ext = Path(file_path).stem
+        logger.info(f"Selected file: {GREEN}{file_path}{RESET}")
+
+    else:
+        logger.error(f"{RED}No filename provided. Exiting.{RESET}")
+        return
+    #######################################
+    # Step 2: Ask for Base Filename
+    stem_name = simpledialog.askstring("Filename", "Enter a base filename:", initialvalue=filename_without_ext)
+
+    if not stem_name:
+        logger.error(f"{RED}No filename provided. Exiting.{RESET}")
+        return
+
+    logger.info(f"Selected stem name: {GREEN}{stem_name}{RESET}")
+    ########################################
+    # Step 3: Choose folder to save file to, defaulting to script's folder
+    script_folder = os.path.dirname(os.path.abspath(__file__))
+
+    save_folder = filedialog.askdirectory(
+        title="Select folder to save output file",
+        initialdir=script_folder
+    )
+
+    if save_folder:
+        logger.info(f"Target folder: {GREEN}{save_folder}{RESET}")
+    else:
+        logger.error(f"{RED}No taget folder selected. Exiting.{RESET}")
+        return
+
+    ###########################################
+    # Step 4: Render the slides and write the Markdown file (see support_files/convert.py)
+    # Optional: Set Poppler path in support_files/slides_config.py if needed
+    # Pages are rendered PAGE_BATCH_SIZE at a time, so memory does not grow with the page count;
+    # with --jobs > 1 the batches are rendered and encoded by a pool of worker processes.
+    # Pages unchanged since the last run are skipped unless --full is given.
+    logger.info(f"Rendering with {jobs} worker process(es).")
+
+    def on_slide(number, total, filename):
+        logger.info(f"Saved slide {number:03}/{total:03}: {GREEN}{filename}{RESET}")
+
+    summary = pdf_to_slides(
+        file_path,
+        save_folder,
+        stem_name,
+        dpi=DPI,
+        batch_size=PAGE_BATCH_SIZE,
+        mode=RENDER_MODE,
+        poppler_path=POPPLER_PATH,
+        jobs=jobs,
+        output=output,
+        full=args.full,
+        on_slide=on_slide,
+    )
+    total = summary["pages"]
+    if len(summary["rendered"]) < total:
+        logger.info(f"{total - len(summary['rendered'])} of {total} slide(s) unchanged since the last run.")
+    for line in report_lines(summary["encode"]):
+        logger.info(f"Written {line}")
+    for name in summary["removed"]:
+        logger.info(f"{YELLOW}Removed old slide: {name}{RESET}")
+    logger.info(f"Wrote markdown lines to: {GREEN}{summary['markdown']}{RESET}")
+
+    #########################################
+    logger.info(f"{GREEN}PDF to PNG process complete.{RESET}")
+
+
+if __name__ == "__main__":
+    main()
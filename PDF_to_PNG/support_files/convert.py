@@ -0,0 +1,125 @@
+"""
+File: convert.py
+
+Description:
+    Library entry point for the PDF to PNG converter.
+    pdf_to_slides renders a PDF into Slides/<stem>/ and writes <stem>_slides.md next
+    to it, returning a summary dict. It opens no dialogs, clears no terminal and
+    configures no logging, so it can be called in-process from other scripts,
+    services and worker processes. main.py is the interactive wrapper around it.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - pathlib
+    - support_files/slides.py
+    - support_files/slides_encode.py
+    - support_files/slides_manifest.py
+
+Usage:
+    from support_files.convert import pdf_to_slides
+    summary = pdf_to_slides("talk.pdf", "docs/", jobs=4, output=output_settings("webp"))
+
+
+"""
+from pathlib import Path
+
+from support_files.slides import count_pages, save_slides
+from support_files.slides_encode import EncodeReport, check_output, output_settings, page_filenames, slide_filename
+from support_files.slides_manifest import plan_render, remove_orphans, save_manifest
+
+#####################################
+def markdown_lines(stem_name, total, output):
+    """
+    One image link per slide; with thumbnails, the smallest thumbnail links to the full-size slide.
+    """
+    ext = output["format"]
+    lines = []
+    for number in range(1, total + 1):
+        image = f"Slides/{stem_name}/{slide_filename(stem_name, number, ext)}"
+        if output["thumbnails"]:
+            thumb = f"Slides/{stem_name}/{slide_filename(stem_name, number, ext, output['thumbnails'][0])}"
+            lines.append(f"[![{number:03}]({thumb})]({image})")
+        else:
+            lines.append(f"![{number:03}]({image})")
+    return lines
+
+#####################################
+def pdf_to_slides(
+    pdf_path,
+    save_folder,
+    stem_name=None,
+    dpi=300,
+    batch_size=8,
+    mode="batch",
+    poppler_path=None,
+    jobs=1,
+    output=None,
+    full=False,
+    on_slide=None,
+):
+    """
+    Convert pdf_path into <save_folder>/Slides/<stem_name>/ and write
+    <save_folder>/<stem_name>_slides.md. stem_name defaults to the PDF's file name.
+    Only pages changed since the last run are rendered unless full=True
+    (see slides_manifest.py); output is a slides_encode.output_settings dict.
+    on_slide(page_number, total, filename) is called as each slide is saved.
+    Returns a summary dict: markdown path, slides folder, page count, pages rendered,
+    removed files and the per-format encode totals {label: (files, bytes, seconds)}.
+    Raises ValueError if the output format cannot be written by this Pillow.
+    """
+    if output is None:
+        output = output_settings()
+    check_output(output)
+    stem_name = stem_name or Path(pdf_path).stem
+    total = count_pages(pdf_path, poppler_path)
+
+    markdown_path = Path(save_folder) / f"{stem_name}_slides.md"
+    slides_dir = Path(save_folder) / "Slides" / stem_name
+    slides_dir.mkdir(parents=True, exist_ok=True)
+
+    # Compare with the last run: only new or changed pages need rendering
+    pages, manifest = plan_render(
+        pdf_path, slides_dir, total, {"dpi": dpi, "output": output},
+        lambda number: page_filenames(stem_name, number, output),
+    )
+    if full:
+        pages = list(range(1, total + 1))
+
+    report = EncodeReport()
+    rendered = []
+    for number, filename in save_slides(
+        pdf_path,
+        slides_dir,
+        stem_name,
+        dpi=dpi,
+        batch_size=batch_size,
+        mode=mode,
+        poppler_path=poppler_path,
+        total=total,
+        jobs=jobs,
+        pages=pages,
+        output=output,
+        report=report,
+    ):
+        rendered.append(number)
+        if on_slide:
+            on_slide(number, total, filename)
+
+    # Slides for pages the PDF no longer has, or in a format / thumbnail size no longer used
+    expected = {name for number in range(1, total + 1) for name in page_filenames(stem_name, number, output)}
+    removed = remove_orphans(slides_dir, stem_name, total, keep=expected)
+    save_manifest(slides_dir, manifest)
+
+    with open(markdown_path, "w") as md_file:
+        md_file.write("\n".join(markdown_lines(stem_name, total, output)))
+
+    return {
+        "markdown": markdown_path,
+        "slides_dir": slides_dir,
+        "pages": total,
+        "rendered": rendered,
+        "removed": removed,
+        "encode": dict(report.totals),
+    }
@@ -0,0 +1,206 @@
+"""
+File: slides.py
+
+Description:
+    Page-streaming PDF to PNG conversion for the PDF to PNG converter.
+    Instead of rendering every page into memory before saving the first one,
+    pages are rendered in bounded first_page/last_page windows and each page is
+    saved as soon as its window is ready, while the next window renders in the
+    background. Peak memory is proportional to the batch size, not the page count.
+    - "batch":  windows are rendered to PIL images and saved with img.save
+    - "direct": Poppler writes each window straight to PNG files (paths_only),
+                which are renamed into place; no page is ever held in memory
+    With jobs > 1 the windows are spread over a process pool; each worker renders
+    its pages and encodes the PNGs itself, so both stages use every core.
+    Pages are encoded by slides_encode.save_page (PNG / WebP / AVIF plus thumbnails);
+    "direct" mode only applies to plain PNG output, anything else is saved as in "batch".
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - pdf2image
+    - support_files/slides_encode.py
+    - concurrent.futures
+    - multiprocessing (via ProcessPoolExecutor)
+    - tempfile
+    - pathlib
+
+Usage:
+    for number, filename in save_slides(pdf_path, slides_dir, stem_name, dpi=300, batch_size=8, jobs=4):
+        ...
+    save_slides(..., pages=[3, 4, 9])  # re-render only these pages
+    save_slides(..., output=output_settings("webp", thumbnails=[320]), report=EncodeReport())
+
+
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from support_files.slides_encode import is_plain_png, output_settings, save_page, slide_filename
+
+RENDER_MODES = ("batch", "direct")
+
+#####################################
+def count_pages(file_path, poppler_path=None):
+    return int(pdfinfo_from_path(str(file_path), poppler_path=poppler_path)["Pages"])
+
+#####################################
+def page_windows(pages, batch_size):
+    """
+    Split pages into (first_page, last_page) windows of at most batch_size pages.
+    pages is a page count (pages 1..total) or a sorted list of page numbers; a window
+    never spans a page that is not in the list.
+    """
+    if isinstance(pages, int):
+        pages = range(1, pages + 1)
+    windows = []
+    for number in pages:
+        if windows and number == windows[-1][1] + 1 and number - windows[-1][0] < batch_size:
+            windows[-1] = (windows[-1][0], number)
+        else:
+            windows.append((number, number))
+    return windows
+
+#####################################
+def _render_window(file_path, first, last, dpi, poppler_path, output_folder=None):
+    if output_folder is None:
+        return convert_from_path(
+            str(file_path), dpi=dpi, first_page=first, last_page=last, poppler_path=poppler_path
+        )
+    return convert_from_path(
+        str(file_path), dpi=dpi, first_page=first, last_page=last, poppler_path=poppler_path,
+        output_folder=str(output_folder), fmt="png", paths_only=True,
+    )
+
+def _prefetched(windows, render):
+    """
+    Yield (window, render(window)) in order, rendering the next window in a
+    background thread while the caller saves the current one.
+    """
+    if not windows:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(render, windows[0])
+        for index, window in enumerate(windows):
+            result = pending.result()
+            if index + 1 < len(windows):
+                pending = executor.submit(render, windows[index + 1])
+            yield window, result
+
+#####################################
+def _save_window(file_path, slides_dir, stem_name, first, last, dpi, poppler_path, output):
+    # Runs in a worker process: render one window and encode its images there
+    saved = []
+    for number, img in enumerate(_render_window(file_path, first, last, dpi, poppler_path), start=first):
+        stats = save_page(img, slides_dir, stem_name, number, output)
+        img.close()
+        saved.append((number, slide_filename(stem_name, number, output["format"]), stats))
+    return saved
+
+def _save_slides_parallel(file_path, slides_dir, stem_name, windows, dpi, poppler_path, jobs, output):
+    """
+    Render and encode windows on a process pool, yielding (page_number, filename, stats)
+    in page order. At most `jobs` windows are in flight, so memory stays bounded.
+    """
+    def submit(executor, window):
+        return executor.submit(
+            _save_window, str(file_path), str(slides_dir), stem_name, *window, dpi, poppler_path, output
+        )
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = []
+        windows = iter(windows)
+        for window in windows:
+            pending.append(submit(executor, window))
+            if len(pending) >= jobs:
+                break
+        while pending:
+            saved = pending.pop(0).result()
+            next_window = next(windows, None)
+            if next_window:
+                pending.append(submit(executor, next_window))
+            yield from saved
+
+#####################################
+def save_slides(
+    file_path,
+    slides_dir,
+    stem_name,
+    dpi=300,
+    batch_size=8,
+    mode="batch",
+    poppler_path=None,
+    total=None,
+    jobs=1,
+    pages=None,
+    output=None,
+    report=None,
+):
+    """
+    Render the PDF window by window and save each page as <stem>_SLIDES_NNN.<ext>
+    (plus <stem>_SLIDES_NNN_<width>.<ext> thumbnails), encoded as described by
+    output (slides_encode.output_settings; default plain PNG).
+    Yields (page_number, filename) in page order as soon as each page is saved.
+    jobs > 1 renders and encodes windows in that many worker processes.
+    pages limits rendering to those page numbers (see slides_manifest.plan_render).
+    report, a slides_encode.EncodeReport, collects bytes written and encode time.
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode {mode!r}, expected one of {RENDER_MODES}")
+    if output is None:
+        output = output_settings()
+    if mode == "direct" and not is_plain_png(output):
+        mode = "batch"
+    slides_dir = Path(slides_dir)
+    if total is None:
+        total = count_pages(file_path, poppler_path)
+    if pages is None:
+        pages = range(1, total + 1)
+    pages = sorted(pages)
+    windows = page_windows(pages, batch_size)
+
+    if jobs > 1:
+        # Keep every worker busy: no window larger than an even share of the pages
+        windows = page_windows(pages, max(1, min(batch_size, -(-len(pages) // jobs))))
+        for number, filename, stats in _save_slides_parallel(
+            file_path, slides_dir, stem_name, windows, dpi, poppler_path, jobs, output
+        ):
+            if report is not None:
+                report.add(stats)
+            yield number, filename
+        return
+
+    if mode == "batch":
+        def render(window):
+            return _render_window(file_path, window[0], window[1], dpi, poppler_path)
+
+        for (first, _), images in _prefetched(windows, render):
+            for number, img in enumerate(images, start=first):
+                stats = save_page(img, slides_dir, stem_name, number, output)
+                img.close()
+                if report is not None:
+                    report.add(stats)
+                yield number, slide_filename(stem_name, number, output["format"])
+        return
+
+    # "direct": Poppler writes the PNGs itself into a scratch folder next to the slides
+    with tempfile.TemporaryDirectory(dir=slides_dir, prefix=".render-") as scratch:
+        def render(window):
+            window_dir = Path(scratch) / f"{window[0]:05}"
+            window_dir.mkdir()
+            return _render_window(file_path, window[0], window[1], dpi, poppler_path, window_dir)
+
+        for (first, _), paths in _prefetched(windows, render):
+            # pdf2image names pages so they sort in page order
+            for number, path in enumerate(sorted(paths), start=first):
+                filename = slide_filename(stem_name, number)
+                os.replace(path, slides_dir / filename)
+                if report is not None:
+                    # Poppler encoded the page while rendering, so there is no separate encode time
+                    report.add([("png", os.path.getsize(slides_dir / filename), 0.0)])
+                yield number, filename
@@ -0,0 +1,55 @@
+"""
+File: slides_config.py
+
+Description:
+    Configuration settings for the PDF to PNG converter.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - None
+
+Usage:
+    Import configuration variables into main.py or other scripts as needed.
+
+
+"""
+######################################################################
+# Render resolution for every slide
+DPI = 300
+
+# Optional: Set Poppler path here if needed
+# POPPLER_PATH = r"C:\Path\To\poppler\bin"
+POPPLER_PATH = None
+
+# How pages are rendered (see slides.py):
+#   "batch"  - render PAGE_BATCH_SIZE pages at a time into memory, save each as soon as its batch is ready
+#   "direct" - let Poppler write PNG files straight to disk, PAGE_BATCH_SIZE pages per call
+RENDER_MODE = "batch"
+
+# Pages rendered per Poppler call; peak memory grows with this, not with the page count
+PAGE_BATCH_SIZE = 8
+
+# Worker processes that render and encode page batches in parallel (main.py --jobs).
+# 1 renders in this process; 0 uses every core
+JOBS = 1
+
+# Output format for slides (see slides_encode.py): "png", "webp" or "avif" (main.py --format)
+OUTPUT_FORMAT = "png"
+
+# PNG: zlib level 0-9 and Pillow's extra optimise pass (smaller, slower)
+PNG_COMPRESS_LEVEL = 6
+PNG_OPTIMIZE = False
+
+# PNG: quantise to a palette of this many colours (2-256); flat slides rarely need more.
+# 0 keeps full colour (main.py --colors)
+PNG_COLORS = 0
+
+# WebP: lossless, or lossy at QUALITY (main.py --lossy); AVIF is always lossy at QUALITY
+WEBP_LOSSLESS = True
+QUALITY = 80
+
+# Thumbnail widths in pixels, made from the same rendered page (main.py --thumbnails).
+# When set, the Markdown shows the smallest thumbnail, linked to the full-size slide
+THUMBNAIL_WIDTHS = []
@@ -0,0 +1,164 @@
+"""
+File: slides_encode.py
+
+Description:
+    Output formats for the PDF to PNG converter.
+    Each rendered page is encoded once per output: the full-size slide plus any
+    thumbnails, all made from the same decoded image so the page is only rendered once.
+    - "png":  zlib compress_level / optimize, optional palette quantisation
+              (flat slides usually fit in 256 colours and shrink a lot)
+    - "webp": lossless, or lossy at the given quality
+    - "avif": lossy at the given quality (needs Pillow with AVIF support,
+              or the pillow-avif-plugin package)
+    Every save is timed and its size recorded, so main.py can report bytes written
+    and encode time per format.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - Pillow
+    - pillow-avif-plugin (optional, for AVIF on Pillow < 11.2)
+    - time
+    - pathlib
+
+Usage:
+    output = output_settings(fmt="webp", quality=85, thumbnails=[320])
+    check_output(output)
+    stats = save_page(img, slides_dir, stem_name, number, output)
+    report = EncodeReport(); report.add(stats)
+
+
+"""
+import os
+import time
+from pathlib import Path
+
+from PIL import Image
+
+OUTPUT_FORMATS = {"png": "PNG", "webp": "WEBP", "avif": "AVIF"}
+
+#####################################
+def output_settings(
+    fmt="png",
+    compress_level=6,
+    optimize=False,
+    colors=0,
+    lossless=True,
+    quality=80,
+    thumbnails=(),
+):
+    """
+    Bundle the encoder options into a plain dict (it is sent to worker processes
+    and stored in the slides manifest, so changing any option re-renders the slides).
+    thumbnails is a list of widths in pixels; colors = 0 keeps full colour.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {fmt!r}, expected one of {tuple(OUTPUT_FORMATS)}")
+    return {
+        "format": fmt,
+        "compress_level": compress_level,
+        "optimize": optimize,
+        "colors": colors,
+        "lossless": lossless,
+        "quality": quality,
+        "thumbnails": sorted(set(thumbnails)),
+    }
+
+def check_output(output):
+    """
+    Raise ValueError if this Pillow cannot write the chosen format.
+    """
+    fmt = OUTPUT_FORMATS[output["format"]]
+    Image.init()
+    if fmt == "AVIF" and fmt not in Image.SAVE:
+        try:
+            import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        except ImportError:
+            pass
+    if fmt not in Image.SAVE:
+        raise ValueError(f"This Pillow cannot write {fmt}; install a build with {fmt} support")
+
+def is_plain_png(output):
+    # Poppler's own PNGs ("direct" render mode) are only right for default PNG output
+    return output["format"] == "png" and not output["colors"] and not output["thumbnails"]
+
+#####################################
+def slide_filename(stem_name, number, ext="png", width=None):
+    # width names a thumbnail: <stem>_SLIDES_NNN_<width>.<ext>
+    suffix = f"_{width}" if width else ""
+    return f"{stem_name}_SLIDES_{number:03}{suffix}.{ext}"
+
+def page_filenames(stem_name, number, output):
+    """
+    Every file written for one page: the slide, then its thumbnails.
+    """
+    ext = output["format"]
+    return [slide_filename(stem_name, number, ext)] + [
+        slide_filename(stem_name, number, ext, width) for width in output["thumbnails"]
+    ]
+
+#####################################
+def _save_options(output):
+    fmt = output["format"]
+    if fmt == "png":
+        return {"compress_level": output["compress_level"], "optimize": output["optimize"]}
+    if fmt == "webp":
+        if output["lossless"]:
+            return {"lossless": True, "quality": 100, "method": 4}
+        return {"quality": output["quality"], "method": 4}
+    return {"quality": output["quality"]}
+
+def _encode(img, path, output):
+    # Save one image, returning (bytes_written, seconds)
+    start = time.perf_counter()
+    if output["format"] == "png" and output["colors"]:
+        img = img.quantize(output["colors"], method=Image.Quantize.FASTOCTREE)
+    img.save(path, OUTPUT_FORMATS[output["format"]], **_save_options(output))
+    return os.path.getsize(path), time.perf_counter() - start
+
+def save_page(img, slides_dir, stem_name, number, output):
+    """
+    Write the slide and its thumbnails for one rendered page.
+    Returns [(label, bytes_written, seconds), ...], one entry per file.
+    """
+    check_output(output)  # registers the AVIF plugin in worker processes too
+    slides_dir = Path(slides_dir)
+    fmt = output["format"]
+    stats = [(fmt, *_encode(img, slides_dir / slide_filename(stem_name, number, fmt), output))]
+    for width in output["thumbnails"]:
+        thumb = img.copy()
+        thumb.thumbnail((width, img.height), Image.Resampling.LANCZOS)
+        filename = slide_filename(stem_name, number, fmt, width)
+        stats.append((f"{fmt} {width}px", *_encode(thumb, slides_dir / filename, output)))
+        thumb.close()
+    return stats
+
+#####################################
+class EncodeReport:
+    """
+    Running totals of files, bytes written and encode seconds per output label.
+    """
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, stats):
+        for label, size, seconds in stats:
+            files, total_size, total_seconds = self.totals.get(label, (0, 0, 0.0))
+            self.totals[label] = (files + 1, total_size + size, total_seconds + seconds)
+
+    def lines(self):
+        return report_lines(self.totals)
+
+def report_lines(totals):
+    """
+    One human-readable line per label of an EncodeReport's totals.
+    """
+    lines = []
+    for label, (files, size, seconds) in totals.items():
+        lines.append(
+            f"{label}: {files} file(s), {size / 1e6:.2f} MB, "
+            f"{size / files / 1e3:.0f} kB each, encode {seconds:.2f} s"
+        )
+    return lines
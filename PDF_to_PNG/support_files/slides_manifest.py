@@ -0,0 +1,160 @@
+"""
+File: slides_manifest.py
+
+Description:
+    Incremental re-runs for the PDF to PNG converter.
+    Each Slides/<stem>/ folder gets a .slides_manifest.json holding the source PDF's
+    SHA-256, the render settings and a fingerprint per page. A page's fingerprint is
+    a hash of its content stream and every object it uses (fonts, images, forms),
+    read with pypdf. On a re-run only new or changed pages are rendered, slides for
+    pages that no longer exist are deleted, and the Markdown is regenerated.
+    Without pypdf installed, an unchanged PDF is still skipped entirely but any
+    change re-renders every page.
+
+Author: Richard Mulholland
+Date: 2026-10-17
+
+Dependencies:
+    - hashlib
+    - json
+    - re
+    - pypdf (optional, for per-page fingerprints)
+
+Usage:
+    pages, manifest = plan_render(pdf_path, slides_dir, total, {"dpi": 300}, filename_for)
+    ... render pages ...
+    remove_orphans(slides_dir, stem_name, total, keep=expected_names)
+    save_manifest(slides_dir, manifest)
+
+
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+MANIFEST_NAME = ".slides_manifest.json"
+
+#####################################
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#####################################
+def _hash_object(obj, digest, seen):
+    # Feed a PDF object and everything it references (except the page tree) into digest
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+    if isinstance(obj, IndirectObject):
+        key = (obj.idnum, obj.generation)
+        if key in seen:
+            digest.update(b"R%d" % obj.idnum)
+            return
+        seen.add(key)
+        obj = obj.get_object()
+    if isinstance(obj, StreamObject):
+        digest.update(obj._data or b"")
+    if isinstance(obj, DictionaryObject):
+        for name in sorted(obj):
+            if name in ("/Parent", "/P"):
+                continue
+            digest.update(name.encode())
+            _hash_object(obj.raw_get(name), digest, seen)
+    elif isinstance(obj, ArrayObject):
+        for item in obj:
+            _hash_object(item, digest, seen)
+    else:
+        digest.update(repr(obj).encode())
+
+def page_fingerprints(file_path):
+    """
+    Return one fingerprint per page, or None when pypdf is not installed.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    reader = PdfReader(str(file_path))
+    fingerprints = []
+    for page in reader.pages:
+        digest = hashlib.sha256()
+        _hash_object(page, digest, set())
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+#####################################
+def load_manifest(slides_dir):
+    try:
+        with open(Path(slides_dir) / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(slides_dir, manifest):
+    path = Path(slides_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+#####################################
+def plan_render(file_path, slides_dir, total, settings, filename_for):
+    """
+    Decide which pages need rendering.
+    filename_for(page_number) gives the slide file a page should have, or a list of
+    files (slide and thumbnails); a page with any of them missing is re-rendered.
+    Returns (pages_to_render, new_manifest); save new_manifest once rendering succeeds.
+    """
+    slides_dir = Path(slides_dir)
+    old = load_manifest(slides_dir)
+    pdf_sha256 = file_sha256(file_path)
+    manifest = {"pdf_sha256": pdf_sha256, "settings": settings, "pages": {}}
+    all_pages = list(range(1, total + 1))
+
+    def slide_exists(number):
+        names = filename_for(number)
+        if isinstance(names, str):
+            names = [names]
+        return all((slides_dir / name).exists() for name in names)
+
+    if old.get("settings") != settings:
+        # Different DPI / output options: nothing on disk can be reused
+        fingerprints = page_fingerprints(file_path)
+        pages = all_pages
+    elif old.get("pdf_sha256") == pdf_sha256:
+        manifest["pages"] = old.get("pages", {})
+        return [n for n in all_pages if not slide_exists(n)], manifest
+    else:
+        fingerprints = page_fingerprints(file_path)
+        if fingerprints is None:
+            pages = all_pages
+        else:
+            old_pages = old.get("pages", {})
+            pages = [
+                n for n in all_pages
+                if old_pages.get(str(n)) != fingerprints[n - 1] or not slide_exists(n)
+            ]
+    if fingerprints is not None:
+        manifest["pages"] = {str(n): fingerprints[n - 1] for n in all_pages}
+    return pages, manifest
+
+#####################################
+def remove_orphans(slides_dir, stem_name, total, keep=None):
+    """
+    Delete <stem>_SLIDES_NNN.* (and <stem>_SLIDES_NNN_<width>.* thumbnail) files for
+    pages beyond the current page count. When keep is given, any slide file not in it
+    is deleted too (e.g. PNGs left behind after switching to WebP, or dropped thumbnail sizes).
+    Returns the removed file names.
+    """
+    pattern = re.compile(re.escape(stem_name) + r"_SLIDES_(\d{3,})(?:_\d+)?\.\w+$")
+    removed = []
+    for path in Path(slides_dir).iterdir():
+        match = pattern.match(path.name)
+        if match and (int(match.group(1)) > total or (keep is not None and path.name not in keep)):
+            path.unlink()
+            removed.append(path.name)
+    return sorted(removed)